@@ -0,0 +1,147 @@
+import math
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import metrics
+
+# Estimated milliseconds of analysis per word and per sentence, and each
+# method's weight relative to that; measured on this tree, where tokenizing
+# dominates and every engine is roughly linear in the document size
+MS_PER_WORD = 0.003
+MS_PER_SENTENCE = 0.005
+METHOD_WEIGHTS = {
+    'lsa': 1.15,
+    'text_rank': 1.0,
+    'lex_rank': 1.0,
+    'luhn': 0.9
+}
+
+_SENTENCE_END = re.compile(r'[.!?]+(?:\s|$)')
+_WORD = re.compile(r'\S+')
+
+
+def estimate_cost(text=None, method='lsa', words=None, sentences=None):
+    """Rough analysis cost of a document in milliseconds of CPU"""
+    if words is None:
+        words = sum(1 for _ in _WORD.finditer(text))
+    if sentences is None:
+        sentences = len(_SENTENCE_END.findall(text)) if text is not None else words // 20
+    return 1 + (words * MS_PER_WORD + sentences * MS_PER_SENTENCE) * METHOD_WEIGHTS.get(method, 1.0)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is not admitted; carries the HTTP status and Retry-After seconds"""
+
+    def __init__(self, message, status, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AdmissionControl:
+    """Cost-aware admission of summarization work.
+
+    Every user has a token bucket holding up to ``burst`` milliseconds of
+    estimated analysis time, refilled at ``rate`` per second; a request takes
+    its estimated cost from it or is refused with 429. A document costing
+    more than the whole bucket waits for a full one. Requests costing at
+    least ``heavy_cost`` also need one of ``heavy_slots`` per-process slots,
+    so a few large documents cannot occupy every worker while short requests
+    queue behind them; a heavy request waits up to ``heavy_wait`` seconds for
+    a slot, then is refused with 503. Buckets and slots are per process.
+    """
+
+    def __init__(self, rate=1000, burst=10000, heavy_cost=250, heavy_slots=None, heavy_wait=1.0):
+        self.enabled = True
+        self.rate = rate
+        self.burst = burst
+        self.heavy_cost = heavy_cost
+        self.heavy_slots = heavy_slots or max(1, (os.cpu_count() or 2) // 2)
+        self.heavy_wait = heavy_wait
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.heavy_slots)
+        self._heavy_running = 0
+        # Moving average of heavy request durations, for Retry-After
+        self._heavy_seconds = 1.0
+
+    def init_app(self, app):
+        """Configure from the Flask app config"""
+        self.enabled = app.config.get('ADMISSION_ENABLED', self.enabled)
+        self.rate = app.config.get('ADMISSION_RATE', self.rate)
+        self.burst = app.config.get('ADMISSION_BURST', self.burst)
+        self.heavy_cost = app.config.get('ADMISSION_HEAVY_COST', self.heavy_cost)
+        self.heavy_slots = app.config.get('ADMISSION_HEAVY_SLOTS') or self.heavy_slots
+        self.heavy_wait = app.config.get('ADMISSION_HEAVY_WAIT', self.heavy_wait)
+        self._slots = threading.BoundedSemaphore(self.heavy_slots)
+
+    def heavy_running(self):
+        """Heavy requests running in this process"""
+        return self._heavy_running
+
+    def take(self, user_id, cost):
+        """Charge cost to the user's bucket, or raise AdmissionRejected with 429"""
+        if not self.enabled:
+            return
+        cost = min(cost, self.burst)
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(user_id, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < cost:
+                self._buckets[user_id] = (tokens, now)
+                metrics.inc('admission_decisions_total', outcome='throttled')
+                raise AdmissionRejected('Too many requests, please retry shortly', 429,
+                                        math.ceil((cost - tokens) / self.rate))
+            self._buckets[user_id] = (tokens - cost, now)
+            if len(self._buckets) > 10000:
+                self._prune(now)
+
+    def refund(self, user_id, cost):
+        """Give back tokens charged for work that did not run"""
+        if not self.enabled:
+            return
+        with self._lock:
+            tokens, updated = self._buckets.get(user_id, (self.burst, time.monotonic()))
+            self._buckets[user_id] = (min(self.burst, tokens + min(cost, self.burst)), updated)
+
+    @contextmanager
+    def admit(self, user_id, cost):
+        """Run the block as user_id's work of the given estimated cost, or raise AdmissionRejected"""
+        if not self.enabled:
+            yield
+            return
+        self.take(user_id, cost)
+        if cost < self.heavy_cost:
+            metrics.inc('admission_decisions_total', outcome='admitted')
+            yield
+            return
+
+        if not self._slots.acquire(timeout=self.heavy_wait):
+            self.refund(user_id, cost)
+            metrics.inc('admission_decisions_total', outcome='shed')
+            raise AdmissionRejected('The server is busy with large documents, please retry shortly',
+                                    503, max(1, math.ceil(self._heavy_seconds)))
+        metrics.inc('admission_decisions_total', outcome='admitted_heavy')
+        started = time.monotonic()
+        with self._lock:
+            self._heavy_running += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._heavy_running -= 1
+                self._heavy_seconds = 0.8 * self._heavy_seconds + 0.2 * (time.monotonic() - started)
+            self._slots.release()
+
+    def _prune(self, now):
+        # Buckets that have refilled completely hold nothing worth keeping
+        self._buckets = {user_id: (tokens, updated) for user_id, (tokens, updated) in self._buckets.items()
+                         if tokens + (now - updated) * self.rate < self.burst}
+
+
+admission = AdmissionControl()
+metrics.describe('admission_decisions_total', 'Summarization requests admitted, throttled per user or shed')
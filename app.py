@@ -1,17 +1,48 @@
-from flask import Flask, render_template, request, jsonify, flash, redirect, url_for
+from flask import Flask, Response, render_template, request, jsonify, flash, redirect, url_for, stream_with_context
 from flask_login import LoginManager, current_user, login_required
-from models import db, User, Summary
+from models import db, configure_sqlite, upgrade_schema, Summary, SummaryContent, SummaryRollup
 from auth import auth_bp
-from utils import summarizer
+from utils import summarizer, download_nltk_data, overrunning_tasks, PoolBusy
+from cache import summary_cache
+from jobs import job_queue, QueueFull
+from metrics import metrics
+from duplicates import near_duplicates, minhash_signature, signature_bytes
+from search import summary_search
+from export import FORMATS as EXPORT_FORMATS, iter_export
+from writer import summary_writer, WriteFailed
+from users import user_cache
+from admission import admission, estimate_cost, AdmissionRejected
 from datetime import datetime, timedelta
 import json
-from collections import defaultdict
+import base64
+from sqlalchemy import func, or_, and_
+from sqlalchemy.orm import joinedload, undefer
 
 app = Flask(__name__)
 app.config.from_object('config.Config')
 
 # Initialize extensions
 db.init_app(app)
+configure_sqlite(app)
+summary_cache.init_app(app)
+job_queue.init_app(app)
+metrics.init_app(app)
+metrics.gauge('job_queue_depth', job_queue.depth, 'Jobs waiting for a worker')
+metrics.gauge('job_overrunning', job_queue.overrunning, 'Timed-out jobs still running in the process pool')
+metrics.gauge('batch_overrunning', lambda: overrunning_tasks('batch'),
+              'Timed-out batch chunks still running in the process pool')
+near_duplicates.init_app(app)
+summary_search.init_app(app)
+summary_writer.init_app(app)
+user_cache.init_app(app)
+admission.init_app(app)
+metrics.gauge('admission_heavy_running', admission.heavy_running, 'Heavy summarization requests running')
+metrics.gauge('summary_write_pending', summary_writer.depth, 'Summaries waiting in the write-behind buffer')
+metrics.gauge('near_duplicate_index_size', lambda: near_duplicates.size, 'Summaries in the near-duplicate index')
+
+# Sentiment sampling for very long documents
+summarizer.sentiment_max_sentences = app.config['SENTIMENT_MAX_SENTENCES'] or None
+summarizer.sentiment_scope = app.config['SENTIMENT_SCOPE']
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'auth.login'
@@ -22,7 +53,8 @@ app.register_blueprint(auth_bp, url_prefix='/auth')
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Cached, or from the signed session with the fast path, instead of a query per request
+    return user_cache.load(user_id)
 
 @app.route('/')
 def index():
@@ -34,7 +66,8 @@ def index():
 @login_required
 def dashboard():
     # Get user statistics
-    total_summaries = Summary.query.filter_by(user_id=current_user.id).count()
+    total_summaries = db.session.query(func.coalesce(func.sum(SummaryRollup.count), 0))\
+        .filter(SummaryRollup.user_id == current_user.id).scalar()
     
     # Recent summaries
     recent_summaries = Summary.query.filter_by(user_id=current_user.id)\
@@ -42,16 +75,7 @@ def dashboard():
     
     # Weekly statistics
     week_ago = datetime.utcnow() - timedelta(days=7)
-    weekly_summaries = Summary.query.filter(
-        Summary.user_id == current_user.id,
-        Summary.created_at >= week_ago
-    ).all()
-    
-    # Prepare analytics data
-    daily_counts = defaultdict(int)
-    for summary in weekly_summaries:
-        date_str = summary.created_at.strftime('%Y-%m-%d')
-        daily_counts[date_str] += 1
+    daily_counts = rollup_daily_counts(current_user.id, week_ago)
     
     analytics_data = {
         'labels': list(daily_counts.keys()),
@@ -69,70 +93,353 @@ def summarize_text():
     try:
         data = request.get_json()
         text = data.get('text', '').strip()
-        method = data.get('method', 'lsa')
+        method = summarizer.resolve_method(data.get('method'))
         sentences_count = data.get('sentences_count')
         language = data.get('language', 'english')
         
         if not text:
             return jsonify({'error': 'Text is required'}), 400
         
+        if not supported_language(language):
+            return jsonify({'error': 'Unsupported language'}), 400
+        
         if len(text.split()) < 10:
             return jsonify({'error': 'Text must be at least 10 words long'}), 400
         
-        # Generate summary
-        summary, summary_length, original_length, compression_ratio = summarizer.summarize(
-            text, method, sentences_count, language
-        )
-        
-        # Analyze sentiment
-        sentiment = summarizer.analyze_sentiment(text)
+        # Repeat submissions are served from the cache without re-running the pipeline
+        with metrics.span('cache'):
+            cache_key = summary_cache.make_key(text, method, sentences_count, language)
+            result = summary_cache.get(cache_key)
+        signature = duplicate = None
+        # Async submissions always get a job, even when a duplicate could answer them
+        if result is None and sentences_count is None and not data.get('async') \
+                and near_duplicates.should_reuse(data.get('reuse_duplicates')):
+            # A near-identical text summarized before keeps its stored summary
+            with metrics.span('near_duplicate'):
+                signature = minhash_signature(text)
+                duplicate, similarity = near_duplicates.find(current_user.id, signature, method, language,
+                                                             word_count=len(text.split()))
+            if duplicate is not None:
+                result = summarizer.analyze_with_summary(text, duplicate.summary_text, language)
         
-        # Get text statistics
-        stats = summarizer.get_text_stats(text)
+        if result is None:
+            # Only real analysis is charged; cache hits and reused duplicates are cheap
+            cost = estimate_cost(text, method)
+            if data.get('async'):
+                # Long documents run on the job queue; the client polls the status URL.
+                # The queue's workers bound its concurrency, so only the user's bucket applies
+                admission.take(current_user.id, cost)
+                try:
+                    job = job_queue.submit(text, method, sentences_count, language, current_user.id)
+                except QueueFull:
+                    # Refused work costs nothing
+                    admission.refund(current_user.id, cost)
+                    raise
+                return jsonify({
+                    'job_id': job.id,
+                    'status': job.status,
+                    'status_url': url_for('job_status', job_id=job.id)
+                }), 202
+            
+            # Summary, sentiment and statistics share a single tokenization pass
+            with admission.admit(current_user.id, cost):
+                result = summarizer.analyze(text, method, sentences_count, language)
+            summary_cache.put(cache_key, result)
         
         # Save to database
-        title = text[:100] + '...' if len(text) > 100 else text
-        new_summary = Summary(
-            original_text=text,
-            summary_text=summary,
-            summary_length=summary_length,
-            original_length=original_length,
-            compression_ratio=compression_ratio,
-            user_id=current_user.id,
-            title=title,
-            language=language
-        )
+        with metrics.span('db_commit'):
+            new_summary = Summary.from_analysis(text, result, current_user.id, language, method)
+            new_summary.signature = signature_bytes(signature)
+            if summary_writer.enabled:
+                # Grouped with other requests' rows into one transaction
+                summary_id = summary_writer.save(new_summary)
+            else:
+                db.session.add(new_summary)
+                db.session.commit()
+                summary_id = new_summary.id
+        
+        payload = summary_payload(result, summary_id)
+        if duplicate is not None:
+            payload['duplicate_of'] = {'summary_id': duplicate.id, 'similarity': round(similarity, 3)}
+        return jsonify(payload)
+    
+    except AdmissionRejected as e:
+        return admission_response(e)
+    except QueueFull:
+        response = jsonify({'error': 'Too many pending jobs, please retry shortly'})
+        response.headers['Retry-After'] = str(app.config['JOB_RETRY_AFTER'])
+        return response, 503
+    except WriteFailed as e:
+        return jsonify({'error': f'Summary could not be saved: {e}'}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def supported_language(language):
+    """Whether requests may summarize in language"""
+    return isinstance(language, str) and language in app.config['SUPPORTED_LANGUAGES']
+
+def admission_response(e):
+    """429 or 503 with Retry-After for a request refused by admission control"""
+    response = jsonify({'error': str(e)})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, e.status
+
+def summary_payload(result, summary_id):
+    """Format an analysis result the way /summarize returns it"""
+    return {
+        'summary': result['summary'],
+        'stats': {
+            'original_length': result['original_length'],
+            'summary_length': result['summary_length'],
+            'compression_ratio': round(result['compression_ratio'], 2),
+            'sentiment': round(result['sentiment'], 3)
+        },
+        'text_stats': result['text_stats'],
+        'summary_id': summary_id
+    }
+
+@app.route('/api/jobs/<job_id>')
+@login_required
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None or job.user_id != current_user.id:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    response = job.to_dict()
+    if job.status == 'done':
+        response.update(summary_payload(job.result, job.summary_id))
+    return jsonify(response)
+
+@app.route('/api/summarize/stream', methods=['POST'])
+@login_required
+def summarize_stream():
+    try:
+        # Accept either a multipart file upload or a raw text request body
+        upload = request.files.get('file') if request.mimetype == 'multipart/form-data' else None
+        stream = upload.stream if upload else request.stream
+        method = summarizer.resolve_method(request.args.get('method'))
+        sentences_count = request.args.get('sentences_count', type=int)
+        language = request.args.get('language', 'english')
+        if not supported_language(language):
+            return jsonify({'error': 'Unsupported language'}), 400
+        
+        # The size is only known up front from Content-Length, at about six bytes a word;
+        # an upload without one is treated as heavy
+        if request.content_length:
+            cost = estimate_cost(method=method, words=request.content_length // 6)
+        else:
+            cost = admission.heavy_cost
+        with admission.admit(current_user.id, cost):
+            result = summarizer.analyze_stream(
+                stream, method, sentences_count, language,
+                chunk_words=app.config['STREAM_CHUNK_WORDS'],
+                preview_chars=app.config['STREAM_PREVIEW_CHARS']
+            )
         
+        if result['original_length'] < 10:
+            return jsonify({'error': 'Text must be at least 10 words long'}), 400
+        
+        # Only a bounded preview of the upload is kept as the original text
+        new_summary = Summary.from_analysis(result['preview'], result, current_user.id,
+                                              language, method)
+        if upload and upload.filename:
+            new_summary.title = upload.filename[:200]
         db.session.add(new_summary)
         db.session.commit()
         
+        return jsonify(summary_payload(result, new_summary.id))
+        
+    except AdmissionRejected as e:
+        return admission_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/summarize/batch', methods=['POST'])
+@login_required
+def summarize_batch():
+    try:
+        data = request.get_json() or {}
+        documents = data.get('documents') or []
+        method = summarizer.resolve_method(data.get('method'))
+        sentences_count = data.get('sentences_count')
+        language = data.get('language', 'english')
+        
+        if not isinstance(documents, list) or not documents:
+            return jsonify({'error': 'documents must be a non-empty list'}), 400
+        if not supported_language(language):
+            return jsonify({'error': 'Unsupported language'}), 400
+        
+        max_documents = app.config['BATCH_MAX_DOCUMENTS']
+        if len(documents) > max_documents:
+            return jsonify({'error': f'At most {max_documents} documents per batch'}), 400
+        
+        # Normalize items and validate them individually
+        results = [None] * len(documents)
+        items = []
+        for index, document in enumerate(documents):
+            if not isinstance(document, dict):
+                document = {'text': document}
+            item = {
+                'text': str(document.get('text') or '').strip(),
+                'method': summarizer.resolve_method(document.get('method', method)),
+                'sentences_count': document.get('sentences_count', sentences_count),
+                'language': document.get('language', language)
+            }
+            items.append(item)
+            if not item['text']:
+                results[index] = {'error': 'Text is required'}
+            elif len(item['text'].split()) < 10:
+                results[index] = {'error': 'Text must be at least 10 words long'}
+            elif not supported_language(item['language']):
+                results[index] = {'error': 'Unsupported language'}
+        
+        # Serve repeats from the cache, send the rest to the process pool
+        pending = []
+        for index, item in enumerate(items):
+            if results[index] is not None:
+                continue
+            item['cache_key'] = summary_cache.make_key(
+                item['text'], item['method'], item['sentences_count'], item['language']
+            )
+            results[index] = summary_cache.get(item['cache_key'])
+            if results[index] is None:
+                pending.append(index)
+        
+        # The whole batch is admitted, or refused, as one request
+        cost = sum(estimate_cost(items[index]['text'], items[index]['method']) for index in pending)
+        try:
+            with admission.admit(current_user.id, cost):
+                analyzed = summarizer.summarize_many(
+                    [items[index] for index in pending], max_workers=app.config['BATCH_WORKERS'],
+                    timeout=app.config['BATCH_TIMEOUT']
+                )
+        except PoolBusy:
+            # Refused work costs nothing
+            admission.refund(current_user.id, cost)
+            raise
+        for index, result in zip(pending, analyzed):
+            results[index] = result
+            if 'error' not in result:
+                summary_cache.put(items[index]['cache_key'], result)
+        
+        # Persist every successful item in a single transaction
+        rows = {}
+        for index, result in enumerate(results):
+            if 'error' in result:
+                continue
+            rows[index] = Summary.from_analysis(
+                items[index]['text'], result, current_user.id,
+                items[index]['language'], items[index]['method']
+            )
+        db.session.add_all(list(rows.values()))
+        db.session.commit()
+        
+        response = []
+        for index, result in enumerate(results):
+            if 'error' in result:
+                response.append({'index': index, 'error': result['error']})
+                continue
+            response.append(dict(summary_payload(result, rows[index].id), index=index))
+        
         return jsonify({
-            'summary': summary,
-            'stats': {
-                'original_length': original_length,
-                'summary_length': summary_length,
-                'compression_ratio': round(compression_ratio, 2),
-                'sentiment': round(sentiment, 3)
-            },
-            'text_stats': stats,
-            'summary_id': new_summary.id
+            'results': response,
+            'succeeded': len(rows),
+            'failed': len(results) - len(rows)
         })
         
+    except AdmissionRejected as e:
+        return admission_response(e)
+    except PoolBusy as e:
+        response = jsonify({'error': f'{e}, please retry shortly'})
+        response.headers['Retry-After'] = str(app.config['BATCH_RETRY_AFTER'])
+        return response, 503
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/history')
+@app.route('/api/summarize/corpus', methods=['POST'])
 @login_required
-def history():
-    # Get filter parameters
-    page = request.args.get('page', 1, type=int)
-    per_page = 10
-    
-    # Filtering
-    date_from = request.args.get('date_from')
-    date_to = request.args.get('date_to')
-    min_length = request.args.get('min_length', type=int)
-    max_length = request.args.get('max_length', type=int)
+def summarize_corpus():
+    try:
+        data = request.get_json() or {}
+        summary_ids = data.get('summary_ids') or []
+        sentences_count = data.get('sentences_count')
+        language = data.get('language', 'english')
+        
+        if not isinstance(summary_ids, list) or not summary_ids:
+            return jsonify({'error': 'summary_ids must be a non-empty list'}), 400
+        if not supported_language(language):
+            return jsonify({'error': 'Unsupported language'}), 400
+        try:
+            summary_ids = sorted({int(summary_id) for summary_id in summary_ids})
+        except (TypeError, ValueError):
+            return jsonify({'error': 'summary_ids must be integers'}), 400
+        
+        max_documents = app.config['CORPUS_MAX_DOCUMENTS']
+        if len(summary_ids) > max_documents:
+            return jsonify({'error': f'At most {max_documents} summaries per corpus'}), 400
+        
+        # Only the original texts are needed, streamed straight from the content table
+        rows = db.session.query(Summary.id, SummaryContent.original_text)\
+            .join(SummaryContent, SummaryContent.summary_id == Summary.id)\
+            .filter(Summary.user_id == current_user.id, Summary.id.in_(summary_ids))\
+            .order_by(Summary.id).yield_per(500)
+        found_ids = []
+        texts = []
+        for summary_id, original_text in rows:
+            found_ids.append(summary_id)
+            texts.append(original_text)
+        
+        if not texts:
+            return jsonify({'error': 'No matching summaries found'}), 404
+        
+        result = summarizer.summarize_corpus(texts, sentences_count, language)
+        for sentence in result['sentences']:
+            sentence['summary_id'] = found_ids[sentence.pop('document')]
+        result['compression_ratio'] = round(result['compression_ratio'], 2)
+        result['summary_ids'] = found_ids
+        result['missing_ids'] = sorted(set(summary_ids) - set(found_ids))
+        return jsonify(result)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/duplicates')
+@login_required
+def duplicate_clusters():
+    """Clusters of the current user's near-duplicate summaries, largest first"""
+    try:
+        threshold = request.args.get('threshold', near_duplicates.threshold, type=float)
+        min_size = request.args.get('min_size', 2, type=int)
+        limit = min(request.args.get('limit', 50, type=int), 500)
+        if not 0 < threshold <= 1:
+            return jsonify({'error': 'threshold must be in (0, 1]'}), 400
+        
+        clusters = near_duplicates.clusters(current_user.id, threshold, min_size)
+        shown = clusters[:limit]
+        summaries = {summary.id: summary for summary in Summary.query.filter(
+            Summary.id.in_([summary_id for ids, _ in shown for summary_id in ids])
+        )}
+        return jsonify({
+            'clusters': [{
+                'size': len(ids),
+                'min_similarity': round(weakest, 3),
+                'summaries': [summaries[summary_id].to_dict(include_summary=False)
+                              for summary_id in ids if summary_id in summaries]
+            } for ids, weakest in shown],
+            'total_clusters': len(clusters),
+            'duplicated_summaries': sum(len(ids) for ids, _ in clusters),
+            'threshold': threshold
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def history_query(args):
+    """Summaries of the current user filtered by the history date and length parameters"""
+    date_from = args.get('date_from')
+    date_to = args.get('date_to')
+    min_length = args.get('min_length', type=int)
+    max_length = args.get('max_length', type=int)
     
     query = Summary.query.filter_by(user_id=current_user.id)
     
@@ -145,16 +452,158 @@ def history():
     if max_length:
         query = query.filter(Summary.original_length <= max_length)
     
-    summaries = query.order_by(Summary.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    return query
+
+class KeysetPage:
+    """One page of a keyset (cursor) paginated query"""
+    
+    def __init__(self, items, next_cursor, cursor=None, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.cursor = cursor
+        self.has_next = next_cursor is not None
+        self.total = total
+
+def encode_cursor(summary):
+    raw = f'{summary.created_at.isoformat()}|{summary.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    created_at, summary_id = raw.rsplit('|', 1)
+    return datetime.fromisoformat(created_at), int(summary_id)
+
+def keyset_paginate(query, cursor=None, per_page=10):
+    """Fetch the page after cursor in (created_at, id) descending order.
+
+    Seeks through the (user_id, created_at, id) index instead of counting and
+    skipping rows, so every page costs the same as the first one.
+    """
+    if cursor:
+        created_at, summary_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Summary.created_at < created_at,
+            and_(Summary.created_at == created_at, Summary.id < summary_id)
+        ))
+    
+    items = query.order_by(Summary.created_at.desc(), Summary.id.desc()).limit(per_page + 1).all()
+    next_cursor = encode_cursor(items[per_page - 1]) if len(items) > per_page else None
+    return KeysetPage(items[:per_page], next_cursor, cursor)
+
+def history_total(query, args, mode):
+    """Total for a history query: exact, approximate from the rollup, or skipped"""
+    if mode == 'exact':
+        return query.order_by(None).count()
+    if mode == 'approx' and not (args.get('min_length') or args.get('max_length')):
+        rollup = db.session.query(func.coalesce(func.sum(SummaryRollup.count), 0))\
+            .filter(SummaryRollup.user_id == current_user.id)
+        if args.get('date_from'):
+            rollup = rollup.filter(SummaryRollup.day >= datetime.strptime(args['date_from'], '%Y-%m-%d').date())
+        if args.get('date_to'):
+            rollup = rollup.filter(SummaryRollup.day <= datetime.strptime(args['date_to'], '%Y-%m-%d').date())
+        return rollup.scalar()
+    return None
+
+def search_page(query, args, per_page):
+    """Ranked full-text matches for args['q'] within the history filters, as a KeysetPage"""
+    cursor = args.get('cursor')
+    with metrics.span('search'):
+        rows, next_cursor = summary_search.search(args['q'], current_user.id, query, cursor, per_page)
+    page = KeysetPage([summary for summary, _ in rows], next_cursor, cursor)
+    page.scores = [score for _, score in rows]
+    return page
+
+@app.route('/history')
+@login_required
+def history():
+    per_page = 10
+    query = history_query(request.args)
+    
+    if request.args.get('q') and summary_search.enabled:
+        try:
+            summaries = search_page(query, request.args, per_page)
+        except ValueError:
+            return redirect(url_for('history', q=request.args['q']))
+        return render_template('history.html', summaries=summaries)
+    
+    # Numbered pages are kept for old links; the default is cursor paging
+    if 'page' in request.args:
+        page = request.args.get('page', 1, type=int)
+        summaries = query.order_by(Summary.created_at.desc(), Summary.id.desc()).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
+    else:
+        try:
+            summaries = keyset_paginate(query, request.args.get('cursor'), per_page)
+        except ValueError:
+            return redirect(url_for('history'))
     
     return render_template('history.html', summaries=summaries)
 
+@app.route('/api/history')
+@login_required
+def history_api():
+    per_page = min(request.args.get('per_page', 20, type=int), 100)
+    query = history_query(request.args)
+    
+    try:
+        page = keyset_paginate(query, request.args.get('cursor'), per_page)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    return jsonify({
+        'items': [summary.to_dict(include_summary=False) for summary in page.items],
+        'next_cursor': page.next_cursor,
+        'total': history_total(query, request.args, request.args.get('count'))
+    })
+
+@app.route('/api/export')
+@login_required
+def export_history():
+    """Stream the current user's summaries, filtered like /history, as CSV, JSON Lines, JSON or zip"""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        query = history_query(request.args)
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    include_original = request.args.get('include_original', 'true').lower() != 'false'
+    
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    filename = f"summaries_{datetime.utcnow().strftime('%Y-%m-%d')}.{extension}"
+    # Rows are read through a server-side cursor while the response is being sent
+    return Response(
+        stream_with_context(iter_export(query, export_format, include_original)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@app.route('/api/search')
+@login_required
+def search_api():
+    if not summary_search.enabled:
+        return jsonify({'error': 'Search is disabled'}), 404
+    if not request.args.get('q', '').strip():
+        return jsonify({'error': 'q is required'}), 400
+    per_page = min(request.args.get('per_page', 20, type=int), 100)
+    
+    try:
+        page = search_page(history_query(request.args), request.args, per_page)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    return jsonify({
+        'items': [dict(summary.to_dict(include_summary=False), score=round(score, 6))
+                  for summary, score in zip(page.items, page.scores)],
+        'next_cursor': page.next_cursor
+    })
+
 @app.route('/summary/<int:summary_id>')
 @login_required
 def view_summary(summary_id):
-    summary = Summary.query.filter_by(id=summary_id, user_id=current_user.id).first_or_404()
+    summary = Summary.query.options(joinedload(Summary.content), undefer(Summary.summary_text))\
+        .filter_by(id=summary_id, user_id=current_user.id).first_or_404()
     return render_template('summary.html', summary=summary)
 
 @app.route('/api/analytics')
@@ -170,33 +619,31 @@ def get_analytics():
     else:  # week
         start_date = datetime.utcnow() - timedelta(days=7)
     
-    summaries = Summary.query.filter(
-        Summary.user_id == current_user.id,
-        Summary.created_at >= start_date
-    ).all()
-    
-    # Prepare data for charts
-    daily_counts = defaultdict(int)
-    method_counts = defaultdict(int)
-    length_ranges = defaultdict(int)
-    
-    for summary in summaries:
-        # Daily counts
-        date_str = summary.created_at.strftime('%Y-%m-%d')
-        daily_counts[date_str] += 1
-        
-        # Method usage (though we only have one method now, structure for future)
-        method_counts['standard'] += 1
-        
-        # Length ranges
-        if summary.original_length < 100:
-            length_ranges['<100'] += 1
-        elif summary.original_length < 500:
-            length_ranges['100-500'] += 1
-        elif summary.original_length < 1000:
-            length_ranges['500-1000'] += 1
-        else:
-            length_ranges['>1000'] += 1
+    # Charts are served from the daily rollup, never from the Summary rows
+    rollup_filter = (SummaryRollup.user_id == current_user.id,
+                     SummaryRollup.day >= start_date.date())
+    daily_counts = rollup_daily_counts(current_user.id, start_date)
+    
+    method_counts = dict(
+        db.session.query(SummaryRollup.method, func.sum(SummaryRollup.count))
+        .filter(*rollup_filter).group_by(SummaryRollup.method)
+        .order_by(SummaryRollup.method).all()
+    )
+    
+    totals = db.session.query(
+        *[func.coalesce(func.sum(getattr(SummaryRollup, column)), 0)
+          for _, column in SummaryRollup.LENGTH_BUCKETS],
+        func.coalesce(func.sum(SummaryRollup.count), 0),
+        func.coalesce(func.sum(SummaryRollup.original_words), 0),
+        func.coalesce(func.sum(SummaryRollup.summary_words), 0),
+        func.coalesce(func.sum(SummaryRollup.compression_sum), 0.0)
+    ).filter(*rollup_filter).one()
+    
+    length_ranges = {}
+    for (label, _), count in zip(SummaryRollup.LENGTH_BUCKETS, totals):
+        if count:
+            length_ranges[label] = count
+    summary_count, original_words, summary_words, compression_sum = totals[-4:]
     
     return jsonify({
         'daily_counts': {
@@ -210,9 +657,22 @@ def get_analytics():
         'length_ranges': {
             'labels': list(length_ranges.keys()),
             'data': list(length_ranges.values())
+        },
+        'totals': {
+            'summaries': summary_count,
+            'original_words': original_words,
+            'summary_words': summary_words,
+            'avg_compression_ratio': round(compression_sum / summary_count, 2) if summary_count else 0
         }
     })
 
+def rollup_daily_counts(user_id, start_date):
+    """Summaries per day since start_date, read from the rollup table"""
+    rows = db.session.query(SummaryRollup.day, func.sum(SummaryRollup.count))\
+        .filter(SummaryRollup.user_id == user_id, SummaryRollup.day >= start_date.date())\
+        .group_by(SummaryRollup.day).order_by(SummaryRollup.day).all()
+    return {day.strftime('%Y-%m-%d'): count for day, count in rows if count}
+
 @app.route('/delete_summary/<int:summary_id>', methods=['POST'])
 @login_required
 def delete_summary(summary_id):
@@ -232,10 +692,63 @@ def internal_error(error):
     db.session.rollback()
     return render_template('500.html'), 500
 
-# Create tables
-with app.app_context():
-    db.create_all()
+# Tables are created on the first request rather than at import time
+_tables_ready = False
+
+@app.before_request
+def ensure_tables():
+    global _tables_ready
+    if not _tables_ready and app.config['AUTO_CREATE_TABLES']:
+        upgrade_schema()
+        summary_search.setup()
+        _tables_ready = True
+
+def warm_up():
+    """Create tables, load the near-duplicate index and preload NLP models.
+
+    Run it before a worker starts taking traffic, from the server's worker
+    start hook, e.g. gunicorn's post_worker_init.
+    """
+    global _tables_ready
+    with app.app_context():
+        upgrade_schema()
+        summary_search.setup()
+        if near_duplicates.enabled:
+            near_duplicates.load()
+    _tables_ready = True
+    summarizer.warm_up(app.config['WARM_UP_LANGUAGES'])
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create the database tables, upgrading the tables of an older database"""
+    created = upgrade_schema()
+    summary_search.setup()
+    print(f"Database tables created ({', '.join(sorted(created)) or 'none new'}) and upgraded.")
+
+@app.cli.command('rollup-backfill')
+def rollup_backfill_command():
+    """Rebuild the analytics rollup table from existing summaries"""
+    rows = SummaryRollup.backfill()
+    print(f'Rebuilt {rows} rollup rows.')
+
+@app.cli.command('signature-backfill')
+def signature_backfill_command():
+    """Compute near-duplicate signatures for summaries that have none"""
+    rows = near_duplicates.backfill()
+    print(f'Signed {rows} summaries.')
+
+@app.cli.command('search-rebuild')
+def search_rebuild_command():
+    """Rebuild the full-text search index from existing summaries"""
+    rows = summary_search.rebuild()
+    print(f'Indexed {rows} summaries with {summary_search.backend}.')
+
+@app.cli.command('download-nltk')
+def download_nltk_command():
+    """Download the NLTK data used by the summarizer"""
+    download_nltk_data()
 
 if __name__ == '__main__':
+    warm_up()
     app.run(debug=True, host='0.0.0.0')
 
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
 from models import db, User
+from users import user_cache
 from werkzeug.security import check_password_hash
 
 auth_bp = Blueprint('auth', __name__)
@@ -60,6 +61,7 @@ def login():
             return render_template('login.html')
         
         login_user(user, remember=remember)
+        user_cache.remember(user)
         return redirect(url_for('dashboard'))
     
     return render_template('login.html')
@@ -68,6 +70,7 @@ def login():
 @login_required
 def logout():
     logout_user()
+    user_cache.forget()
     flash('You have been logged out successfully!', 'success')
     return redirect(url_for('auth.login'))
 
@@ -0,0 +1,207 @@
+"""Benchmark suite for the summarization hot path.
+
+Builds synthetic corpora offline at fixed sizes, times every summarization
+method plus sentiment and statistics, and reports latency percentiles,
+throughput and peak memory as JSON. With --baseline it compares the run
+against a saved result and exits non-zero on regressions.
+
+    python benchmark.py --sizes 1000 10000 100000 --output bench.json
+    python benchmark.py --baseline bench.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from segmenter import get_segmenter
+from utils import summarizer
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+
+# Vocabulary for the synthetic corpus; common words first so a Zipf draw
+# gives a realistic frequency profile
+COMMON_WORDS = ('the of and to in a is that for it as was with be by on not he this are or '
+                'his from at which but have an they you were her she there been one all would '
+                'their we him has when who will more no if out so said what up its about into '
+                'than them can only other new some could time these two may then do first any').split()
+CONTENT_WORDS = ('market energy climate research policy growth network system data model '
+                 'company government report analysis technology health student teacher price '
+                 'economy product customer service water city science energy solar wind carbon '
+                 'learning algorithm patient hospital treatment study result evidence change '
+                 'industry worker supply demand investment strategy security privacy software '
+                 'hardware device platform community region country global local future risk').split()
+SENTIMENT_WORDS = ('good great excellent positive strong important significant successful '
+                   'bad poor negative weak difficult serious terrible uncertain').split()
+
+
+def generate_corpus(word_count, seed=0):
+    """Generate deterministic synthetic text of word_count words"""
+    rng = random.Random(seed)
+    vocabulary = COMMON_WORDS + CONTENT_WORDS + SENTIMENT_WORDS
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    sentences = []
+    produced = 0
+    while produced < word_count:
+        length = min(rng.randint(8, 30), word_count - produced)
+        words = rng.choices(vocabulary, weights, k=length)
+        words[0] = words[0].capitalize()
+        sentences.append(' '.join(words) + rng.choice('...!?'))
+        produced += length
+    # Group sentences into paragraphs so the cleaner sees newlines too
+    paragraphs = [' '.join(sentences[index:index + 6]) for index in range(0, len(sentences), 6)]
+    return '\n\n'.join(paragraphs)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def measure(function, text, repeat, setup=None):
+    """Time function(text) repeat times, then record the peak traced memory of one more run.
+
+    setup() runs untimed before each of them. Tracing slows allocation
+    several fold, so the timed runs are untraced.
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        function(text)
+        timings.append(time.perf_counter() - started)
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        function(text)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return timings, peak
+
+
+def benchmark_cases():
+    """Name -> callable(text) for everything on the hot path.
+
+    Summaries and the full analysis reuse per-sentence artifacts of text seen
+    before; their plain cases start from an empty store every run, and the
+    .warm cases measure a repeated document.
+    """
+    cases = {'segment': lambda text: get_segmenter().segment(text)}
+    for method in summarizer.available_methods:
+        cases[f'summarize.{method}'] = lambda text, method=method: summarizer.summarize(text, method)
+    cases['sentiment'] = summarizer.analyze_sentiment
+    cases['sentiment.textblob'] = lambda text: summarizer.analyze_sentiment(text, legacy=True)
+    cases['stats'] = summarizer.get_text_stats
+    cases['analyze'] = summarizer.analyze
+    for name in [name for name in cases if name.startswith(('summarize.', 'analyze'))]:
+        cases[f'{name}.warm'] = cases[name]
+    return cases
+
+
+def run(sizes, repeat, cases=None, seed=0):
+    """Run the selected cases at every size and return the JSON-ready report"""
+    all_cases = benchmark_cases()
+    unknown = sorted(set(cases or ()) - set(all_cases))
+    if unknown:
+        raise ValueError(f"Unknown cases {', '.join(unknown)}; available: {', '.join(all_cases)}")
+    selected = {name: all_cases[name] for name in (cases or all_cases)}
+    summarizer.warm_up()
+
+    results = []
+    for size in sizes:
+        text = generate_corpus(size, seed)
+        megabytes = len(text.encode('utf-8')) / (1024 * 1024)
+        for name, function in selected.items():
+            # Fewer repeats on the largest inputs keep the suite usable
+            runs = repeat if size <= 100000 else max(1, repeat // 3)
+            if name.endswith('.warm'):
+                function(text)
+                timings, peak = measure(function, text, runs)
+            else:
+                timings, peak = measure(function, text, runs, summarizer.artifacts.clear)
+            p50 = percentile(timings, 0.5)
+            results.append({
+                'case': name,
+                'words': size,
+                'runs': runs,
+                'p50_ms': round(p50 * 1000, 3),
+                'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+                'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+                'words_per_s': round(size / p50, 1) if p50 else None,
+                'mb_per_s': round(megabytes / p50, 3) if p50 else None,
+                'peak_memory_mb': round(peak / (1024 * 1024), 3)
+            })
+            print(f"{name:<22} {size:>8} words  p50 {results[-1]['p50_ms']:>10.2f} ms  "
+                  f"peak {results[-1]['peak_memory_mb']:>8.2f} MB", file=sys.stderr)
+
+    return {
+        'generated_at': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'seed': seed,
+        'results': results
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Return the cases whose p50 latency or peak memory regressed beyond tolerance"""
+    previous = {(row['case'], row['words']): row for row in baseline.get('results', [])}
+    regressions = []
+    for row in report['results']:
+        base = previous.get((row['case'], row['words']))
+        if base is None:
+            continue
+        for metric in ('p50_ms', 'peak_memory_mb'):
+            if base[metric] and row[metric] > base[metric] * (1 + tolerance):
+                regressions.append({
+                    'case': row['case'],
+                    'words': row['words'],
+                    'metric': metric,
+                    'baseline': base[metric],
+                    'current': row[metric],
+                    'change': round(row[metric] / base[metric] - 1, 3)
+                })
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the summarization hot path')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Corpus sizes in words')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per case and size')
+    parser.add_argument('--cases', nargs='+', choices=list(benchmark_cases()), metavar='CASE',
+                        help='Only run these cases, from: %(choices)s')
+    parser.add_argument('--seed', type=int, default=0, help='Corpus generator seed')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    parser.add_argument('--baseline', help='Compare against this saved JSON report')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed slowdown before a case counts as a regression')
+
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.repeat, args.cases, args.seed)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            report['regressions'] = compare(report, json.load(f), args.tolerance)
+        exit_code = 1 if report['regressions'] else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    sys.exit(exit_code)
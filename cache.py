@@ -0,0 +1,172 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from metrics import metrics
+from models import db, CachedSummary
+from utils import ANALYSIS_VERSION, clean_text
+
+
+class SummaryCache:
+    """Content-addressed cache for summarization results.
+
+    Entries live in a bounded in-process LRU tier and, when enabled, in the
+    ``CachedSummary`` table so they survive restarts and are shared between
+    worker processes. Both tiers expire entries after ``ttl`` seconds.
+    """
+
+    # Trim the persistent tier once every this many writes
+    PRUNE_INTERVAL = 100
+
+    def __init__(self, max_size=512, ttl=7 * 24 * 3600, persistent=False, max_rows=50000):
+        self.enabled = True
+        self.max_size = max_size
+        self.ttl = ttl
+        self.persistent = persistent
+        self.max_rows = max_rows
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.evictions = 0
+
+    def init_app(self, app):
+        """Configure the cache from the Flask app config"""
+        self.enabled = app.config.get('SUMMARY_CACHE_ENABLED', True)
+        self.max_size = app.config.get('SUMMARY_CACHE_SIZE', self.max_size)
+        self.ttl = app.config.get('SUMMARY_CACHE_TTL', self.ttl)
+        self.persistent = app.config.get('SUMMARY_CACHE_PERSISTENT', self.persistent)
+        self.max_rows = app.config.get('SUMMARY_CACHE_MAX_ROWS', self.max_rows)
+
+    @staticmethod
+    def make_key(text, method='lsa', sentences_count=None, language='english'):
+        """Hash the cleaned text together with the summarization parameters and analysis version"""
+        digest = hashlib.sha256()
+        digest.update(clean_text(text).encode('utf-8'))
+        digest.update(f'\0{method}\0{sentences_count}\0{language}\0{ANALYSIS_VERSION}'.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached payload for key, or None on a miss"""
+        if not self.enabled:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                payload, stored_at = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    metrics.inc('summary_cache_lookups_total', outcome='memory_hit')
+                    return payload
+                del self._entries[key]
+                self.evictions += 1
+
+        payload = self._db_get(key) if self.persistent else None
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+                metrics.inc('summary_cache_lookups_total', outcome='miss')
+                return None
+            self.hits += 1
+            self.db_hits += 1
+        metrics.inc('summary_cache_lookups_total', outcome='db_hit')
+        self._memory_put(key, payload)
+        return payload
+
+    def put(self, key, payload):
+        """Store payload (a JSON-serialisable dict) under key"""
+        if not self.enabled:
+            return
+        self._memory_put(key, payload)
+        if self.persistent:
+            self._db_put(key, payload)
+
+    def clear(self):
+        """Drop every entry from the in-process tier"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters and current tier sizes"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'memory_hits': self.memory_hits,
+                'db_hits': self.db_hits,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'max_size': self.max_size
+            }
+
+    def _memory_put(self, key, payload):
+        with self._lock:
+            self._entries[key] = (payload, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _db_get(self, key):
+        try:
+            row = db.session.get(CachedSummary, key)
+        except SQLAlchemyError:
+            db.session.rollback()
+            return None
+        if row is None:
+            return None
+        if row.created_at < datetime.utcnow() - timedelta(seconds=self.ttl):
+            return None
+        return json.loads(row.payload)
+
+    def _db_put(self, key, payload):
+        try:
+            db.session.merge(CachedSummary(key=key, payload=json.dumps(payload),
+                                           created_at=datetime.utcnow()))
+            db.session.commit()
+        except SQLAlchemyError:
+            # Another worker stored the same key first; the cache is best effort
+            db.session.rollback()
+            return
+
+        self._writes += 1
+        if self._writes % self.PRUNE_INTERVAL == 0:
+            self.prune()
+
+    def prune(self):
+        """Delete expired rows and trim the persistent tier to max_rows"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+        try:
+            expired = CachedSummary.query.filter(CachedSummary.created_at < cutoff)\
+                .delete(synchronize_session=False)
+            overflow = CachedSummary.query.count() - self.max_rows
+            if overflow > 0:
+                oldest = db.session.query(CachedSummary.key)\
+                    .order_by(CachedSummary.created_at.asc()).limit(overflow)
+                CachedSummary.query.filter(CachedSummary.key.in_(oldest.scalar_subquery()))\
+                    .delete(synchronize_session=False)
+                expired += overflow
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            return 0
+        with self._lock:
+            self.evictions += expired
+        return expired
+
+
+summary_cache = SummaryCache()
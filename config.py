@@ -7,3 +7,109 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
 
+
+    # Summary cache: in-process LRU tier plus optional database tier
+    SUMMARY_CACHE_ENABLED = os.environ.get('SUMMARY_CACHE_ENABLED', 'true').lower() == 'true'
+    SUMMARY_CACHE_SIZE = int(os.environ.get('SUMMARY_CACHE_SIZE', 512))
+    SUMMARY_CACHE_TTL = int(os.environ.get('SUMMARY_CACHE_TTL', 7 * 24 * 3600))
+    SUMMARY_CACHE_PERSISTENT = os.environ.get('SUMMARY_CACHE_PERSISTENT', 'false').lower() == 'true'
+    SUMMARY_CACHE_MAX_ROWS = int(os.environ.get('SUMMARY_CACHE_MAX_ROWS', 50000))
+
+    # Logged-in user loading: per-process cache of user records, dropped when a
+    # user is changed. With the session fast path a signed copy of the user in
+    # the session cookie is trusted for USER_SESSION_MAX_AGE seconds without a query
+    USER_CACHE_ENABLED = os.environ.get('USER_CACHE_ENABLED', 'true').lower() == 'true'
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))
+    USER_SESSION_FAST_PATH = os.environ.get('USER_SESSION_FAST_PATH', 'false').lower() == 'true'
+    USER_SESSION_MAX_AGE = int(os.environ.get('USER_SESSION_MAX_AGE', 300))
+
+    # Admission control for summarization, with costs in estimated milliseconds of
+    # analysis: per-user token buckets refilled at ADMISSION_RATE per second up to
+    # ADMISSION_BURST, and at most ADMISSION_HEAVY_SLOTS requests costing
+    # ADMISSION_HEAVY_COST or more running per process (0 means half the CPUs)
+    ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', 'true').lower() == 'true'
+    ADMISSION_RATE = float(os.environ.get('ADMISSION_RATE', 1000))
+    ADMISSION_BURST = float(os.environ.get('ADMISSION_BURST', 10000))
+    ADMISSION_HEAVY_COST = float(os.environ.get('ADMISSION_HEAVY_COST', 250))
+    ADMISSION_HEAVY_SLOTS = int(os.environ.get('ADMISSION_HEAVY_SLOTS', 0))
+    ADMISSION_HEAVY_WAIT = float(os.environ.get('ADMISSION_HEAVY_WAIT', 1.0))
+
+    # Languages requests may ask for; anything else is refused with 400
+    SUPPORTED_LANGUAGES = tuple(os.environ.get(
+        'SUPPORTED_LANGUAGES',
+        'czech,english,french,german,greek,italian,portuguese,slovak,spanish,ukrainian').split(','))
+
+    # Batch summarization; items not analyzed within BATCH_TIMEOUT seconds fail
+    BATCH_MAX_DOCUMENTS = int(os.environ.get('BATCH_MAX_DOCUMENTS', 1000))
+    BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', os.cpu_count() or 1))
+    BATCH_TIMEOUT = int(os.environ.get('BATCH_TIMEOUT', 120))
+    # Retry-After for batches refused while timed-out chunks hold every worker
+    BATCH_RETRY_AFTER = int(os.environ.get('BATCH_RETRY_AFTER', 30))
+
+    # Corpus summaries over a selection of saved summaries
+    CORPUS_MAX_DOCUMENTS = int(os.environ.get('CORPUS_MAX_DOCUMENTS', 5000))
+
+    # Near-duplicate detection: reuse the stored summary of a near-identical text
+    # (estimated Jaccard similarity of word shingles at least the threshold)
+    NEAR_DUPLICATES_ENABLED = os.environ.get('NEAR_DUPLICATES_ENABLED', 'true').lower() == 'true'
+    NEAR_DUPLICATE_REUSE = os.environ.get('NEAR_DUPLICATE_REUSE', 'false').lower() == 'true'
+    NEAR_DUPLICATE_THRESHOLD = float(os.environ.get('NEAR_DUPLICATE_THRESHOLD', 0.9))
+    # Reuse also needs the two texts' word counts within this ratio of each other
+    NEAR_DUPLICATE_LENGTH_RATIO = float(os.environ.get('NEAR_DUPLICATE_LENGTH_RATIO', 0.9))
+    NEAR_DUPLICATE_REFRESH = int(os.environ.get('NEAR_DUPLICATE_REFRESH', 30))
+
+    # Full-text search of summary history: 'auto' uses SQLite FTS5 when available
+    # and the inverted index table otherwise; 'fts5' or 'inverted' force one
+    SEARCH_ENABLED = os.environ.get('SEARCH_ENABLED', 'true').lower() == 'true'
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'auto')
+    # Queries matching more summaries than this rank only the newest ones
+    SEARCH_RANK_WINDOW = int(os.environ.get('SEARCH_RANK_WINDOW', 1000))
+
+    # Write-behind group commit of new summaries from /summarize and the job queue.
+    # Durability 'commit' answers once the row's group is committed; 'buffer'
+    # answers as soon as it is queued and may lose the last interval on a crash
+    SUMMARY_WRITE_BEHIND = os.environ.get('SUMMARY_WRITE_BEHIND', 'false').lower() == 'true'
+    SUMMARY_WRITE_BATCH = int(os.environ.get('SUMMARY_WRITE_BATCH', 200))
+    SUMMARY_WRITE_INTERVAL = float(os.environ.get('SUMMARY_WRITE_INTERVAL', 0.05))
+    SUMMARY_WRITE_DURABILITY = os.environ.get('SUMMARY_WRITE_DURABILITY', 'commit')
+    SUMMARY_WRITE_MAX_PENDING = int(os.environ.get('SUMMARY_WRITE_MAX_PENDING', 10000))
+    SUMMARY_ID_BLOCK = int(os.environ.get('SUMMARY_ID_BLOCK', 100))
+
+    # SQLite connection pragmas; an empty value keeps SQLite's default. WAL lets
+    # readers run alongside the writer and synchronous=NORMAL syncs at checkpoints
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'wal')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'normal')
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', -65536))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    SQLITE_TEMP_STORE = os.environ.get('SQLITE_TEMP_STORE', 'memory')
+
+    # Asynchronous job queue for long documents
+    JOB_QUEUE_SIZE = int(os.environ.get('JOB_QUEUE_SIZE', 100))
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_TIMEOUT = int(os.environ.get('JOB_TIMEOUT', 300))
+    JOB_RESULT_TTL = int(os.environ.get('JOB_RESULT_TTL', 3600))
+    JOB_RETRY_AFTER = int(os.environ.get('JOB_RETRY_AFTER', 30))
+
+    # Streaming summarization of large uploads
+    STREAM_CHUNK_WORDS = int(os.environ.get('STREAM_CHUNK_WORDS', 2000))
+    STREAM_PREVIEW_CHARS = int(os.environ.get('STREAM_PREVIEW_CHARS', 10000))
+
+    # Sentiment of very long documents: score at most this many sentences (0 scores
+    # all of them), either an evenly spaced sample or the summary sentences
+    SENTIMENT_MAX_SENTENCES = int(os.environ.get('SENTIMENT_MAX_SENTENCES', 0))
+    SENTIMENT_SCOPE = os.environ.get('SENTIMENT_SCOPE', 'sample')
+
+    # Prometheus metrics at /metrics and optional Server-Timing response headers
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_TIMING_HEADERS = os.environ.get('METRICS_TIMING_HEADERS', 'false').lower() == 'true'
+    # Only scrapes with the bearer METRICS_TOKEN, or from METRICS_ALLOWED_IPS (comma-separated
+    # addresses or networks), can read /metrics; with neither set it answers 404. Behind a
+    # reverse proxy every client has the proxy's address, so list scrapers' networks with care
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+    METRICS_ALLOWED_IPS = tuple(filter(None, os.environ.get('METRICS_ALLOWED_IPS', '').split(',')))
+
+    # Startup
+    AUTO_CREATE_TABLES = os.environ.get('AUTO_CREATE_TABLES', 'true').lower() == 'true'
+    WARM_UP_LANGUAGES = tuple(os.environ.get('WARM_UP_LANGUAGES', 'english').split(','))
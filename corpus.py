@@ -0,0 +1,209 @@
+import numpy as np
+
+from utils import Document, SparseMatrix
+
+
+class CorpusSummarizer:
+    """One extractive summary across many documents.
+
+    All sentences share one vocabulary and are ranked on a single similarity
+    graph. The graph links each sentence to its most similar neighbours,
+    which are found by sorting SimHash signatures of the tf-idf vectors and
+    comparing only sentences that land within a small window of each other
+    in several random orders. Work therefore grows with the number of
+    sentences rather than with its square. Identical and near-identical
+    sentences are merged first; how often a sentence was repeated becomes
+    its prior in the ranking, so points many documents make rank higher.
+    """
+
+    NEIGHBOURS = 10
+    MIN_SIMILARITY = 0.05
+    DUPLICATE_SIMILARITY = 0.9
+    HASH_TABLES = 4
+    HASH_BITS = 16
+    WINDOW = 5
+    PAIR_BLOCK = 200000
+    DAMPING = 0.85
+    TOLERANCE = 1e-6
+    MAX_ITERATIONS = 100
+
+    def __init__(self, artifacts=None, seed=0):
+        self.artifacts = artifacts
+        self.seed = seed
+
+    def summarize(self, texts, sentences_count=10, language='english'):
+        """Summarize texts jointly and return the summary with its provenance"""
+        sentences = []
+        document_ids = []
+        original_length = 0
+        for document_id, text in enumerate(texts):
+            document = Document.from_text(text, language)
+            sentences.extend(document.sentences)
+            document_ids.extend([document_id] * document.sentence_count)
+            original_length += document.word_count
+        document_ids = np.array(document_ids, dtype=np.int64)
+
+        corpus = Document.from_sentences(sentences, language)
+        if self.artifacts is not None:
+            corpus.attach_terms(self.artifacts.term_index(corpus)[0])
+        vectors = self.tfidf_vectors(corpus)
+
+        pairs, similarities = self.neighbour_pairs(vectors)
+        representatives = self.deduplicate(corpus.sentence_hashes(), pairs, similarities)
+        scores = self.rank(representatives, pairs, similarities)
+
+        best = np.argsort(-scores, kind='stable')[:sentences_count]
+        best = best[scores[best] > 0]
+        chosen = sorted(best.tolist())
+        summary = ' '.join(sentences[index] for index in chosen)
+        summary_length = len(summary.split())
+
+        return {
+            'summary': summary,
+            'sentences': [{'text': sentences[index],
+                           'document': int(document_ids[index]),
+                           'score': float(scores[index])} for index in chosen],
+            'documents': len(texts),
+            'sentence_count': len(sentences),
+            'unique_sentences': int((representatives == np.arange(len(sentences))).sum()),
+            'summary_length': summary_length,
+            'original_length': original_length,
+            'compression_ratio': original_length / summary_length if summary_length else 1.0
+        }
+
+    @staticmethod
+    def tfidf_vectors(corpus):
+        """L2-normalised sentence x term tf-idf matrix, rows sorted with sorted columns"""
+        term_ids, sentence_ids, vocabulary = corpus.terms()
+        counts = SparseMatrix.from_pairs(sentence_ids, term_ids,
+                                         (corpus.sentence_count, len(vocabulary)))
+        frequency = np.bincount(counts.cols, minlength=counts.shape[1])
+        idf = np.log((1 + counts.shape[0]) / (1 + frequency)) + 1.0
+        weighted = counts.with_data(counts.data * idf[counts.cols])
+        norms = weighted.row_norms()
+        return weighted.with_data(weighted.data / norms[weighted.rows])
+
+    def neighbour_pairs(self, vectors):
+        """Candidate pairs (i < j) from SimHash sorted windows, with their exact cosine"""
+        n_sentences, n_terms = vectors.shape
+        empty = np.zeros((0, 2), dtype=np.int64), np.zeros(0)
+        nonempty = np.flatnonzero(np.bincount(vectors.rows, minlength=n_sentences))
+        if nonempty.size < 2:
+            return empty
+
+        rng = np.random.default_rng(self.seed)
+        planes = rng.standard_normal((n_terms, self.HASH_TABLES * self.HASH_BITS))
+        projections = vectors.dot(planes)[nonempty]
+        bits = (projections > 0).reshape(-1, self.HASH_TABLES, self.HASH_BITS)
+        codes = (bits * (1 << np.arange(self.HASH_BITS - 1, -1, -1))).sum(axis=2)
+
+        candidates = []
+        for table in range(self.HASH_TABLES):
+            # Equal codes sort together, ties broken by the first projection
+            order = nonempty[np.lexsort((projections[:, table * self.HASH_BITS], codes[:, table]))]
+            for offset in range(1, min(self.WINDOW, order.size - 1) + 1):
+                candidates.append(np.column_stack((order[:-offset], order[offset:])))
+        candidates = np.sort(np.concatenate(candidates), axis=1)
+        keys = np.unique(candidates[:, 0] * n_sentences + candidates[:, 1])
+        pairs = np.column_stack((keys // n_sentences, keys % n_sentences))
+
+        row_lengths = np.bincount(vectors.rows, minlength=n_sentences)
+        row_starts = np.concatenate(([0], np.cumsum(row_lengths)[:-1]))
+        keys = vectors.rows * n_terms + vectors.cols
+        similarities = np.concatenate([
+            self.pair_similarity(vectors, pairs[start:start + self.PAIR_BLOCK],
+                                 row_starts, row_lengths, keys)
+            for start in range(0, len(pairs), self.PAIR_BLOCK)
+        ])
+        keep = similarities >= self.MIN_SIMILARITY
+        return pairs[keep], similarities[keep]
+
+    @staticmethod
+    def pair_similarity(vectors, pairs, row_starts, row_lengths, keys):
+        """Dot products of the given row pairs of a row-sorted sparse matrix"""
+        n_terms = vectors.shape[1]
+        # Walk the shorter row of each pair and look its terms up in the other
+        swap = row_lengths[pairs[:, 0]] > row_lengths[pairs[:, 1]]
+        pairs = np.where(swap[:, None], pairs[:, ::-1], pairs)
+        lengths = row_lengths[pairs[:, 0]]
+        pair_ids = np.repeat(np.arange(len(pairs)), lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        entries = np.repeat(row_starts[pairs[:, 0]], lengths) + offsets
+        lookups = pairs[pair_ids, 1] * n_terms + vectors.cols[entries]
+        found = np.minimum(np.searchsorted(keys, lookups), len(keys) - 1)
+        match = keys[found] == lookups
+        return np.bincount(pair_ids[match],
+                           weights=vectors.data[entries[match]] * vectors.data[found[match]],
+                           minlength=len(pairs))
+
+    def deduplicate(self, hashes, pairs, similarities):
+        """Representative (lowest index) of every sentence's duplicate cluster"""
+        n_sentences = len(hashes)
+        first = {}
+        representatives = np.array([first.setdefault(key, index) for index, key in enumerate(hashes)],
+                                   dtype=np.int64)
+        near = pairs[similarities >= self.DUPLICATE_SIMILARITY]
+        # Propagate the smallest label along duplicate links until stable
+        for _ in range(n_sentences):
+            labels = representatives.copy()
+            np.minimum.at(labels, near[:, 0], labels[near[:, 1]])
+            np.minimum.at(labels, near[:, 1], labels[near[:, 0]])
+            labels = labels[labels]
+            if np.array_equal(labels, representatives):
+                break
+            representatives = labels
+        return representatives
+
+    def rank(self, representatives, pairs, similarities):
+        """PageRank scores over the top-neighbour graph of representative sentences"""
+        n_sentences = len(representatives)
+        scores = np.zeros(n_sentences)
+        nodes = np.flatnonzero(representatives == np.arange(n_sentences))
+        if not nodes.size:
+            return scores
+        node_of = np.full(n_sentences, -1, dtype=np.int64)
+        node_of[nodes] = np.arange(nodes.size)
+        size = nodes.size
+
+        # Edges between clusters, both directions, the strongest per node pair
+        left = node_of[representatives[pairs[:, 0]]]
+        right = node_of[representatives[pairs[:, 1]]]
+        distinct = (left != right) & (similarities < self.DUPLICATE_SIMILARITY)
+        sources = np.concatenate((left[distinct], right[distinct]))
+        targets = np.concatenate((right[distinct], left[distinct]))
+        weights = np.tile(similarities[distinct], 2)
+        keys, inverse = np.unique(sources * size + targets, return_inverse=True)
+        strongest = np.zeros(keys.size)
+        np.maximum.at(strongest, inverse, weights)
+        sources, targets, weights = keys // size, keys % size, strongest
+
+        # Keep each node's top neighbours, then make the graph symmetric again
+        order = np.lexsort((-weights, sources))
+        sources, targets, weights = sources[order], targets[order], weights[order]
+        group_starts = np.searchsorted(sources, sources)
+        top = np.arange(sources.size) - group_starts < self.NEIGHBOURS
+        keys = np.concatenate((sources[top] * size + targets[top], targets[top] * size + sources[top]))
+        both = np.tile(weights[top], 2)
+        keys, inverse = np.unique(keys, return_inverse=True)
+        weights = np.zeros(keys.size)
+        np.maximum.at(weights, inverse, both)
+        graph = SparseMatrix(keys // size, keys % size, weights, (size, size))
+
+        # Repeated sentences get proportionally more of the teleport mass
+        prior = np.bincount(node_of[representatives], minlength=size).astype(np.float64)
+        prior /= prior.sum()
+        out_weight = np.bincount(graph.rows, weights=graph.data, minlength=size)
+        dangling = out_weight <= 0
+        out_weight[dangling] = 1.0
+
+        ranks = prior.copy()
+        for _ in range(self.MAX_ITERATIONS):
+            spread = graph.tdot(ranks / out_weight)
+            updated = (1.0 - self.DAMPING) * prior \
+                + self.DAMPING * (spread + ranks[dangling].sum() * prior)
+            converged = np.abs(updated - ranks).sum() < self.TOLERANCE
+            ranks = updated
+            if converged:
+                break
+        scores[nodes] = ranks
+        return scores
@@ -0,0 +1,415 @@
+import hashlib
+import threading
+import time
+import zlib
+
+import numpy as np
+from sqlalchemy import bindparam, event
+from sqlalchemy.orm import Session, undefer
+
+from metrics import metrics
+from models import db, IdBlock, Summary, SummaryContent
+from segmenter import KEPT_PUNCTUATION
+from utils import clean_text
+
+# Words per shingle, and the MinHash layout: BANDS bands of ROWS values each
+SHINGLE_WORDS = 3
+BANDS = 8
+ROWS = 8
+NUM_PERM = BANDS * ROWS
+SIGNATURE_SIZE = NUM_PERM * 4
+
+_WORD_STRIP = str.maketrans('', '', KEPT_PUNCTUATION)
+_SHINGLE_MIX = np.uint64(0x9E3779B97F4A7C15)
+_BAND_MIX = np.uint64(0x100000001B3)
+
+# Multiply-shift hash parameters, derived from fixed digests so every process
+# and every numpy version computes the same signatures
+_PERMUTATIONS = np.array([
+    [int.from_bytes(hashlib.blake2b(f'minhash:{part}:{index}'.encode(), digest_size=8).digest(), 'little')
+     for index in range(NUM_PERM)]
+    for part in ('a', 'b')
+], dtype=np.uint64)
+_PERMUTATIONS[0] |= np.uint64(1)
+
+# Shingles hashed per block, to bound the temporary (NUM_PERM x block) array
+_SIGNATURE_BLOCK = 8192
+
+
+def minhash_signature(text):
+    """MinHash signature of the word 3-shingles of text as NUM_PERM uint32 values, or None"""
+    words = clean_text(text).lower().translate(_WORD_STRIP).split()
+    if not words:
+        return None
+    word_hashes = np.fromiter(map(zlib.crc32, map(str.encode, words)), dtype=np.uint64,
+                              count=len(words))
+    width = min(SHINGLE_WORDS, len(words))
+    count = len(words) - width + 1
+    shingles = word_hashes[:count].copy()
+    for offset in range(1, width):
+        shingles = shingles * _SHINGLE_MIX + word_hashes[offset:offset + count]
+    shingles = np.unique(shingles)
+
+    multipliers = _PERMUTATIONS[0][:, None]
+    increments = _PERMUTATIONS[1][:, None]
+    signature = np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint64)
+    for start in range(0, shingles.size, _SIGNATURE_BLOCK):
+        block = shingles[None, start:start + _SIGNATURE_BLOCK]
+        hashed = (multipliers * block + increments) >> np.uint64(32)
+        np.minimum(signature, hashed.min(axis=1), out=signature)
+    return signature.astype(np.uint32)
+
+
+def signature_bytes(signature):
+    return signature.astype('<u4').tobytes() if signature is not None else None
+
+
+def signature_array(data):
+    """Decode stored signatures (one or many concatenated) into rows of NUM_PERM values"""
+    return np.frombuffer(data, dtype='<u4').reshape(-1, NUM_PERM)
+
+
+def similarity(signature, others):
+    """Estimated Jaccard similarity of signature to each row of others"""
+    return (np.asarray(others) == signature).mean(axis=-1)
+
+
+def band_keys(user_ids, signatures):
+    """One 64-bit LSH key per band for each (user, signature) row"""
+    values = np.asarray(signatures, dtype=np.uint64).reshape(-1, BANDS, ROWS)
+    keys = np.asarray(user_ids, dtype=np.uint64)[:, None] * _SHINGLE_MIX \
+        + np.arange(BANDS, dtype=np.uint64)[None, :]
+    for row in range(ROWS):
+        keys = (keys ^ values[:, :, row]) * _BAND_MIX
+    return keys
+
+
+class NearDuplicateIndex:
+    """Per-user MinHash/LSH index over the signatures stored on Summary rows.
+
+    Each band is a sorted array of keys with the matching summary ids, so a
+    lookup is BANDS binary searches whatever the table size. New rows go to
+    a small dict first and are inserted into the arrays in bulk. The index is
+    loaded from the table on first use, follows inserts and deletes made in
+    this process through mapper events and picks up rows written by other
+    processes every ``refresh_interval`` seconds. It only proposes
+    candidates: matches are confirmed against the stored signatures.
+    """
+
+    # Pending band entries merged into the sorted arrays at this size
+    MERGE_SIZE = 20000
+    # Most recent ids taken from a single bucket, so one hot text stays cheap
+    MAX_BUCKET = 32
+    LOAD_BATCH = 10000
+
+    def __init__(self, threshold=0.9, reuse=False, refresh_interval=30, length_ratio=0.9):
+        self.enabled = True
+        self.threshold = threshold
+        self.length_ratio = length_ratio
+        self.reuse = reuse
+        self.refresh_interval = refresh_interval
+        self.app = None
+        self._keys = None
+        self._ids = None
+        self._pending = {}
+        self._pending_ids = []
+        self._pending_keys = []
+        self._deleted = set()
+        self._local_ids = set()
+        self._loaded_seq = None
+        self._refreshed_at = 0.0
+        self._lock = threading.RLock()
+
+    def init_app(self, app):
+        """Configure from the app config"""
+        self.app = app
+        self.enabled = app.config.get('NEAR_DUPLICATES_ENABLED', self.enabled)
+        self.threshold = app.config.get('NEAR_DUPLICATE_THRESHOLD', self.threshold)
+        self.length_ratio = app.config.get('NEAR_DUPLICATE_LENGTH_RATIO', self.length_ratio)
+        self.reuse = app.config.get('NEAR_DUPLICATE_REUSE', self.reuse)
+        self.refresh_interval = app.config.get('NEAR_DUPLICATE_REFRESH', self.refresh_interval)
+
+    def should_reuse(self, requested=None):
+        """Whether /summarize may serve a near-duplicate; the request can override the default"""
+        if not self.enabled:
+            return False
+        return self.reuse if requested is None else bool(requested)
+
+    @property
+    def size(self):
+        """Entries in the index, including pending ones"""
+        return (len(self._ids[0]) if self._ids is not None else 0) + len(self._pending_ids) \
+            - len(self._deleted)
+
+    def load(self):
+        """(Re)build the index from every stored signature"""
+        with self._lock:
+            self._keys = [np.zeros(0, dtype=np.uint64) for _ in range(BANDS)]
+            self._ids = [np.zeros(0, dtype=np.int64) for _ in range(BANDS)]
+            self._pending = {}
+            self._pending_ids = []
+            self._pending_keys = []
+            self._deleted = set()
+            self._local_ids = set()
+            self._loaded_seq = None
+            self._catch_up()
+
+    def _catch_up(self):
+        """Add rows committed since the last load or refresh, merging them once.
+
+        Ids are handed out in blocks, so a row committed later can have a
+        smaller id than one already loaded; rows are followed by commit_seq
+        instead, which every insert and signature change reserves in commit order.
+        """
+        query = db.session.query(Summary.id, Summary.user_id, Summary.signature, Summary.commit_seq)\
+            .filter(Summary.signature.isnot(None))
+        if self._loaded_seq is not None:
+            query = query.filter(Summary.commit_seq > self._loaded_seq)
+        query = query.yield_per(self.LOAD_BATCH)
+        keys, ids, batch = [], [], []
+        for row in query:
+            batch.append(row)
+            if len(batch) >= self.LOAD_BATCH:
+                self._batch_keys(batch, keys, ids)
+                batch = []
+        if batch:
+            self._batch_keys(batch, keys, ids)
+        if ids:
+            self._merge(np.concatenate(keys), np.concatenate(ids))
+        self._refreshed_at = time.monotonic()
+
+    def _batch_keys(self, rows, keys, ids):
+        self._loaded_seq = max([self._loaded_seq or 0] + [row[3] for row in rows if row[3] is not None])
+        # Rows this process indexed on insert are already there, and will not be read again
+        local = {row[0] for row in rows} & self._local_ids
+        self._local_ids -= local
+        rows = [row for row in rows if len(row[2]) == SIGNATURE_SIZE and row[0] not in local]
+        if rows:
+            users = np.array([row[1] for row in rows], dtype=np.int64)
+            keys.append(band_keys(users, signature_array(b''.join(row[2] for row in rows))))
+            ids.append(np.array([row[0] for row in rows], dtype=np.int64))
+
+    def _merge(self, keys, ids):
+        """Merge (rows x BANDS) keys for ids and all pending rows into the sorted band arrays"""
+        if self._pending_ids:
+            keys = np.concatenate((keys, np.array(self._pending_keys, dtype=np.uint64)))
+            ids = np.concatenate((ids, np.array(self._pending_ids, dtype=np.int64)))
+        deleted = np.fromiter(self._deleted, dtype=np.int64, count=len(self._deleted))
+        for band in range(BANDS):
+            band_keys_, band_ids = self._keys[band], self._ids[band]
+            if deleted.size:
+                live = ~np.isin(band_ids, deleted)
+                band_keys_, band_ids = band_keys_[live], band_ids[live]
+            # Only the new rows are sorted; they go in after existing equal keys
+            order = np.lexsort((ids, keys[:, band]))
+            new_keys = keys[order, band]
+            positions = np.searchsorted(band_keys_, new_keys, 'right')
+            self._keys[band] = np.insert(band_keys_, positions, new_keys)
+            self._ids[band] = np.insert(band_ids, positions, ids[order])
+        self._pending = {}
+        self._pending_ids = []
+        self._pending_keys = []
+        self._deleted.clear()
+
+    def _ensure_loaded(self):
+        if self._keys is None:
+            self.load()
+        elif time.monotonic() - self._refreshed_at > self.refresh_interval:
+            self._catch_up()
+
+    def add(self, summary_id, user_id, signature):
+        """Index one summary; called for every Summary row flushed in this process"""
+        if not self.enabled or self._keys is None:
+            return
+        keys = band_keys([user_id], signature[None, :])[0].tolist()
+        with self._lock:
+            self._deleted.discard(summary_id)
+            for band, key in enumerate(keys):
+                self._pending.setdefault((band, key), []).append(summary_id)
+            self._pending_ids.append(summary_id)
+            self._pending_keys.append(keys)
+            self._local_ids.add(summary_id)
+            if len(self._pending_ids) >= self.MERGE_SIZE:
+                self._merge(np.zeros((0, BANDS), dtype=np.uint64), np.zeros(0, dtype=np.int64))
+
+    def discard(self, summary_id):
+        if self._keys is not None:
+            with self._lock:
+                self._deleted.add(summary_id)
+
+    def candidates(self, user_id, signature):
+        """Ids of the user's summaries sharing at least one band with signature, most shared first"""
+        if not self.enabled:
+            return []
+        with self._lock:
+            self._ensure_loaded()
+            keys = band_keys([user_id], signature[None, :])[0]
+            found = []
+            for band, key in enumerate(keys):
+                sorted_keys = self._keys[band]
+                start = np.searchsorted(sorted_keys, key, 'left')
+                end = np.searchsorted(sorted_keys, key, 'right')
+                found.extend(self._ids[band][max(start, end - self.MAX_BUCKET):end].tolist())
+                found.extend(self._pending.get((band, int(key)), ())[-self.MAX_BUCKET:])
+            deleted = set(self._deleted)
+        counts = {}
+        for summary_id in found:
+            if summary_id not in deleted:
+                counts[summary_id] = counts.get(summary_id, 0) + 1
+        return sorted(counts, key=lambda summary_id: (-counts[summary_id], -summary_id))
+
+    def find(self, user_id, signature, method=None, language=None, limit=10, word_count=None):
+        """The user's most similar stored summary at or above the threshold, with its similarity.
+
+        Shingles are compared as sets, so a text repeated many times matches
+        a single copy of it; with ``word_count`` only stored texts whose
+        length is within ``length_ratio`` of it qualify.
+        """
+        if signature is None:
+            return None, 0.0
+        candidate_ids = self.candidates(user_id, signature)[:limit]
+        if not candidate_ids:
+            metrics.inc('near_duplicate_lookups_total', outcome='none')
+            return None, 0.0
+        query = Summary.query.options(undefer(Summary.signature))\
+            .filter(Summary.id.in_(candidate_ids), Summary.user_id == user_id,
+                    Summary.signature.isnot(None))
+        if method is not None:
+            query = query.filter(Summary.method == method)
+        if language is not None:
+            query = query.filter(Summary.language == language)
+        if word_count is not None:
+            query = query.filter(Summary.original_length.between(word_count * self.length_ratio,
+                                                                 word_count / self.length_ratio))
+        best, best_similarity = None, 0.0
+        for summary in query:
+            if len(summary.signature) != SIGNATURE_SIZE:
+                continue
+            score = float(similarity(signature, signature_array(summary.signature)[0]))
+            # The newest of equally similar summaries wins
+            if score >= self.threshold and (score, summary.id) > (best_similarity, best.id if best else 0):
+                best, best_similarity = summary, score
+        metrics.inc('near_duplicate_lookups_total', outcome='match' if best else 'none')
+        return best, best_similarity
+
+    def clusters(self, user_id, threshold=None, min_size=2):
+        """Groups of the user's summaries that are near-duplicates of each other.
+
+        Works from the stored signatures rather than the in-process index, so
+        it sees every row regardless of which process wrote it. Returns a list
+        of (summary ids, lowest pairwise similarity on the linking edges),
+        largest clusters first.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        rows = db.session.query(Summary.id, Summary.signature)\
+            .filter(Summary.user_id == user_id, Summary.signature.isnot(None))\
+            .order_by(Summary.id).all()
+        rows = [row for row in rows if len(row[1]) == SIGNATURE_SIZE]
+        if len(rows) < 2:
+            return []
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        signatures = signature_array(b''.join(row[1] for row in rows))
+        keys = band_keys(np.full(ids.size, user_id), signatures)
+
+        # Within each bucket, link every member to the bucket's first member
+        pairs = []
+        for band in range(BANDS):
+            order = np.argsort(keys[:, band], kind='stable')
+            sorted_keys = keys[order, band]
+            starts = np.searchsorted(sorted_keys, sorted_keys, 'left')
+            linked = starts != np.arange(order.size)
+            pairs.append(np.column_stack((order[starts[linked]], order[linked])))
+        pairs = np.unique(np.concatenate(pairs), axis=0)
+        if not pairs.size:
+            return []
+        scores = (signatures[pairs[:, 0]] == signatures[pairs[:, 1]]).mean(axis=1)
+        keep = scores >= threshold
+        pairs, scores = pairs[keep], scores[keep]
+
+        # Connected components by propagating the smallest label along links
+        labels = np.arange(ids.size)
+        while pairs.size:
+            updated = labels.copy()
+            np.minimum.at(updated, pairs[:, 0], updated[pairs[:, 1]])
+            np.minimum.at(updated, pairs[:, 1], updated[pairs[:, 0]])
+            updated = updated[updated]
+            if np.array_equal(updated, labels):
+                break
+            labels = updated
+
+        weakest = np.ones(ids.size)
+        np.minimum.at(weakest, labels[pairs[:, 0]], scores)
+        sizes = np.bincount(labels, minlength=ids.size)
+        roots = np.flatnonzero(sizes >= max(min_size, 2))
+        roots = roots[np.lexsort((ids[roots], -sizes[roots]))]
+        members = np.argsort(labels, kind='stable')
+        starts = np.searchsorted(labels[members], roots)
+        return [(ids[members[start:start + sizes[root]]].tolist(), float(weakest[root]))
+                for root, start in zip(roots.tolist(), starts.tolist())]
+
+    def backfill(self, batch_size=1000):
+        """Compute signatures for stored summaries that have none, e.g. after a bulk load"""
+        table = Summary.__table__
+        update = table.update().where(table.c.id == bindparam('summary_id'))\
+            .values(signature=bindparam('value'), commit_seq=bindparam('seq'))
+        updated = 0
+        last_id = 0
+        while True:
+            rows = db.session.query(Summary.id, SummaryContent.original_text)\
+                .join(SummaryContent, SummaryContent.summary_id == Summary.id)\
+                .filter(Summary.id > last_id, Summary.signature.is_(None))\
+                .order_by(Summary.id).limit(batch_size).all()
+            if not rows:
+                break
+            # Texts without words get an empty signature so they are not revisited
+            values = [signature_bytes(minhash_signature(original_text)) or b''
+                      for _, original_text in rows]
+            # A new commit_seq lets running indexes pick the signed rows up
+            first = IdBlock.reserve(Summary, len(rows), db.session.connection(), column='commit_seq')
+            db.session.execute(update, [
+                {'summary_id': summary_id, 'value': value, 'seq': first + offset}
+                for offset, ((summary_id, _), value) in enumerate(zip(rows, values))
+            ])
+            db.session.commit()
+            last_id = rows[-1][0]
+            updated += len(rows)
+        if self._keys is not None:
+            self.load()
+        return updated
+
+
+near_duplicates = NearDuplicateIndex()
+metrics.describe('near_duplicate_lookups_total', 'Near-duplicate lookups before summarizing by outcome')
+
+
+def sign_summaries(summaries):
+    """Compute the missing signatures of new Summary rows"""
+    if not near_duplicates.enabled:
+        # Rows stored while disabled are signed by backfill()
+        return
+    for summary in summaries:
+        if summary.signature is None and summary.content is not None:
+            summary.signature = signature_bytes(minhash_signature(summary.content.original_text))
+
+
+@event.listens_for(Session, 'before_flush')
+def _sequence_summaries(session, flush_context, instances):
+    new = [target for target in session.new if isinstance(target, Summary)]
+    if not new:
+        return
+    # Hash before the flush writes anything, so no lock is held meanwhile
+    sign_summaries(new)
+    first = IdBlock.reserve(Summary, len(new), session.connection(), column='commit_seq')
+    for offset, target in enumerate(new):
+        target.commit_seq = first + offset
+
+
+@event.listens_for(Summary, 'after_insert')
+def _index_summary(mapper, connection, target):
+    if target.signature:
+        near_duplicates.add(target.id, target.user_id, signature_array(target.signature)[0])
+
+
+@event.listens_for(Summary, 'after_delete')
+def _unindex_summary(mapper, connection, target):
+    near_duplicates.discard(target.id)
@@ -0,0 +1,124 @@
+import csv
+import io
+import json
+import re
+import zipfile
+
+from models import Summary, SummaryContent
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'json': ('application/json', 'json'),
+    'zip': ('application/zip', 'zip')
+}
+
+COLUMNS = ('id', 'title', 'created_at', 'language', 'method', 'original_length',
+           'summary_length', 'compression_ratio', 'summary_text', 'original_text')
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH = 1000
+
+_SLUG = re.compile(r'[^a-z0-9]+')
+
+
+def export_rows(query, include_original=True):
+    """Stream plain dicts for a Summary query, newest first, one batch in memory at a time"""
+    columns = [Summary.id, Summary.title, Summary.created_at, Summary.language, Summary.method,
+               Summary.original_length, Summary.summary_length, Summary.compression_ratio,
+               Summary.summary_text]
+    if include_original:
+        query = query.outerjoin(SummaryContent, SummaryContent.summary_id == Summary.id)
+        columns.append(SummaryContent.original_text)
+    rows = query.with_entities(*columns)\
+        .order_by(Summary.created_at.desc(), Summary.id.desc()).yield_per(EXPORT_BATCH)
+    names = COLUMNS if include_original else COLUMNS[:-1]
+    for row in rows:
+        item = dict(zip(names, row))
+        item['created_at'] = item['created_at'].strftime('%Y-%m-%d %H:%M:%S') if item['created_at'] else None
+        yield item
+
+
+def iter_csv(items, include_original=True):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS if include_original else COLUMNS[:-1])
+    for count, item in enumerate(items, 1):
+        writer.writerow(item.values())
+        # Send a few rows at a time rather than one tiny chunk per row
+        if count % 100 == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_jsonl(items):
+    for item in items:
+        yield json.dumps(item) + '\n'
+
+
+def iter_json(items):
+    yield '['
+    separator = ''
+    for item in items:
+        yield separator + json.dumps(item)
+        separator = ','
+    yield ']'
+
+
+class _ZipSink(io.RawIOBase):
+    """Write-only stream that hands out whatever zipfile wrote since the last take()"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def text_file(item):
+    """One summary as a plain text document"""
+    lines = [item['title'] or f"Summary {item['id']}",
+             f"Created: {item['created_at']}  Method: {item['method']}  Language: {item['language']}",
+             f"Words: {item['original_length']} -> {item['summary_length']}",
+             '', 'SUMMARY', '', item['summary_text'] or '']
+    if 'original_text' in item:
+        lines += ['', 'ORIGINAL TEXT', '', item['original_text'] or '']
+    return '\n'.join(lines) + '\n'
+
+
+def iter_zip(items):
+    """A zip of one text file per summary, written as it is sent.
+
+    The sink cannot seek, so zipfile writes data descriptors after each
+    member instead of going back to patch its header.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for item in items:
+            slug = _SLUG.sub('-', (item['title'] or '').lower()).strip('-')[:40] or 'summary'
+            archive.writestr(f"{item['id']}-{slug}.txt", text_file(item))
+            yield sink.take()
+    yield sink.take()
+
+
+def iter_export(query, export_format, include_original=True):
+    """Chunks of the export of query in export_format"""
+    items = export_rows(query, include_original)
+    if export_format == 'csv':
+        return iter_csv(items, include_original)
+    if export_format == 'jsonl':
+        return iter_jsonl(items)
+    if export_format == 'json':
+        return iter_json(items)
+    return iter_zip(items)
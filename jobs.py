@@ -0,0 +1,226 @@
+import json
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import TimeoutError as FutureTimeoutError, wait
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from metrics import metrics
+from models import db, Summary, SummaryJob
+from cache import summary_cache
+from writer import summary_writer
+from utils import analyze_job, get_process_pool
+
+
+class QueueFull(Exception):
+    """Raised when the job queue has no room for another submission"""
+
+
+class Job:
+    """A summarization request waiting for, or processed by, the worker pool"""
+
+    def __init__(self, text, method, sentences_count, language, user_id):
+        self.id = uuid.uuid4().hex
+        self.text = text
+        self.method = method
+        self.sentences_count = sentences_count
+        self.language = language
+        self.user_id = user_id
+        self.status = 'queued'
+        self.result = None
+        self.summary_id = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @classmethod
+    def from_record(cls, record):
+        """Rebuild a job from its SummaryJob row, without its text"""
+        job = cls(None, None, None, None, record.user_id)
+        job.id = record.id
+        job.status = record.status
+        job.error = record.error
+        job.result = json.loads(record.result) if record.result is not None else None
+        job.summary_id = record.summary_id
+        job.created_at = record.created_at
+        job.finished_at = record.finished_at
+        return job
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'error': self.error,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at
+        }
+
+
+class JobQueue:
+    """Bounded in-process job queue drained by a pool of worker threads.
+
+    Each worker hands the CPU-bound analysis to a process pool and stores
+    the result in the ``Summary`` table. A job still running after
+    ``timeout`` seconds is reported failed at once, but its worker takes no
+    new job until the analysis actually ends, so no more than ``workers``
+    analyses ever run. Job state is kept in memory and mirrored to the
+    ``SummaryJob`` table, so a status poll can be answered by any worker
+    process, not only the one that accepted the job.
+    """
+
+    def __init__(self, maxsize=100, workers=2, timeout=300, result_ttl=3600):
+        self.app = None
+        self.maxsize = maxsize
+        self.workers = workers
+        self.timeout = timeout
+        self.result_ttl = result_ttl
+        self._queue = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._overrunning = 0
+
+    def init_app(self, app):
+        """Configure the queue from the Flask app config"""
+        self.app = app
+        self.maxsize = app.config.get('JOB_QUEUE_SIZE', self.maxsize)
+        self.workers = app.config.get('JOB_WORKERS', self.workers)
+        self.timeout = app.config.get('JOB_TIMEOUT', self.timeout)
+        self.result_ttl = app.config.get('JOB_RESULT_TTL', self.result_ttl)
+
+    def start(self):
+        """Start the worker threads if they are not running yet"""
+        with self._lock:
+            if self._queue is not None:
+                return
+            self._queue = queue.Queue(maxsize=self.maxsize)
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'summary-job-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, text, method, sentences_count, language, user_id):
+        """Queue a job, raising QueueFull when the queue is at capacity"""
+        self.start()
+        self._expire()
+
+        job = Job(text, method, sentences_count, language, user_id)
+        # Recorded before it is queued, so a worker's updates always find the row
+        self._record(job, insert=True)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self._delete(SummaryJob.__table__.c.id == job.id)
+            raise QueueFull()
+        with self._lock:
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        """The job with job_id, from this process or else the SummaryJob table"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        with self.app.app_context():
+            record = db.session.get(SummaryJob, job_id)
+            return Job.from_record(record) if record is not None else None
+
+    def depth(self):
+        """Number of jobs waiting for a worker"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def overrunning(self):
+        """Timed-out jobs whose analysis is still running"""
+        return self._overrunning
+
+    def _expire(self):
+        # Forget finished jobs once their results have been available for result_ttl
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+        self._delete(SummaryJob.__table__.c.finished_at < cutoff)
+
+    def _record(self, job, insert=False):
+        """Write job's state to its SummaryJob row, creating the row when insert is set"""
+        table = SummaryJob.__table__
+        values = {
+            'status': job.status,
+            'error': job.error,
+            'result': json.dumps(job.result) if job.result is not None else None,
+            'summary_id': job.summary_id,
+            'finished_at': job.finished_at
+        }
+        with self.app.app_context(), db.engine.begin() as connection:
+            if insert:
+                connection.execute(table.insert().values(
+                    id=job.id, user_id=job.user_id, created_at=job.created_at, **values))
+            else:
+                connection.execute(table.update().where(table.c.id == job.id).values(values))
+
+    def _delete(self, condition):
+        with self.app.app_context(), db.engine.begin() as connection:
+            connection.execute(SummaryJob.__table__.delete().where(condition))
+
+    def _work(self):
+        pool = get_process_pool('jobs', self.workers)
+        while True:
+            job = self._queue.get()
+            job.status = 'running'
+            future = None
+            try:
+                self._record(job)
+                future = pool.submit(analyze_job,
+                                     (job.text, job.method, job.sentences_count, job.language))
+                result = future.result(timeout=self.timeout)
+                if 'error' in result:
+                    raise RuntimeError(result['error'])
+                self._store(job, result)
+                job.result = result
+                job.status = 'done'
+            except FutureTimeoutError:
+                job.error = f'Job exceeded the {self.timeout}s time limit'
+                job.status = 'failed'
+            except Exception as e:
+                job.error = str(e)
+                job.status = 'failed'
+            finally:
+                job.finished_at = time.time()
+                metrics.observe('job_duration_seconds', job.finished_at - job.created_at,
+                                status=job.status)
+                job.text = None
+                self._queue.task_done()
+            try:
+                self._record(job)
+            except SQLAlchemyError:
+                # Still reported by this process; only other processes miss the outcome
+                pass
+            if future is not None and not future.done() and not future.cancel():
+                # A running analysis cannot be interrupted; it keeps this worker's slot until it ends
+                with self._lock:
+                    self._overrunning += 1
+                wait([future])
+                with self._lock:
+                    self._overrunning -= 1
+
+    def _store(self, job, result):
+        with self.app.app_context():
+            summary_cache.put(
+                summary_cache.make_key(job.text, job.method, job.sentences_count, job.language),
+                result
+            )
+            summary = Summary.from_analysis(job.text, result, job.user_id, job.language, job.method)
+            if summary_writer.enabled:
+                job.summary_id = summary_writer.save(summary)
+                return
+            db.session.add(summary)
+            db.session.commit()
+            job.summary_id = summary.id
+
+
+job_queue = JobQueue()
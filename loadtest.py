@@ -0,0 +1,319 @@
+"""End-to-end HTTP load test for the Flask app.
+
+Seeds users and summaries offline with SampleDataGenerator (texts come from
+sample_texts.json), logs every worker in as a seeded user and replays a
+weighted mix of endpoints at the requested concurrency. Reports p50/p95/p99
+latency, error rate and, when run in-process, database queries per request.
+
+In-process runs seed a fresh temporary database, or the one given with
+--database, which is dropped and recreated. Against a running server (--url)
+no local database is touched: new users are registered and their summaries
+created through the server's own endpoints.
+
+    python loadtest.py --concurrency 8 --requests 2000 --mix summarize=4,history=3,analytics=3
+    python loadtest.py --url http://localhost:5000 --duration 60
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MIX = 'summarize=4,history=2,history_api=1,analytics=2,dashboard=1'
+SEED_PASSWORD = 'password123'
+
+
+def parse_mix(mix):
+    """Parse 'name=weight,...' into a dict of endpoint weights"""
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        weights[name.strip()] = float(weight or 1)
+    unknown = set(weights) - set(ENDPOINTS)
+    if unknown:
+        raise ValueError(f"Unknown endpoints in mix: {', '.join(sorted(unknown))}")
+    return weights
+
+
+def summarize_request(context):
+    text = random.choice(context['texts'])
+    if context['cache_bust']:
+        # A unique trailing sentence defeats the summary cache
+        text += f' Reference {uuid.uuid4().hex}.'
+    return 'POST', '/summarize', {'json': {
+        'text': text,
+        'method': random.choice(context['methods'])
+    }}
+
+
+def history_request(context):
+    return 'GET', '/history', {}
+
+
+def history_api_request(context):
+    return 'GET', '/api/history?per_page=20', {}
+
+
+def analytics_request(context):
+    return 'GET', f"/api/analytics?range={random.choice(['week', 'month', 'year'])}", {}
+
+
+def dashboard_request(context):
+    return 'GET', '/dashboard', {}
+
+
+ENDPOINTS = {
+    'summarize': summarize_request,
+    'history': history_request,
+    'history_api': history_api_request,
+    'analytics': analytics_request,
+    'dashboard': dashboard_request
+}
+
+
+class QueryCounter:
+    """Counts SQL statements per thread through SQLAlchemy engine events"""
+
+    def __init__(self, engine):
+        self._local = threading.local()
+        from sqlalchemy import event
+        event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    def reset(self):
+        self._local.count = 0
+
+    def value(self):
+        return getattr(self._local, 'count', 0)
+
+
+class InProcessClient:
+    """Drives the app through Flask's test client, one client per worker"""
+
+    def __init__(self, app, counter):
+        self.client = app.test_client()
+        self.counter = counter
+
+    def login(self, username, password):
+        self.client.post('/auth/login', data={'username': username, 'password': password})
+
+    def request(self, method, path, options):
+        self.counter.reset()
+        response = self.client.open(path, method=method, **options)
+        return response.status_code, self.counter.value()
+
+
+class HttpClient:
+    """Drives a running server over HTTP with a requests session per worker"""
+
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def login(self, username, password):
+        self.session.post(f'{self.base_url}/auth/login',
+                          data={'username': username, 'password': password})
+
+    def request(self, method, path, options):
+        response = self.session.request(method, self.base_url + path, timeout=120, **options)
+        return response.status_code, None
+
+
+def seed_http(base_url, users, summaries_per_user, texts):
+    """Register users on a running server and create their summaries over HTTP, returning usernames"""
+    import requests
+    base_url = base_url.rstrip('/')
+    prefix = f'loadtest-{uuid.uuid4().hex[:8]}'
+    usernames = []
+    for index in range(users):
+        username = f'{prefix}-{index}'
+        session = requests.Session()
+        session.post(f'{base_url}/auth/register', data={
+            'username': username, 'email': f'{username}@example.com',
+            'password': SEED_PASSWORD, 'confirm_password': SEED_PASSWORD
+        }, timeout=30)
+        session.post(f'{base_url}/auth/login',
+                     data={'username': username, 'password': SEED_PASSWORD}, timeout=30)
+        for _ in range(summaries_per_user):
+            session.post(f'{base_url}/summarize', json={'text': random.choice(texts)}, timeout=120)
+        usernames.append(username)
+    return usernames
+
+
+def load_texts():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sample_texts.json')
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['sample_texts']
+
+
+def seed(app, users, summaries_per_user):
+    """Recreate the database with seeded users and summaries, returning usernames"""
+    from sample import SampleDataGenerator
+    from models import db
+
+    generator = SampleDataGenerator()
+    generator.generate_sample_texts(offline=True)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        generator.generate_users(users)
+        db.session.add_all(generator.users)
+        db.session.commit()
+        generator.generate_summaries(summaries_per_user)
+        db.session.add_all(generator.summaries)
+        db.session.commit()
+        usernames = [user.username for user in generator.users if user.username != 'admin']
+    return usernames, generator.sample_texts
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def run(make_client, usernames, context, weights, concurrency, total_requests=None, duration=None):
+    """Replay the endpoint mix from concurrency workers and collect raw samples"""
+    samples = defaultdict(list)
+    lock = threading.Lock()
+    remaining = [total_requests]
+    deadline = time.perf_counter() + duration if duration else None
+    names = list(weights)
+    weight_values = [weights[name] for name in names]
+
+    def take():
+        if deadline is not None:
+            return time.perf_counter() < deadline
+        with lock:
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+            return True
+
+    def worker(index):
+        client = make_client()
+        client.login(usernames[index % len(usernames)], SEED_PASSWORD)
+        rng = random.Random(index)
+        while take():
+            name = rng.choices(names, weight_values)[0]
+            method, path, options = ENDPOINTS[name](context)
+            started = time.perf_counter()
+            try:
+                status, queries = client.request(method, path, options)
+            except Exception:
+                status, queries = None, None
+            elapsed = time.perf_counter() - started
+            with lock:
+                samples[name].append((elapsed, status, queries))
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def report(samples, elapsed, concurrency):
+    """Summarise raw samples into per-endpoint latency, error and query statistics"""
+    endpoints = {}
+    total = 0
+    for name, rows in sorted(samples.items()):
+        latencies = [row[0] for row in rows]
+        # Redirects mean the session was lost and the login page was served instead
+        errors = sum(1 for row in rows if row[1] is None or row[1] >= 300)
+        queries = [row[2] for row in rows if row[2] is not None]
+        total += len(rows)
+        endpoints[name] = {
+            'requests': len(rows),
+            'errors': errors,
+            'error_rate': round(errors / len(rows), 4),
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'max_ms': round(max(latencies) * 1000, 2),
+            'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None
+        }
+    return {
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'requests': total,
+        'throughput_rps': round(total / elapsed, 2) if elapsed else None,
+        'endpoints': endpoints
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test the Text Summarizer endpoints')
+    parser.add_argument('--url', help='Base URL of a running server; default runs in-process')
+    parser.add_argument('--database', help='Database URL for in-process runs (default: a temp SQLite file)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrent workers')
+    parser.add_argument('--requests', type=int, default=500, help='Total requests to send')
+    parser.add_argument('--duration', type=float, help='Run for this many seconds instead')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Endpoint weights, e.g. summarize=4,history=2')
+    parser.add_argument('--users', type=int, default=10, help='Users to seed')
+    parser.add_argument('--summaries', type=int, default=50, help='Summaries to seed per user')
+    parser.add_argument('--cache-bust', action='store_true', help='Make every summarize request unique')
+    parser.add_argument('--no-seed', action='store_true',
+                        help='Reuse users already in the --database (in-process runs only)')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+
+    args = parser.parse_args()
+    weights = parse_mix(args.mix)
+    if args.url and (args.no_seed or args.database):
+        parser.error('--no-seed and --database are for in-process runs; '
+                     'with --url users are registered on the server')
+
+    if args.url:
+        # Nothing local is imported that could open, let alone reset, a database
+        from utils import summarizer
+        texts = load_texts()
+        usernames = seed_http(args.url, args.users, args.summaries, texts)
+    else:
+        # The app reads DATABASE_URL at import, so point it at a scratch database first
+        database = args.database or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'loadtest.db')
+        os.environ['DATABASE_URL'] = database
+
+        from app import app, db, summarizer
+
+        usernames, texts = seed(app, args.users, args.summaries) if not args.no_seed else (None, None)
+        if usernames is None:
+            texts = load_texts()
+            with app.app_context():
+                from models import User
+                usernames = [user.username for user in User.query.filter(User.username != 'admin').all()]
+
+    context = {
+        'texts': texts,
+        'methods': list(summarizer.available_methods),
+        'cache_bust': args.cache_bust
+    }
+
+    if args.url:
+        make_client = lambda: HttpClient(args.url)
+    else:
+        summarizer.warm_up()
+        with app.app_context():
+            counter = QueryCounter(db.engine)
+        make_client = lambda: InProcessClient(app, counter)
+
+    samples, elapsed = run(make_client, usernames, context, weights, args.concurrency,
+                           None if args.duration else args.requests, args.duration)
+    output = json.dumps(report(samples, elapsed, args.concurrency), indent=2)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
@@ -0,0 +1,236 @@
+import hmac
+import ipaddress
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Histogram buckets for durations in seconds and text sizes in words
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 100000, 1000000)
+
+
+class Histogram:
+    """Cumulative bucket counts plus sum and count, as Prometheus expects"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """In-process counters, histograms and per-request timing spans.
+
+    Everything is exported in the Prometheus text format from ``/metrics``
+    to clients presenting the bearer ``token`` or connecting from one of
+    ``allowed_ips``; anyone else gets a 404.
+    When ``METRICS_TIMING_HEADERS`` is set, each response also carries a
+    ``Server-Timing`` header with the time spent in every span and in SQL.
+    Values are per process: work done inside the batch or job process pools
+    is only visible through the spans recorded around it in the web process.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.timing_headers = False
+        self.token = ''
+        self.allowed_ips = ()
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+        self._help = {}
+        self._lock = threading.Lock()
+        self._request = threading.local()
+
+    def init_app(self, app):
+        """Configure from the app, time requests and SQL, and register /metrics"""
+        self.enabled = app.config.get('METRICS_ENABLED', self.enabled)
+        self.timing_headers = app.config.get('METRICS_TIMING_HEADERS', self.timing_headers)
+        self.token = app.config.get('METRICS_TOKEN', self.token)
+        self.allowed_ips = tuple(ipaddress.ip_network(entry.strip(), strict=False)
+                                 for entry in app.config.get('METRICS_ALLOWED_IPS', self.allowed_ips))
+        if not self.enabled:
+            return
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._clear_request)
+        app.add_url_rule('/metrics', 'metrics', self.export)
+
+        if not event.contains(Engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def inc(self, name, amount=1, **labels):
+        """Add amount to a counter"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, buckets=TIME_BUCKETS, **labels):
+        """Record value in a histogram"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def gauge(self, name, function, help_text=None):
+        """Export the current value of function() as a gauge on every scrape"""
+        self._gauges[name] = function
+        if help_text:
+            self.describe(name, help_text)
+
+    @contextmanager
+    def span(self, stage):
+        """Time a block as one stage of the current request"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.observe('stage_duration_seconds', elapsed, stage=stage)
+            self._add_span(stage, elapsed)
+
+    def _add_span(self, stage, elapsed):
+        spans = getattr(self._request, 'spans', None)
+        if spans is not None:
+            spans[stage] = spans.get(stage, 0.0) + elapsed
+
+    def _start_request(self):
+        self._request.spans = {}
+        self._request.started = time.perf_counter()
+
+    def _finish_request(self, response):
+        from flask import request
+
+        started = getattr(self._request, 'started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or 'unknown'
+        if endpoint != 'metrics':
+            self.observe('http_request_duration_seconds', elapsed,
+                         endpoint=endpoint, method=request.method)
+            self.inc('http_requests_total', endpoint=endpoint, method=request.method,
+                     status=str(response.status_code))
+        if self.timing_headers:
+            spans = dict(self._request.spans, total=elapsed)
+            response.headers['Server-Timing'] = ', '.join(
+                f'{stage};dur={seconds * 1000:.2f}' for stage, seconds in spans.items()
+            )
+        return response
+
+    def _clear_request(self, exception=None):
+        self._request.spans = None
+        self._request.started = None
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        pending = conn.info.get('query_started')
+        if not pending:
+            return
+        elapsed = time.perf_counter() - pending.pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+        self.observe('db_query_duration_seconds', elapsed, operation=operation)
+        self._add_span('db', elapsed)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            histograms = [(key, list(h.buckets), list(h.counts), h.sum, h.count)
+                          for key, h in histograms]
+
+        lines = []
+        seen = set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                if name in self._help:
+                    lines.append(f'# HELP {name} {self._help[name]}')
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), value in counters:
+            header(name, 'counter')
+            lines.append(f'{name}{format_labels(labels)} {value}')
+
+        for (name, labels), buckets, counts, total, count in histograms:
+            header(name, 'histogram')
+            for bound, bucket_count in zip(buckets, counts):
+                bucket_labels = labels + (('le', format_number(bound)),)
+                lines.append(f'{name}_bucket{format_labels(bucket_labels)} {bucket_count}')
+            lines.append(f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'{name}_sum{format_labels(labels)} {total}')
+            lines.append(f'{name}_count{format_labels(labels)} {count}')
+
+        for name, function in sorted(self._gauges.items()):
+            header(name, 'gauge')
+            lines.append(f'{name} {function()}')
+
+        return '\n'.join(lines) + '\n'
+
+    def export(self):
+        from flask import Response, abort, request
+        if not self.authorized(request):
+            abort(404)
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+    def authorized(self, request):
+        """Whether request may read the metrics"""
+        if self.token:
+            expected = f'Bearer {self.token}'.encode()
+            if hmac.compare_digest(request.headers.get('Authorization', '').encode(), expected):
+                return True
+        try:
+            address = ipaddress.ip_address(request.remote_addr or '')
+        except ValueError:
+            return False
+        return any(address in network for network in self.allowed_ips)
+
+
+def format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in labels) + '}'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = Metrics()
+metrics.describe('stage_duration_seconds', 'Time spent in each summarization and request stage')
+metrics.describe('http_request_duration_seconds', 'Request latency by endpoint')
+metrics.describe('http_requests_total', 'Requests by endpoint, method and status')
+metrics.describe('db_query_duration_seconds', 'SQL statement latency by operation')
+metrics.describe('summarizer_fallbacks_total', 'Summaries that fell back to the leading sentences')
+metrics.describe('summarizer_input_words', 'Words per summarized text')
+metrics.describe('summary_cache_lookups_total', 'Summary cache lookups by outcome')
@@ -1,5 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import validates
+import weakref
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -21,10 +25,17 @@ class User(UserMixin, db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+def preview(text, length=100):
+    """First length characters of text, with an ellipsis if it was cut"""
+    return text[:length] + '...' if len(text) > length else text
+
 class Summary(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    original_text = db.Column(db.Text, nullable=False)
-    summary_text = db.Column(db.Text, nullable=False)
+    # Large bodies stay out of list queries: the summary is deferred and the
+    # original text lives in SummaryContent, loaded only when accessed
+    summary_text = db.deferred(db.Column(db.Text, nullable=False))
+    summary_preview = db.Column(db.String(110))
+    original_preview = db.Column(db.String(110))
     summary_length = db.Column(db.Integer, nullable=False)
     original_length = db.Column(db.Integer, nullable=False)
     compression_ratio = db.Column(db.Float, nullable=False)
@@ -32,17 +43,331 @@ class Summary(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     title = db.Column(db.String(200))
     language = db.Column(db.String(10), default='english')
+    method = db.Column(db.String(20), default='lsa')
+    # MinHash signature of the original text for near-duplicate lookups, see duplicates.py
+    signature = db.deferred(db.Column(db.LargeBinary))
+    # Position of the row's last insert or signature change in commit order, reserved
+    # from IdBlock by every writer (see duplicates.py); ids from IdBlock are not in that order
+    commit_seq = db.Column(db.Integer, index=True)
+    
+    __table_args__ = (
+        # History listing and keyset paging seek on (user_id, created_at, id)
+        db.Index('ix_summary_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_summary_user_length', 'user_id', 'original_length'),
+    )
+    
+    content = db.relationship('SummaryContent', uselist=False, lazy='select',
+                              cascade='all, delete-orphan')
+    
+    @property
+    def original_text(self):
+        return self.content.original_text if self.content is not None else None
     
-    def to_dict(self):
-        return {
+    @original_text.setter
+    def original_text(self, value):
+        if self.content is None:
+            self.content = SummaryContent(original_text=value)
+        else:
+            self.content.original_text = value
+        self.original_preview = preview(value)
+    
+    @validates('summary_text')
+    def _set_summary_preview(self, key, value):
+        self.summary_preview = preview(value)
+        return value
+    
+    @classmethod
+    def from_analysis(cls, text, result, user_id, language='english', method='lsa'):
+        """Build a Summary row from a TextSummarizer.analyze result"""
+        return cls(
+            original_text=text,
+            summary_text=result['summary'],
+            summary_length=result['summary_length'],
+            original_length=result['original_length'],
+            compression_ratio=result['compression_ratio'],
+            user_id=user_id,
+            title=preview(text),
+            language=language,
+            method=method
+        )
+    
+    def to_dict(self, include_summary=True):
+        data = {
             'id': self.id,
             'title': self.title,
-            'original_text': self.original_text[:100] + '...' if len(self.original_text) > 100 else self.original_text,
-            'summary_text': self.summary_text,
+            'original_text': self.original_preview,
+            'summary_preview': self.summary_preview,
             'summary_length': self.summary_length,
             'original_length': self.original_length,
             'compression_ratio': self.compression_ratio,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'language': self.language
+            'language': self.language,
+            'method': self.method
+        }
+        if include_summary:
+            data['summary_text'] = self.summary_text
+        return data
+
+
+class SummaryContent(db.Model):
+    """Full original text of a Summary, kept apart from the metadata row"""
+    summary_id = db.Column(db.Integer, db.ForeignKey('summary.id'), primary_key=True)
+    original_text = db.Column(db.Text, nullable=False)
+
+
+class SearchPosting(db.Model):
+    """Inverted index entry: a term of a summary with its BM25 weight, see search.py"""
+    user_id = db.Column(db.Integer, primary_key=True)
+    term = db.Column(db.String(64), primary_key=True)
+    summary_id = db.Column(db.Integer, db.ForeignKey('summary.id'), primary_key=True, index=True)
+    weight = db.Column(db.Float, nullable=False)
+
+
+class IdBlock(db.Model):
+    """Next unreserved id of a table, for rows whose ids are handed out before they are written"""
+    name = db.Column(db.String(40), primary_key=True)
+    next_id = db.Column(db.Integer, nullable=False)
+
+    @classmethod
+    def reserve(cls, model, count, connection=None, column='id'):
+        """Reserve count consecutive values of model's id, or another integer column, and return the first.
+
+        Runs in a transaction of its own unless a connection is given, in
+        which case the reservation commits or rolls back with its caller. The
+        counter row stays locked until then, so values reserved on a caller's
+        connection are handed out in commit order.
+        """
+        if connection is None:
+            try:
+                with db.engine.begin() as connection:
+                    return cls.reserve(model, count, connection, column)
+            except IntegrityError:
+                # Another process created the counter row first
+                with db.engine.begin() as connection:
+                    return cls.reserve(model, count, connection, column)
+        table = cls.__table__
+        name = model.__table__.name if column == 'id' else f'{model.__table__.name}.{column}'
+        # Never hand out values at or below rows that were written without a reservation
+        floor = select(func.coalesce(func.max(getattr(model, column)), 0) + 1).scalar_subquery()
+        start = db.case((table.c.next_id > floor, table.c.next_id), else_=floor)
+        updated = connection.execute(
+            table.update().where(table.c.name == name).values(next_id=start + count)
+        )
+        if not updated.rowcount:
+            # First reservation; a concurrent first one fails on the primary key
+            connection.execute(table.insert().values(name=name, next_id=floor + count))
+        return connection.execute(select(table.c.next_id).where(table.c.name == name)).scalar() - count
+
+
+class CachedSummary(db.Model):
+    """Persistent tier of the summary cache, keyed on a content hash"""
+    key = db.Column(db.String(64), primary_key=True)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class SummaryJob(db.Model):
+    """State of a queued summarization job, so any worker process can report it, see jobs.py"""
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    status = db.Column(db.String(10), nullable=False)
+    error = db.Column(db.Text)
+    # JSON analysis result, kept until the job expires
+    result = db.Column(db.Text)
+    summary_id = db.Column(db.Integer)
+    # Epoch seconds, as the job status API reports them
+    created_at = db.Column(db.Float, nullable=False)
+    finished_at = db.Column(db.Float, index=True)
+
+class SummaryRollup(db.Model):
+    """Daily per-user, per-method aggregates of Summary rows for analytics"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    method = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    length_under_100 = db.Column(db.Integer, nullable=False, default=0)
+    length_100_500 = db.Column(db.Integer, nullable=False, default=0)
+    length_500_1000 = db.Column(db.Integer, nullable=False, default=0)
+    length_over_1000 = db.Column(db.Integer, nullable=False, default=0)
+    original_words = db.Column(db.Integer, nullable=False, default=0)
+    summary_words = db.Column(db.Integer, nullable=False, default=0)
+    compression_sum = db.Column(db.Float, nullable=False, default=0.0)
+
+    # Length bucket labels used by the analytics charts, in display order
+    LENGTH_BUCKETS = [
+        ('<100', 'length_under_100'),
+        ('100-500', 'length_100_500'),
+        ('500-1000', 'length_500_1000'),
+        ('>1000', 'length_over_1000')
+    ]
+
+    @staticmethod
+    def length_bucket(original_length):
+        """Name of the length bucket column for an original word count"""
+        if original_length < 100:
+            return 'length_under_100'
+        elif original_length < 500:
+            return 'length_100_500'
+        elif original_length < 1000:
+            return 'length_500_1000'
+        return 'length_over_1000'
+
+    @classmethod
+    def apply(cls, connection, summary, sign):
+        """Add (sign=1) or remove (sign=-1) one summary from its rollup row"""
+        table = cls.__table__
+        created_at = summary.created_at or datetime.utcnow()
+        key = (table.c.user_id == summary.user_id) & (table.c.day == created_at.date()) \
+            & (table.c.method == (summary.method or 'lsa'))
+        bucket = cls.length_bucket(summary.original_length)
+        deltas = {
+            'count': sign,
+            bucket: sign,
+            'original_words': sign * summary.original_length,
+            'summary_words': sign * summary.summary_length,
+            'compression_sum': sign * summary.compression_ratio
         }
+        updated = connection.execute(
+            table.update().where(key).values(
+                {name: table.c[name] + delta for name, delta in deltas.items()}
+            )
+        )
+        if updated.rowcount == 0 and sign > 0:
+            row = {column: 0 for _, column in cls.LENGTH_BUCKETS}
+            row.update(deltas)
+            row.update(user_id=summary.user_id, day=created_at.date(),
+                       method=summary.method or 'lsa')
+            connection.execute(table.insert().values(row))
+
+    @classmethod
+    def backfill(cls):
+        """Rebuild every rollup row from the Summary table"""
+        cls.query.delete()
+        def bucket(low, high=None):
+            condition = Summary.original_length >= low
+            if high is not None:
+                condition &= Summary.original_length < high
+            return func.sum(db.case((condition, 1), else_=0))
+        
+        day = func.date(Summary.created_at)
+        method = func.coalesce(Summary.method, 'lsa')
+        rows = db.session.query(
+            Summary.user_id, day, method, func.count(Summary.id),
+            bucket(0, 100), bucket(100, 500), bucket(500, 1000), bucket(1000),
+            func.sum(Summary.original_length), func.sum(Summary.summary_length),
+            func.sum(Summary.compression_ratio)
+        ).group_by(Summary.user_id, day, method).all()
+        for row in rows:
+            # SQLite returns date() as a string
+            day_value = row[1]
+            if isinstance(day_value, str):
+                day_value = datetime.strptime(day_value, '%Y-%m-%d').date()
+            db.session.add(cls(
+                user_id=row[0], day=day_value, method=row[2], count=row[3],
+                length_under_100=row[4], length_100_500=row[5],
+                length_500_1000=row[6], length_over_1000=row[7],
+                original_words=row[8], summary_words=row[9], compression_sum=row[10]
+            ))
+        db.session.commit()
+        return len(rows)
+
+@event.listens_for(Summary, 'after_insert')
+def _rollup_summary_insert(mapper, connection, target):
+    SummaryRollup.apply(connection, target, 1)
+
+@event.listens_for(Summary, 'after_delete')
+def _rollup_summary_delete(mapper, connection, target):
+    SummaryRollup.apply(connection, target, -1)
 
+
+def _preview_sql(column, length=100):
+    # preview() in SQL, for backfilling existing rows
+    return f"CASE WHEN length({column}) > {length} THEN substr({column}, 1, {length}) || '...' " \
+           f"ELSE {column} END"
+
+def upgrade_schema():
+    """Create missing tables and bring older tables up to the current models.
+
+    create_all() leaves existing tables alone, so columns and indexes added
+    since a database was created are added here (as nullable columns), and
+    summary bodies still in the old summary.original_text column move to
+    SummaryContent with their previews filled in. An empty SummaryRollup is
+    backfilled from existing summaries. Safe to run repeatedly;
+    returns the names of the tables it created.
+    """
+    with db.engine.begin() as connection:
+        inspector = inspect(connection)
+        existing = set(inspector.get_table_names())
+        db.metadata.create_all(connection)
+        preparer = connection.dialect.identifier_preparer
+        added = {}
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing:
+                continue
+            columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    connection.exec_driver_sql(
+                        f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN '
+                        f'{preparer.format_column(column)} {column.type.compile(connection.dialect)}'
+                    )
+                    added.setdefault(table.name, set()).add(column.name)
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+            if table.name == 'summary' and 'original_text' in columns:
+                connection.exec_driver_sql(
+                    'INSERT INTO summary_content (summary_id, original_text) '
+                    'SELECT id, original_text FROM summary '
+                    'WHERE id NOT IN (SELECT summary_id FROM summary_content)'
+                )
+                connection.exec_driver_sql(
+                    f'UPDATE summary SET original_preview = {_preview_sql("original_text")} '
+                    'WHERE original_preview IS NULL'
+                )
+                connection.exec_driver_sql('ALTER TABLE summary DROP COLUMN original_text')
+        if 'commit_seq' in added.get('summary', ()):
+            # Rows written before the column existed are all committed already
+            connection.exec_driver_sql('UPDATE summary SET commit_seq = id')
+        if 'summary_preview' in added.get('summary', ()):
+            connection.exec_driver_sql(
+                f'UPDATE summary SET summary_preview = {_preview_sql("summary_text")}'
+            )
+    # Rollups only follow new rows; one that was created after its summaries starts empty
+    if db.session.query(SummaryRollup.user_id).first() is None \
+            and db.session.query(Summary.id).first() is not None:
+        SummaryRollup.backfill()
+    return set(db.metadata.tables) - existing
+
+
+# PRAGMA name and the config key that sets it; an empty value leaves the default
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'SQLITE_JOURNAL_MODE'),
+    ('synchronous', 'SQLITE_SYNCHRONOUS'),
+    ('busy_timeout', 'SQLITE_BUSY_TIMEOUT'),
+    ('cache_size', 'SQLITE_CACHE_SIZE'),
+    ('mmap_size', 'SQLITE_MMAP_SIZE'),
+    ('temp_store', 'SQLITE_TEMP_STORE'),
+)
+
+# The pragma listener registered on each engine, replaced when an app is configured again
+_pragma_listeners = weakref.WeakKeyDictionary()
+
+def configure_sqlite(app):
+    """Apply the SQLITE_* pragmas from the app config to every new connection of its SQLite engine"""
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = [(name, app.config[key]) for name, key in SQLITE_PRAGMAS
+               if app.config.get(key) not in (None, '')]
+    
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+    
+    previous = _pragma_listeners.get(engine)
+    if previous is not None:
+        event.remove(engine, 'connect', previous)
+    event.listen(engine, 'connect', set_pragmas)
+    _pragma_listeners[engine] = set_pragmas
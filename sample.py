@@ -1,6 +1,7 @@
 import os
 import sys
 import random
+import time
 from datetime import datetime, timedelta
 from faker import Faker
 import requests
@@ -9,8 +10,11 @@ from bs4 import BeautifulSoup
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from sqlalchemy import func
 from app import app, db
-from models import User, Summary
+from models import User, Summary, SummaryContent, SummaryRollup, IdBlock, preview, upgrade_schema
+from duplicates import minhash_signature, signature_bytes
+from search import summary_search
 
 fake = Faker()
 
@@ -20,8 +24,19 @@ class SampleDataGenerator:
         self.summaries = []
         self.sample_texts = []
         
-    def generate_sample_texts(self):
+    def load_sample_texts(self, path=None):
+        """Load sample texts exported to sample_texts.json, without network access"""
+        import json
+        path = path or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sample_texts.json')
+        with open(path, encoding='utf-8') as f:
+            self.sample_texts = json.load(f)['sample_texts']
+        return self.sample_texts
+    
+    def generate_sample_texts(self, offline=False):
         """Generate or fetch sample texts for summarization"""
+        if offline:
+            return self.load_sample_texts()
+        
         print("Generating sample texts...")
         
         # Sample texts from various domains
@@ -318,6 +333,8 @@ def create_performance_test_data():
     generator = SampleDataGenerator()
     
     with app.app_context():
+        upgrade_schema()
+        
         # Create 50 users with 20 summaries each
         generator.generate_users(50)
         generator.sample_texts = generate_large_text_corpus()
@@ -336,6 +353,147 @@ def create_performance_test_data():
         print(f"- Users: {len(generator.users)}")
         print(f"- Summaries: {len(generator.summaries)}")
 
+class BulkDataGenerator:
+    """High-volume seeding for load and performance tests.
+
+    Rows are built as plain dicts in batches and written with Core bulk
+    inserts, so memory stays flat and no ORM objects are created. Every user
+    shares one precomputed password hash, ids are allocated up front, and
+    the analytics rollup is rebuilt once at the end. Summaries are computed
+    once per distinct text (and per method with ``summarize``) and reused.
+    """
+    
+    METHODS = ('lsa', 'text_rank', 'luhn', 'lex_rank')
+    
+    def __init__(self, batch_size=10000, summarize=False, workers=None, seed=None):
+        self.batch_size = batch_size
+        self.summarize = summarize
+        self.workers = workers
+        self.random = random.Random(seed)
+        self.password_hash = None
+        self.templates = []
+    
+    def prepare_texts(self):
+        """Build one row template per distinct text and method, offline"""
+        texts = SampleDataGenerator().load_sample_texts() + \
+            [' '.join(text.split()) for text in generate_large_text_corpus()]
+        
+        if self.summarize:
+            from utils import summarizer
+            print(f"Summarizing {len(texts)} texts with {len(self.METHODS)} methods...")
+            jobs = [{'text': text, 'method': method} for text in texts for method in self.METHODS]
+            results = summarizer.summarize_many(jobs, max_workers=self.workers)
+            pairs = [(job['text'], job['method'], result) for job, result in zip(jobs, results)
+                     if 'error' not in result]
+        else:
+            naive = SampleDataGenerator()
+            pairs = []
+            for text in texts:
+                result = naive.generate_summary(text, None)
+                pairs.append((text, 'lsa', result))
+        
+        self.templates = [{
+            'original_text': text,
+            'summary_text': result['summary'],
+            'summary_preview': preview(result['summary']),
+            'original_preview': preview(text),
+            'summary_length': result['summary_length'],
+            'original_length': result['original_length'],
+            'compression_ratio': round(result['compression_ratio'], 2),
+            'title': preview(text),
+            'language': 'english',
+            'method': method,
+            'signature': signature_bytes(minhash_signature(text))
+        } for text, method, result in pairs]
+        return self.templates
+    
+    def iter_users(self, count, first_id):
+        """Yield batches of user rows"""
+        now = datetime.utcnow()
+        batch = []
+        for user_id in range(first_id, first_id + count):
+            username = f'{fake.user_name()}{user_id}'
+            batch.append({
+                'id': user_id,
+                'username': username,
+                'email': f'{username}@example.com',
+                'password_hash': self.password_hash,
+                'created_at': now - timedelta(seconds=self.random.randint(0, 90 * 86400)),
+                'is_active': True
+            })
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
+    def iter_summaries(self, users, per_user, first_id):
+        """Yield (summary rows, content rows) batches for (user_id, created_at) pairs"""
+        now = datetime.utcnow()
+        summary_id = first_id
+        summaries, contents = [], []
+        for user_id, joined_at in users:
+            age = max(1, int((now - joined_at).total_seconds()))
+            for _ in range(per_user):
+                template = self.random.choice(self.templates)
+                row = dict(template, id=summary_id, user_id=user_id,
+                           created_at=joined_at + timedelta(seconds=self.random.randint(0, age)))
+                contents.append({'summary_id': summary_id, 'original_text': row.pop('original_text')})
+                summaries.append(row)
+                summary_id += 1
+                if len(summaries) >= self.batch_size:
+                    yield summaries, contents
+                    summaries, contents = [], []
+        if summaries:
+            yield summaries, contents
+    
+    def run(self, user_count, summaries_per_user):
+        """Insert user_count users with summaries_per_user summaries each"""
+        from werkzeug.security import generate_password_hash
+        
+        started = time.perf_counter()
+        self.password_hash = generate_password_hash('password123')
+        self.prepare_texts()
+        
+        with app.app_context():
+            upgrade_schema()
+            first_user = (db.session.query(func.max(User.id)).scalar() or 0) + 1
+            # Reserved like write-behind ids, so a running server cannot hand them out too
+            first_summary = IdBlock.reserve(Summary, user_count * summaries_per_user)
+            
+            users = []
+            for batch in self.iter_users(user_count, first_user):
+                db.session.execute(User.__table__.insert(), batch)
+                db.session.commit()
+                users.extend((row['id'], row['created_at']) for row in batch)
+            print(f"Inserted {len(users)} users in {time.perf_counter() - started:.1f}s")
+            
+            inserted = 0
+            for summaries, contents in self.iter_summaries(users, summaries_per_user, first_summary):
+                # Sequenced in this batch's transaction, so a running near-duplicate
+                # index catches up on the rows in commit order
+                first_seq = IdBlock.reserve(Summary, len(summaries), db.session.connection(),
+                                            column='commit_seq')
+                for offset, row in enumerate(summaries):
+                    row['commit_seq'] = first_seq + offset
+                db.session.execute(Summary.__table__.insert(), summaries)
+                db.session.execute(SummaryContent.__table__.insert(), contents)
+                db.session.commit()
+                inserted += len(summaries)
+                elapsed = time.perf_counter() - started
+                print(f"Inserted {inserted} summaries ({inserted / elapsed:,.0f} rows/s)", end='\r')
+            print()
+            
+            # Core inserts skip the mapper events that maintain the rollup
+            days = SummaryRollup.backfill()
+            print(f"Rebuilt {days} rollup rows")
+            indexed = summary_search.rebuild()
+            print(f"Indexed {indexed} summaries for search")
+        
+        elapsed = time.perf_counter() - started
+        print(f"Bulk data created in {elapsed:.1f}s: {len(users)} users, {inserted} summaries")
+        return len(users), inserted
+
 def export_sample_data():
     """Export sample data to JSON files for external use"""
     import json
@@ -375,11 +533,21 @@ if __name__ == '__main__':
     parser.add_argument('--summaries', type=int, default=5, help='Summaries per user')
     parser.add_argument('--performance', action='store_true', help='Create larger dataset for performance testing')
     parser.add_argument('--export', action='store_true', help='Export sample texts to JSON')
+    parser.add_argument('--bulk', action='store_true', help='Bulk-insert a large dataset offline')
+    parser.add_argument('--batch-size', type=int, default=10000, help='Rows per bulk insert')
+    parser.add_argument('--summarize', action='store_true',
+                        help='Summarize the bulk texts with the real summarizer')
+    parser.add_argument('--workers', type=int, help='Process pool size for --summarize')
+    parser.add_argument('--seed', type=int, help='Random seed for bulk data')
     
     args = parser.parse_args()
     
     if args.export:
         export_sample_data()
+    elif args.bulk:
+        BulkDataGenerator(args.batch_size, args.summarize, args.workers, args.seed).run(
+            args.users, args.summaries
+        )
     elif args.performance:
         create_performance_test_data()
     else:
@@ -0,0 +1,300 @@
+import base64
+import math
+import re
+import sqlite3
+from collections import Counter
+
+from sqlalchemy import and_, column, event, func, literal_column, or_, select, table, text
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Summary, SummaryContent, SummaryRollup, SearchPosting
+
+# Relative weight of a match in the title, the summary and the original text
+FIELD_WEIGHTS = (3.0, 2.0, 1.0)
+
+# Words, with an optional trailing * for prefix search
+_QUERY_TERM = re.compile(r'([^\W_]+)(\*?)')
+_WORD = re.compile(r'[^\W_]+')
+
+FTS_TABLE = 'summary_search'
+_fts = table(FTS_TABLE, column('rowid'))
+
+
+def tokenize(text):
+    return _WORD.findall(text.lower()) if text else []
+
+
+def parse_query(query):
+    """(term, is_prefix) pairs of a free-text query; all terms must match"""
+    return [(term, bool(star)) for term, star in _QUERY_TERM.findall(query.lower())][:16]
+
+
+def encode_cursor(score, summary_id, floor=0):
+    raw = f'{score!r}|{summary_id}|{floor}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(score, summary id, lowest ranked summary id) of a search cursor"""
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    score, summary_id, floor = raw.split('|')
+    return float(score), int(summary_id), int(floor)
+
+
+class SummarySearch:
+    """Ranked full-text search over the title, summary and original text of summaries.
+
+    On SQLite with FTS5 the text goes into a ``summary_search`` virtual table
+    whose rowid is the summary id and matches are joined to the user's
+    summaries by primary key. Elsewhere an
+    inverted index of (user, term, summary) postings in ``SearchPosting`` is
+    scored with BM25 in Python. Both are kept current by mapper events and
+    page by (score, id) cursors, best match first.
+
+    Ranking has to score every match, so a query matching more than
+    ``rank_window`` summaries ranks only the newest ``rank_window`` of them;
+    the cutoff is fixed on the first page and carried in the cursor.
+    """
+
+    # BM25 parameters for the inverted index; document lengths are compared
+    # with a fixed typical length instead of a maintained average
+    K1 = 1.2
+    B = 0.75
+    TYPICAL_LENGTH = 300
+    MAX_TERM_LENGTH = 64
+    # Candidate ids checked against the history filters per query
+    FILTER_CHUNK = 500
+
+    def __init__(self):
+        self.enabled = True
+        self.preferred = 'auto'
+        self.rank_window = 1000
+        self.backend = None
+
+    def init_app(self, app):
+        """Configure from the app config"""
+        self.enabled = app.config.get('SEARCH_ENABLED', self.enabled)
+        self.preferred = app.config.get('SEARCH_BACKEND', self.preferred)
+        self.rank_window = app.config.get('SEARCH_RANK_WINDOW', self.rank_window)
+
+    def resolve_backend(self, connection):
+        """Pick 'fts5' or 'inverted' for this database, creating the FTS5 table if needed"""
+        if self.backend is not None:
+            return self.backend
+        backend = 'inverted'
+        if self.preferred in ('auto', 'fts5') and connection.dialect.name == 'sqlite':
+            # contentless_delete keeps no second copy of the text, from SQLite 3.43
+            contentless = ", content='', contentless_delete=1" \
+                if sqlite3.sqlite_version_info >= (3, 43) else ''
+            try:
+                connection.exec_driver_sql(
+                    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+                    f'title, summary_text, original_text{contentless})'
+                )
+                backend = 'fts5'
+            except Exception:
+                if self.preferred == 'fts5':
+                    raise
+        self.backend = backend
+        return backend
+
+    def setup(self):
+        """Choose the backend and create its table; run inside an app context.
+
+        An empty index over existing summaries, e.g. one just created for an
+        older database, is rebuilt here, since mapper events only index new rows.
+        """
+        with db.engine.begin() as connection:
+            backend = self.resolve_backend(connection)
+            index = _fts if backend == 'fts5' else SearchPosting.__table__
+            stale = self.enabled \
+                and connection.execute(select(literal_column('1')).select_from(index).limit(1)).first() is None \
+                and connection.execute(select(Summary.id).limit(1)).first() is not None
+        if stale:
+            try:
+                self.rebuild()
+            except IntegrityError:
+                # Another process is rebuilding the same index
+                db.session.rollback()
+        return backend
+
+    def index(self, connection, summary_id, user_id, title, summary_text, original_text):
+        """Add one summary to the index"""
+        if self.resolve_backend(connection) == 'fts5':
+            connection.execute(text(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, summary_text, original_text) '
+                'VALUES (:id, :title, :summary_text, :original_text)'
+            ), {'id': summary_id, 'title': title or '',
+                'summary_text': summary_text or '', 'original_text': original_text or ''})
+            return
+        postings = self.postings(title, summary_text, original_text)
+        if postings:
+            connection.execute(SearchPosting.__table__.insert(), [
+                {'user_id': user_id, 'term': term, 'summary_id': summary_id, 'weight': weight}
+                for term, weight in postings.items()
+            ])
+
+    def remove(self, connection, summary_id):
+        """Drop one summary from the index"""
+        if self.resolve_backend(connection) == 'fts5':
+            connection.execute(text(f'DELETE FROM {FTS_TABLE} WHERE rowid = :id'), {'id': summary_id})
+        else:
+            connection.execute(SearchPosting.__table__.delete()
+                               .where(SearchPosting.summary_id == summary_id))
+
+    def postings(self, title, summary_text, original_text):
+        """Saturated, length-normalised BM25 term weights of one summary"""
+        frequencies = Counter()
+        length = 0
+        for weight, field in zip(FIELD_WEIGHTS, (title, summary_text, original_text)):
+            terms = tokenize(field)
+            length += len(terms)
+            for term, count in Counter(terms).items():
+                if len(term) <= self.MAX_TERM_LENGTH:
+                    frequencies[term] += weight * count
+        norm = self.K1 * (1 - self.B + self.B * length / self.TYPICAL_LENGTH)
+        return {term: tf * (self.K1 + 1) / (tf + norm) for term, tf in frequencies.items()}
+
+    def search(self, query, user_id, base_query, cursor=None, per_page=20):
+        """The page of (summary, score) matches after cursor, and the next cursor.
+
+        ``base_query`` is a Summary query, e.g. the history filters; only its
+        rows are returned. Raises ValueError for a bad cursor.
+        """
+        terms = parse_query(query)
+        after = decode_cursor(cursor) if cursor else None
+        if not terms:
+            return [], None
+        if self.resolve_backend(db.session.connection()) == 'fts5':
+            rows, floor = self._search_fts(terms, user_id, base_query, after, per_page + 1)
+        else:
+            rows, floor = self._search_inverted(terms, user_id, base_query, after, per_page + 1)
+        if len(rows) <= per_page:
+            return rows, None
+        summary, score = rows[per_page - 1]
+        return rows[:per_page], encode_cursor(score, summary.id, floor)
+
+    def _search_fts(self, terms, user_id, base_query, after, limit):
+        match = ' '.join(f'"{term}"' + ('*' if prefix else '') for term, prefix in terms)
+        if after is not None:
+            floor = after[2]
+        else:
+            # The user's match rank_window back from the newest; nothing if there are fewer
+            floor = db.session.execute(text(
+                f'SELECT s.id FROM {FTS_TABLE} JOIN summary s ON s.id = {FTS_TABLE}.rowid '
+                f'WHERE {FTS_TABLE} MATCH :match AND s.user_id = :user_id '
+                f'ORDER BY {FTS_TABLE}.rowid DESC LIMIT 1 OFFSET :window'
+            ), {'match': match, 'user_id': user_id, 'window': self.rank_window}).scalar() or 0
+
+        bm25 = func.bm25(literal_column(FTS_TABLE), *FIELD_WEIGHTS)
+        query = base_query.join(_fts, _fts.c.rowid == Summary.id)\
+            .filter(literal_column(FTS_TABLE).op('MATCH')(match))
+        if floor:
+            query = query.filter(_fts.c.rowid > floor)
+        if after is not None:
+            # bm25() is negative, lower is better; scores are reported negated
+            score, summary_id, _ = after
+            query = query.filter(or_(bm25 > -score, and_(bm25 == -score, Summary.id < summary_id)))
+        rank = bm25.label('rank')
+        rows = query.add_columns(rank).order_by(rank, Summary.id.desc()).limit(limit).all()
+        return [(summary, -rank) for summary, rank in rows], floor
+
+    def _search_inverted(self, terms, user_id, base_query, after, limit):
+        documents = db.session.query(func.coalesce(func.sum(SummaryRollup.count), 0))\
+            .filter(SummaryRollup.user_id == user_id).scalar() or 1
+        scores = None
+        for term, prefix in terms:
+            postings = db.session.query(SearchPosting.summary_id, func.max(SearchPosting.weight))\
+                .filter(SearchPosting.user_id == user_id)
+            if prefix:
+                postings = postings.filter(SearchPosting.term >= term,
+                                           SearchPosting.term < term + '\uffff')
+            else:
+                postings = postings.filter(SearchPosting.term == term)
+            weights = dict(postings.group_by(SearchPosting.summary_id).all())
+            idf = math.log(1 + (documents - len(weights) + 0.5) / (len(weights) + 0.5))
+            if scores is None:
+                scores = {summary_id: idf * weight for summary_id, weight in weights.items()}
+            else:
+                scores = {summary_id: score + idf * weights[summary_id]
+                          for summary_id, score in scores.items() if summary_id in weights}
+            if not scores:
+                return [], 0
+
+        if after is not None:
+            floor = after[2]
+        else:
+            newest = sorted(scores, reverse=True)
+            floor = newest[self.rank_window] if len(newest) > self.rank_window else 0
+        ranked = sorted(((summary_id, score) for summary_id, score in scores.items() if summary_id > floor),
+                        key=lambda item: (-item[1], -item[0]))
+        if after is not None:
+            score, summary_id, _ = after
+            ranked = [item for item in ranked
+                      if item[1] < score or (item[1] == score and item[0] < summary_id)]
+        # Keep ranked order while applying the base query's filters chunk by chunk
+        rows = []
+        for start in range(0, len(ranked), self.FILTER_CHUNK):
+            chunk = ranked[start:start + self.FILTER_CHUNK]
+            found = {summary.id: summary for summary in
+                     base_query.filter(Summary.id.in_([summary_id for summary_id, _ in chunk]))}
+            rows.extend((found[summary_id], score) for summary_id, score in chunk if summary_id in found)
+            if len(rows) >= limit:
+                break
+        return rows[:limit], floor
+
+    def rebuild(self, batch_size=2000):
+        """Reindex every summary, e.g. after a bulk load or when switching backends"""
+        connection = db.session.connection()
+        if self.resolve_backend(connection) == 'fts5':
+            connection.exec_driver_sql(f'DELETE FROM {FTS_TABLE}')
+            connection.exec_driver_sql(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, summary_text, original_text) '
+                "SELECT s.id, coalesce(s.title, ''), s.summary_text, "
+                "coalesce(c.original_text, '') FROM summary s "
+                'LEFT JOIN summary_content c ON c.summary_id = s.id'
+            )
+            db.session.commit()
+            return db.session.query(func.count(Summary.id)).scalar()
+
+        SearchPosting.query.delete()
+        indexed = 0
+        last_id = 0
+        while True:
+            rows = db.session.query(Summary.id, Summary.user_id, Summary.title,
+                                    Summary.summary_text, SummaryContent.original_text)\
+                .outerjoin(SummaryContent, SummaryContent.summary_id == Summary.id)\
+                .filter(Summary.id > last_id).order_by(Summary.id).limit(batch_size).all()
+            if not rows:
+                break
+            for summary_id, user_id, title, summary_text, original_text in rows:
+                self.index(connection, summary_id, user_id, title, summary_text, original_text)
+            db.session.commit()
+            connection = db.session.connection()
+            last_id = rows[-1][0]
+            indexed += len(rows)
+        return indexed
+
+
+summary_search = SummarySearch()
+
+
+@event.listens_for(Summary, 'after_insert')
+def _index_summary(mapper, connection, target):
+    if summary_search.enabled:
+        summary_search.index(connection, target.id, target.user_id, target.title,
+                             target.summary_text, target.original_text)
+
+
+@event.listens_for(Summary, 'before_delete')
+def _unindex_summary(mapper, connection, target):
+    if summary_search.enabled:
+        summary_search.remove(connection, target.id)
+
+
+@event.listens_for(db.metadata, 'after_drop')
+def _drop_search_table(target, connection, **kw):
+    # The FTS5 table is created outside the metadata, so drop_all() misses it
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    summary_search.backend = None
@@ -0,0 +1,202 @@
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+# Minimum sustained throughput for Segmenter.segment, checked by benchmark()
+THROUGHPUT_TARGET_MB_S = 20.0
+
+# Punctuation clean_text keeps besides word characters and whitespace
+KEPT_PUNCTUATION = '.,!?;:'
+
+# Common abbreviations, lower-cased without the final period. Languages with a
+# punkt model installed also get the abbreviations that model learned.
+ABBREVIATIONS = {
+    'english': {'mr', 'mrs', 'ms', 'dr', 'prof', 'sr', 'jr', 'st', 'vs', 'etc', 'e.g', 'i.e',
+                'inc', 'ltd', 'co', 'corp', 'jan', 'feb', 'mar', 'apr', 'jun', 'jul', 'aug',
+                'sep', 'sept', 'oct', 'nov', 'dec', 'no', 'fig', 'approx', 'dept', 'est',
+                'gen', 'gov', 'sen', 'rep', 'u.s', 'u.k', 'a.m', 'p.m'},
+    'german': {'dr', 'prof', 'hr', 'fr', 'nr', 'str', 'bzw', 'ca', 'usw', 'z.b', 'd.h',
+               'u.a', 'vgl', 'evtl', 'ggf', 'inkl', 'bzgl', 'jh', 'mio', 'mrd'},
+    'french': {'m', 'mm', 'mme', 'mlle', 'dr', 'pr', 'st', 'ste', 'etc', 'cf', 'p.ex',
+               'av', 'bd', 'env', 'fig', 'vol', 'no'},
+    'spanish': {'sr', 'sra', 'srta', 'dr', 'dra', 'ud', 'uds', 'etc', 'p.ej', 'pág',
+                'núm', 'av', 'avda', 'ee.uu', 'cía'},
+    'italian': {'sig', 'sigg', 'sig.ra', 'dott', 'prof', 'ing', 'avv', 'ecc', 'es',
+                'pag', 'n', 'fig', 'vol'},
+    'portuguese': {'sr', 'sra', 'dr', 'dra', 'prof', 'etc', 'ex', 'pág', 'av', 'nº',
+                   'fig', 'vol'},
+    'dutch': {'dhr', 'mevr', 'dr', 'prof', 'ir', 'ing', 'bijv', 'o.a', 'd.w.z', 'enz',
+              'ca', 'nr', 'blz'},
+    'czech': {'tj', 'tzn', 'např', 'atd', 'apod', 'resp', 'str', 'č', 'ing', 'mgr',
+              'dr', 'prof'},
+}
+
+Segmentation = namedtuple('Segmentation', [
+    'text', 'sentence_starts', 'sentence_ends', 'word_starts', 'word_ends'
+])
+
+
+class _CleanTable(dict):
+    """str.translate table that drops the characters clean_text removes.
+
+    Entries are computed on first sight of a code point and cached, so the
+    table only ever holds the characters that actually occur.
+    """
+
+    def __missing__(self, code):
+        char = chr(code)
+        keep = char.isalnum() or char == '_' or char.isspace() or char in KEPT_PUNCTUATION
+        self[code] = code if keep else None
+        return self[code]
+
+
+_clean_table = _CleanTable()
+
+def clean(text):
+    """Drop special characters and collapse whitespace, equivalent to the regex passes"""
+    return ' '.join(text.translate(_clean_table).split())
+
+
+class Segmenter:
+    """Splits cleaned text into sentences and words as offset arrays.
+
+    Works on whitespace-normalised text, so words are the runs between single
+    spaces and a sentence ends after a word ending in ``.``, ``!`` or ``?``.
+    Periods after abbreviations and initials, or followed by a lower-case word,
+    do not end a sentence.
+    """
+
+    def __init__(self, language='english'):
+        self.language = language
+        self.abbreviations = set(ABBREVIATIONS.get(language, ()))
+        self.abbreviations.update(self._punkt_abbreviations(language))
+        self._abbreviation_cache = {}
+
+    @staticmethod
+    def _punkt_abbreviations(language):
+        # Reuse what punkt learned when its model is installed, never download it;
+        # the language is part of a resource path, so only plain names are looked up
+        if not language.isalpha():
+            return ()
+        try:
+            import nltk.data
+            tokenizer = nltk.data.load(f'tokenizers/punkt/{language}.pickle')
+            return tokenizer._params.abbrev_types
+        except (ImportError, LookupError, AttributeError):
+            return ()
+
+    def segment(self, text, clean_text=True):
+        """Clean text if requested and return its Segmentation"""
+        text = clean(text) if clean_text else ' '.join(text.split())
+        length = len(text)
+        empty = np.zeros(0, dtype=np.int64)
+        if not length:
+            return Segmentation(text, empty, empty, empty, empty)
+
+        codes, spaces, word_starts, word_ends = self._words(text)
+
+        # Candidate boundaries: a terminal character right before a space
+        before = codes[spaces - 1]
+        period = before == ord('.')
+        candidates = np.flatnonzero(period | (before == ord('!')) | (before == ord('?')))
+
+        # '!' and '?' always end a sentence; a period followed by an ASCII
+        # lower-case word never does, the rest need the abbreviation check
+        following = codes[word_starts[candidates + 1]]
+        lower = (following >= ord('a')) & (following <= ord('z'))
+        is_period = period[candidates]
+        boundary = ~is_period
+        undecided = candidates[is_period & ~lower]
+        if undecided.size:
+            boundary[is_period & ~lower] = [
+                self._is_period_boundary(text[start:end], following)
+                for start, end, following in zip(word_starts[undecided].tolist(),
+                                                 word_ends[undecided].tolist(),
+                                                 codes[word_starts[undecided + 1]].tolist())
+            ]
+        boundaries = candidates[boundary]
+
+        sentence_starts = np.concatenate(([0], word_starts[boundaries + 1]))
+        sentence_ends = np.concatenate((word_ends[boundaries], [length]))
+        return Segmentation(text, sentence_starts, sentence_ends, word_starts, word_ends)
+
+    @staticmethod
+    def _words(text):
+        # Words of whitespace-normalised text are the runs between single spaces
+        if text.isascii():
+            codes = np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+        else:
+            codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+        offset_type = np.int32 if len(text) < 2 ** 31 else np.int64
+        spaces = np.flatnonzero(codes == 32).astype(offset_type)
+        word_starts = np.empty(spaces.size + 1, dtype=offset_type)
+        word_starts[0] = 0
+        word_starts[1:] = spaces + 1
+        word_ends = np.empty(spaces.size + 1, dtype=offset_type)
+        word_ends[:-1] = spaces
+        word_ends[-1] = len(text)
+        return codes, spaces, word_starts, word_ends
+
+    def _is_period_boundary(self, word, following):
+        # Abbreviations and initials keep the sentence going
+        if word in self._abbreviation_cache:
+            abbreviation = self._abbreviation_cache[word]
+        else:
+            stem = word.rstrip('.').lower()
+            abbreviation = not stem or stem in self.abbreviations \
+                or (len(stem) == 1 and stem.isalpha())
+            if len(self._abbreviation_cache) < 100000:
+                self._abbreviation_cache[word] = abbreviation
+        return not abbreviation and not chr(following).islower()
+
+    def from_sentences(self, sentences):
+        """Segmentation for text that is already split into cleaned sentences"""
+        text = ' '.join(sentences)
+        if not text:
+            empty = np.zeros(0, dtype=np.int64)
+            return Segmentation(text, empty, empty, empty, empty)
+        lengths = np.fromiter(map(len, sentences), dtype=np.int64, count=len(sentences))
+        sentence_starts = np.concatenate(([0], np.cumsum(lengths + 1)[:-1]))
+        _, _, word_starts, word_ends = self._words(text)
+        return Segmentation(text, sentence_starts, sentence_starts + lengths, word_starts, word_ends)
+
+    def sentences(self, text, clean_text=True):
+        """Split text into sentence strings"""
+        segmentation = self.segment(text, clean_text)
+        return [segmentation.text[start:end] for start, end
+                in zip(segmentation.sentence_starts.tolist(), segmentation.sentence_ends.tolist())]
+
+
+_segmenters = {}
+_segmenters_lock = threading.Lock()
+
+
+def get_segmenter(language='english'):
+    """Return the shared Segmenter for language"""
+    segmenter = _segmenters.get(language)
+    if segmenter is None:
+        with _segmenters_lock:
+            segmenter = _segmenters.get(language)
+            if segmenter is None:
+                segmenter = _segmenters[language] = Segmenter(language)
+    return segmenter
+
+
+def benchmark(size_mb=8, language='english'):
+    """Measure segment() throughput in MB/s on synthetic text of about size_mb"""
+    sentence = ('Dr. Smith reviewed the quarterly results on Jan. 5 and found that revenue, '
+                'costs and margins improved!  Did the U.S. market grow as well? ')
+    text = sentence * int(size_mb * 1024 * 1024 / len(sentence))
+    segmenter = get_segmenter(language)
+    started = time.perf_counter()
+    segmenter.segment(text)
+    elapsed = time.perf_counter() - started
+    return len(text.encode('utf-8')) / (1024 * 1024) / elapsed
+
+
+if __name__ == '__main__':
+    throughput = benchmark()
+    status = 'ok' if throughput >= THROUGHPUT_TARGET_MB_S else 'below target'
+    print(f'segment: {throughput:.1f} MB/s (target {THROUGHPUT_TARGET_MB_S:.0f} MB/s, {status})')
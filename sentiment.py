@@ -0,0 +1,171 @@
+import threading
+from itertools import compress, repeat
+
+import numpy as np
+
+# Tokens TextBlob's tokenizer splits off words; the cleaner keeps only these
+_PUNCTUATION_PADDING = str.maketrans({char: f' {char} ' for char in '.,!?;:'})
+
+# Separates sentences when they are tokenized together; never produced by the cleaner
+SENTENCE_MARKER = '\x00'
+
+# Agreement with TextBlob's PatternAnalyzer checked by compare()
+POLARITY_TOLERANCE = 0.05
+
+
+class LexiconSentiment:
+    """Vectorized polarity scoring with the lexicon behind TextBlob's PatternAnalyzer.
+
+    The lexicon is compiled once into arrays indexed by token id. Scoring looks
+    each token up once and then reproduces the analyzer's rules (intensifying
+    modifiers, negation and exclamation marks) with array operations instead of
+    a per-word state machine. Modifier and negation state is reset at sentence
+    starts, so a document's polarity is exactly the ratio of its per-sentence
+    sums and counts and sentence scores can be cached and combined.
+    """
+
+    def __init__(self):
+        self._index = None
+        self._lock = threading.Lock()
+
+    def compile(self):
+        """Build the token index and lexicon arrays, once"""
+        if self._index is not None:
+            return
+        with self._lock:
+            if self._index is not None:
+                return
+            from textblob.en import sentiment as lexicon
+            lexicon.load()
+            negations = set(lexicon.negations)
+
+            tokens = list(lexicon) + sorted(negations - set(lexicon)) + ['!']
+            index = {token: token_id for token_id, token in enumerate(tokens)}
+            size = len(tokens) + 1  # the last id stands for every unknown token
+            self._known = np.zeros(size, dtype=bool)
+            self._polarity = np.zeros(size)
+            self._intensity = np.ones(size)
+            self._modifier = np.zeros(size, dtype=bool)
+            self._negation = np.zeros(size, dtype=bool)
+            self._exclamation = np.zeros(size, dtype=bool)
+            for token, token_id in index.items():
+                entry = lexicon.get(token)
+                if entry and None in entry:
+                    polarity, _, intensity = entry[None]
+                    self._known[token_id] = True
+                    self._polarity[token_id] = polarity
+                    self._intensity[token_id] = intensity or 1.0
+                    self._modifier[token_id] = any(pos in entry for pos in lexicon.modifiers)
+                self._negation[token_id] = token in negations
+            self._exclamation[index['!']] = not self._known[index['!']]
+            self._unknown = size - 1
+            self._index = index
+
+    @staticmethod
+    def tokenize(sentence):
+        return sentence.lower().translate(_PUNCTUATION_PADDING).split()
+
+    def score_sentences(self, sentences):
+        """Per-sentence (polarity sums, assessment counts) arrays for cleaned sentences"""
+        self.compile()
+        n_sentences = len(sentences)
+        # Tokenize everything in one pass with a marker token between sentences
+        tokens = self.tokenize(f' {SENTENCE_MARKER} '.join(sentences))
+        if len(tokens) <= n_sentences - 1:
+            return np.zeros(n_sentences), np.zeros(n_sentences)
+        markers = np.fromiter(map(SENTENCE_MARKER.__eq__, tokens), dtype=bool, count=len(tokens))
+        sentence_of = np.cumsum(markers)[~markers]
+        tokens = list(compress(tokens, ~markers))
+
+        unknown = self._unknown
+        ids = np.fromiter(map(self._index.get, tokens, repeat(unknown)), dtype=np.int64,
+                          count=len(tokens))
+        token_lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens))
+        sentence_start = np.ones(len(tokens), dtype=bool)
+        sentence_start[1:] = sentence_of[1:] != sentence_of[:-1]
+
+        known = self._known[ids]
+        negation = self._negation[ids]
+        positions = np.flatnonzero(known)
+        if not positions.size:
+            return np.zeros(n_sentences), np.zeros(n_sentences)
+
+        # Modifier: the previous known word in the sentence is an adverb and no
+        # unknown word longer than two characters comes in between
+        breaks_modifier = np.cumsum((~known & (token_lengths > 2)) | sentence_start)
+        previous = np.empty(positions.size, dtype=np.int64)
+        previous[0] = -1
+        previous[1:] = positions[:-1]
+        has_previous = (previous >= 0) & (sentence_of[np.maximum(previous, 0)] == sentence_of[positions])
+        modified = has_previous & self._modifier[ids[np.maximum(previous, 0)]] \
+            & (breaks_modifier[positions] == breaks_modifier[np.maximum(previous, 0)])
+
+        # Negation: the last state change before the word sets it. Negations set
+        # it, known words and unknown words of two or more characters clear it
+        setter = negation
+        clearer = ~negation & (known | (token_lengths > 1) | sentence_start)
+        events = np.flatnonzero(setter | clearer)
+        last_event = np.searchsorted(events, positions) - 1
+        event_position = events[np.maximum(last_event, 0)]
+        negated = (last_event >= 0) & setter[event_position] \
+            & (sentence_of[event_position] == sentence_of[positions])
+
+        # Assessments start at unmodified known words; a modified word rescales
+        # the running assessment by the intensity of the word before it
+        polarity = self._polarity[ids[positions]]
+        intensity = self._intensity[ids[positions]]
+        intensity = np.where(negated, 1.0 / intensity, intensity)
+        scaled = np.clip(polarity * np.concatenate(([1.0], intensity[:-1])), -1.0, 1.0)
+        word_polarity = np.where(modified, scaled, polarity)
+        starts = ~modified
+        group = np.cumsum(starts) - 1
+        n_groups = int(group[-1]) + 1
+        last_word = np.zeros(n_groups, dtype=np.int64)
+        np.maximum.at(last_word, group, np.arange(positions.size))
+        assessment = word_polarity[last_word]
+        assessment_negated = np.bincount(group, weights=negated, minlength=n_groups) > 0
+
+        # Exclamation marks boost the assessment before them in the sentence
+        exclamations = np.flatnonzero(self._exclamation[ids])
+        if exclamations.size:
+            before = np.searchsorted(positions, exclamations) - 1
+            same = (before >= 0) & (sentence_of[positions[np.maximum(before, 0)]]
+                                    == sentence_of[exclamations])
+            boosts = np.bincount(group[before[same]], minlength=n_groups)
+            assessment = np.clip(assessment * 1.25 ** boosts, -1.0, 1.0)
+
+        assessment = np.where(assessment_negated, assessment * -0.5, assessment)
+        assessment_sentence = sentence_of[positions[starts]]
+        sums = np.bincount(assessment_sentence, weights=assessment, minlength=n_sentences)
+        counts = np.bincount(assessment_sentence, minlength=n_sentences).astype(np.float64)
+        return sums, counts
+
+    def sentence_polarity(self, sentences):
+        """Polarity of each sentence, 0.0 where no lexicon word occurs"""
+        sums, counts = self.score_sentences(sentences)
+        return np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+
+    def polarity(self, sentences):
+        """Polarity of a whole text given as cleaned sentences"""
+        sums, counts = self.score_sentences(sentences)
+        total = counts.sum()
+        return float(sums.sum() / total) if total else 0.0
+
+
+lexicon_sentiment = LexiconSentiment()
+
+
+def compare(texts, tolerance=POLARITY_TOLERANCE):
+    """Largest absolute polarity difference from TextBlob over texts, and whether it is within tolerance"""
+    from textblob.sentiments import PatternAnalyzer
+    from segmenter import get_segmenter
+
+    analyzer = PatternAnalyzer()
+    worst = 0.0
+    for text in texts:
+        segmentation = get_segmenter().segment(text)
+        sentences = [segmentation.text[start:end] for start, end in zip(
+            segmentation.sentence_starts.tolist(), segmentation.sentence_ends.tolist())]
+        expected = analyzer.analyze(segmentation.text).polarity
+        worst = max(worst, abs(lexicon_sentiment.polarity(sentences) - expected))
+    return worst, worst <= tolerance
@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+
+from admission import admission, AdmissionControl, AdmissionRejected, estimate_cost
+from benchmark import generate_corpus
+
+
+def test_cost_grows_with_the_document_and_the_method():
+    short, long = generate_corpus(100, 1), generate_corpus(1000, 1)
+    assert estimate_cost(short) < estimate_cost(long)
+    assert estimate_cost(long, 'luhn') < estimate_cost(long, 'lsa')
+    assert estimate_cost(words=1000, sentences=50) == pytest.approx(estimate_cost(None, words=1000))
+
+
+def test_bucket_throttles_a_user_and_refunds_restore_it():
+    control = AdmissionControl(rate=10, burst=100)
+    control.take('a', 80)
+    with pytest.raises(AdmissionRejected) as rejected:
+        control.take('a', 80)
+    assert rejected.value.status == 429 and rejected.value.retry_after >= 6
+    # Other users have buckets of their own
+    control.take('b', 80)
+    control.refund('a', 80)
+    control.take('a', 80)
+
+
+def test_heavy_work_waits_for_a_slot_then_is_shed():
+    control = AdmissionControl(heavy_cost=50, heavy_slots=1, heavy_wait=0.05)
+    started, release = threading.Event(), threading.Event()
+
+    def heavy():
+        with control.admit('a', 100):
+            started.set()
+            release.wait(5)
+
+    worker = threading.Thread(target=heavy)
+    worker.start()
+    started.wait(5)
+    try:
+        assert control.heavy_running() == 1
+        with pytest.raises(AdmissionRejected) as rejected:
+            with control.admit('b', 100):
+                pass
+        assert rejected.value.status == 503
+        # The shed request was refunded, so only one heavy request was charged
+        assert control._buckets['b'][0] == control.burst
+        with control.admit('b', 10):
+            pass
+    finally:
+        release.set()
+        worker.join()
+    assert control.heavy_running() == 0
+
+
+def test_summarize_is_throttled_with_retry_after(client, monkeypatch):
+    monkeypatch.setattr(admission, '_buckets', {})
+    monkeypatch.setattr(admission, 'burst', estimate_cost(generate_corpus(300, 41)) + 1)
+    monkeypatch.setattr(admission, 'rate', 1)
+    assert client.post('/summarize', json={'text': generate_corpus(300, 41)}).status_code == 200
+    response = client.post('/summarize', json={'text': generate_corpus(300, 42)})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
@@ -0,0 +1,41 @@
+from benchmark import generate_corpus
+from segmenter import Segmenter
+from utils import summarizer
+
+TEXT = generate_corpus(400, seed=21)
+
+
+def test_analyze_matches_the_separate_steps():
+    result = summarizer.analyze(TEXT, 'text_rank')
+    summary, summary_length, original_length, _ = summarizer.summarize(TEXT, 'text_rank')
+    assert result['summary'] == summary
+    assert (result['summary_length'], result['original_length']) == (summary_length, original_length)
+    assert result['sentiment'] == summarizer.analyze_sentiment(TEXT)
+    assert result['text_stats'] == summarizer.get_text_stats(TEXT)
+
+
+def test_analyze_segments_the_text_once(monkeypatch):
+    calls = []
+    segment = Segmenter.segment
+
+    def counted(self, text, clean_text=True):
+        calls.append(text)
+        return segment(self, text, clean_text)
+
+    monkeypatch.setattr(Segmenter, 'segment', counted)
+    summarizer.analyze(generate_corpus(300, seed=22), 'lsa')
+    assert len(calls) == 1
+
+
+def test_short_text_is_its_own_summary():
+    text = 'Only a few words here. Too short to summarize at all.'
+    result = summarizer.analyze(text)
+    assert result['summary'] == text
+    assert result['compression_ratio'] == 1.0
+
+
+def test_analyze_with_summary_keeps_the_given_summary():
+    result = summarizer.analyze_with_summary(TEXT, 'A given summary.')
+    assert result['summary'] == 'A given summary.'
+    assert result['summary_length'] == 3
+    assert result['text_stats'] == summarizer.get_text_stats(TEXT)
@@ -0,0 +1,63 @@
+import random
+import sys
+import threading
+
+from utils import Document, SentenceArtifacts
+
+
+def test_term_index_survives_concurrent_resets():
+    # New words fill the small vocabulary bound and reset the store every few documents
+    artifacts = SentenceArtifacts(max_sentences=1000, max_terms=300)
+    words = [f'w{"abcdefghij"[index % 10]}{"klmnopqrst"[index // 10]}' for index in range(100)]
+    rng = random.Random(0)
+    pool = [' '.join(rng.choices(words, k=8)).capitalize() + '.' for _ in range(40)]
+    errors = []
+
+    def work(seed):
+        rng = random.Random(seed)
+        try:
+            for _ in range(200):
+                # Repeated sentences are read from the store, new ones tokenized in between
+                fresh = [''.join(rng.choices('abcdefghij', k=6)) for _ in range(40)]
+                text = ' '.join(rng.choices(pool, k=5) + [' '.join(rng.choices(fresh, k=8)).capitalize() + '.'
+                                                          for _ in range(20)])
+                document = Document.from_text(text)
+                index, _ = artifacts.term_index(document)
+                for number, sentence in enumerate(document.sentences):
+                    found = [index.vocabulary[term] for term, owner
+                             in zip(index.term_ids.tolist(), index.sentence_ids.tolist()) if owner == number]
+                    assert found == SentenceArtifacts._tokenize(sentence)
+        except Exception as e:
+            errors.append(e)
+
+    # Switch threads often so resets land between the two locked sections
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=work, args=(seed,)) for seed in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert not errors
+
+
+def test_edited_text_reuses_unchanged_sentences():
+    from benchmark import generate_corpus
+    from utils import TextSummarizer
+
+    summarizer = TextSummarizer()
+    text = generate_corpus(1500, seed=61)
+    summarizer.analyze(text, 'text_rank')
+    before = summarizer.artifacts.stats()
+
+    edited = text + ' A closing sentence was added by the editor.'
+    warm = summarizer.analyze(edited, 'text_rank')
+    after = summarizer.artifacts.stats()
+    assert after['misses'] - before['misses'] == 1
+    assert after['hits'] - before['hits'] == Document.from_text(edited).sentence_count - 1
+
+    # Reused rows and warm-started ranks give the same result as a cold run
+    assert warm == TextSummarizer().analyze(edited, 'text_rank')
@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+from benchmark import generate_corpus
+from models import Summary
+from utils import PoolBusy, overrunning_tasks, summarizer
+
+
+def test_timed_out_chunks_hold_the_batch_pool_until_they_end():
+    # Start the pool's workers so both chunks are running at the deadline
+    summarizer.summarize_many([generate_corpus(50, seed) for seed in range(4)], max_workers=2)
+
+    documents = [generate_corpus(100000, seed) for seed in range(2)]
+    results = summarizer.summarize_many(documents, max_workers=2, timeout=0.2)
+    assert all('time limit' in result['error'] for result in results)
+    assert overrunning_tasks('batch') == 2
+    with pytest.raises(PoolBusy):
+        summarizer.summarize_many(documents, max_workers=2)
+
+    for _ in range(600):
+        if not overrunning_tasks('batch'):
+            break
+        time.sleep(0.1)
+    assert overrunning_tasks('batch') == 0
+
+
+def test_batch_refused_by_a_busy_pool_is_refunded(client, monkeypatch):
+    from admission import admission
+
+    def busy(*args, **kwargs):
+        raise PoolBusy('Every batch worker is still busy with timed-out work')
+
+    monkeypatch.setattr(summarizer, 'summarize_many', busy)
+    monkeypatch.setattr(admission, '_buckets', {})
+    response = client.post('/api/summarize/batch', json={'documents': [generate_corpus(60, 7)]})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '30'
+    assert all(tokens == admission.burst for tokens, _ in admission._buckets.values())
+
+
+def test_batch_returns_results_in_order_and_saves_successes(app, client):
+    documents = [generate_corpus(80, 31), {'text': 'too short'},
+                 {'text': generate_corpus(90, 32), 'method': 'luhn'}]
+    body = client.post('/api/summarize/batch', json={'documents': documents}).get_json()
+    assert (body['succeeded'], body['failed']) == (2, 1)
+    assert [result['index'] for result in body['results']] == [0, 1, 2]
+    assert body['results'][1]['error'] == 'Text must be at least 10 words long'
+    with app.app_context():
+        saved = Summary.query.order_by(Summary.id).all()
+        assert [summary.id for summary in saved] == [body['results'][0]['summary_id'],
+                                                     body['results'][2]['summary_id']]
+        assert saved[1].method == 'luhn'
@@ -0,0 +1,34 @@
+import copy
+
+import pytest
+
+from benchmark import compare, generate_corpus, run
+
+
+def test_corpus_is_deterministic_and_sized():
+    assert generate_corpus(500, seed=3) == generate_corpus(500, seed=3)
+    assert generate_corpus(500, seed=3) != generate_corpus(500, seed=4)
+    assert len(generate_corpus(500).split()) == 500
+
+
+def test_run_reports_each_case_and_size():
+    report = run([200, 400], 2, ['segment', 'summarize.lsa.warm'])
+    assert [(row['case'], row['words']) for row in report['results']] == [
+        ('segment', 200), ('summarize.lsa.warm', 200), ('segment', 400), ('summarize.lsa.warm', 400)]
+    assert all(row['runs'] == 2 and row['p50_ms'] <= row['p99_ms'] for row in report['results'])
+
+
+def test_run_rejects_unknown_cases():
+    with pytest.raises(ValueError, match='summarize.lsa'):
+        run([200], 1, ['summarise.lsa'])
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = {'results': [{'case': 'segment', 'words': 200, 'p50_ms': 10.0, 'peak_memory_mb': 1.0}]}
+    report = copy.deepcopy(baseline)
+    report['results'][0]['p50_ms'] = 12.0
+    assert compare(report, baseline, 0.25) == []
+
+    report['results'][0]['p50_ms'] = 13.0
+    [regression] = compare(report, baseline, 0.25)
+    assert (regression['metric'], regression['change']) == ('p50_ms', 0.3)
@@ -0,0 +1,52 @@
+import cache
+from cache import SummaryCache
+from models import CachedSummary
+
+TEXT = 'The  museum reopened\nafter a long renovation. Visitors queued for hours.'
+
+
+def test_key_covers_text_parameters_and_analysis_version(monkeypatch):
+    key = SummaryCache.make_key(TEXT, 'lsa', None, 'english')
+    assert key == SummaryCache.make_key(' '.join(TEXT.split()), 'lsa', None, 'english')
+    assert len({key, SummaryCache.make_key(TEXT, 'luhn'), SummaryCache.make_key(TEXT, 'lsa', 3),
+                SummaryCache.make_key(TEXT, 'lsa', None, 'german')}) == 4
+    monkeypatch.setattr(cache, 'ANALYSIS_VERSION', cache.ANALYSIS_VERSION + 1)
+    assert SummaryCache.make_key(TEXT) != key
+
+
+def test_memory_tier_evicts_least_recently_used_and_expired():
+    summaries = SummaryCache(max_size=2)
+    summaries.put('a', {'summary': 'A'})
+    summaries.put('b', {'summary': 'B'})
+    summaries.get('a')
+    summaries.put('c', {'summary': 'C'})
+    assert summaries.get('b') is None
+    assert summaries.get('a') == {'summary': 'A'}
+
+    summaries.ttl = -1
+    assert summaries.get('c') is None
+    assert summaries.stats()['evictions'] == 2
+
+
+def test_database_tier_survives_the_memory_tier_and_is_trimmed(app):
+    with app.app_context():
+        summaries = SummaryCache(persistent=True, max_rows=3)
+        for index in range(5):
+            summaries.put(f'key{index}', {'summary': index})
+        summaries.clear()
+        assert summaries.get('key4') == {'summary': 4}
+        assert summaries.stats()['db_hits'] == 1
+
+        summaries.prune()
+        assert CachedSummary.query.count() == 3
+        assert summaries.get('key0') is None
+
+
+def test_repeat_submission_is_served_from_the_cache(client):
+    text = 'The orchestra announced its winter programme on Friday. Tickets go on sale next week ' \
+           'and students get a discount at every concert.'
+    hits = cache.summary_cache.stats()['hits']
+    first = client.post('/summarize', json={'text': text}).get_json()
+    second = client.post('/summarize', json={'text': text}).get_json()
+    assert second['summary'] == first['summary']
+    assert cache.summary_cache.stats()['hits'] == hits + 1
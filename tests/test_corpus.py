@@ -0,0 +1,46 @@
+from corpus import CorpusSummarizer
+
+SHARED = 'The bridge will close for repairs in June.'
+
+
+OTHERS = [['Ticket prices rise by ten percent next month.', 'The mayor opened a new library downtown.',
+           'Local farmers expect a strong apple harvest.'],
+          ['A jazz festival returns to the harbour in August.', 'Swimming lessons start at the leisure centre.',
+           'The museum found a rare coin collection.'],
+          ['Students planted trees along the school fence.', 'A bakery won the regional bread award.',
+           'Heavy snow cancelled the mountain rally.']]
+
+
+def corpus_texts():
+    # Every document repeats one point among otherwise unrelated sentences
+    return [' '.join(others[:2] + [SHARED] + others[2:]) for others in OTHERS]
+
+
+def shared_score(texts):
+    result = CorpusSummarizer().summarize(texts, sentences_count=20)
+    texts = [sentence['text'] for sentence in result['sentences']]
+    assert texts.count(SHARED) == 1
+    return next(sentence['score'] for sentence in result['sentences'] if sentence['text'] == SHARED)
+
+
+def test_point_repeated_across_documents_is_merged_and_ranks_higher():
+    texts = corpus_texts()
+    result = CorpusSummarizer().summarize(texts, sentences_count=3)
+    assert (result['sentence_count'], result['unique_sentences']) == (12, 10)
+    assert len(result['sentences']) == 3 and all(0 <= sentence['document'] < 3
+                                                 for sentence in result['sentences'])
+    assert result['original_length'] == sum(len(text.split()) for text in texts)
+
+    once = [texts[0]] + [text.replace(SHARED, 'The choir sang at the town hall.') for text in texts[1:]]
+    assert shared_score(texts) > shared_score(once)
+
+
+def test_corpus_route_summarizes_the_users_summaries(client):
+    ids = [client.post('/summarize', json={'text': text}).get_json()['summary_id'] for text in corpus_texts()]
+    body = client.post('/api/summarize/corpus', json={'summary_ids': ids + [9999],
+                                                      'sentences_count': 4}).get_json()
+    assert body['summary_ids'] == sorted(ids) and body['missing_ids'] == [9999]
+    assert all(sentence['summary_id'] in ids for sentence in body['sentences'])
+
+    assert client.post('/api/summarize/corpus', json={'summary_ids': ['x']}).status_code == 400
+    assert client.post('/api/summarize/corpus', json={'summary_ids': [9999]}).status_code == 404
@@ -0,0 +1,74 @@
+from duplicates import minhash_signature, near_duplicates, signature_bytes
+from models import db, IdBlock, Summary, SummaryContent, User
+
+TEXT = ('The committee met on Monday to review the budget and discuss the new building plans. '
+        'Several members asked for a revised estimate before the next meeting in spring.')
+
+
+def make_user():
+    user = User(username='owner', email='owner@example.com')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def make_summary(user, text, **values):
+    return Summary(summary_text='Summary.', original_text=text, summary_length=1,
+                   original_length=len(text.split()), compression_ratio=1.0, user_id=user.id, **values)
+
+
+def test_catch_up_sees_rows_committed_with_smaller_ids(app):
+    with app.app_context():
+        user = make_user()
+        db.session.add(make_summary(user, TEXT + ' First.', id=50))
+        db.session.commit()
+        near_duplicates.load()
+
+        # Another process commits a row from an older id block, bypassing this index
+        text = TEXT + ' Second.'
+        seq = IdBlock.reserve(Summary, 1, column='commit_seq')
+        db.session.execute(Summary.__table__.insert(), [{
+            'id': 10, 'summary_text': 'Summary.', 'summary_length': 1, 'original_length': 30,
+            'compression_ratio': 1.0, 'user_id': user.id, 'commit_seq': seq,
+            'signature': signature_bytes(minhash_signature(text))
+        }])
+        db.session.execute(SummaryContent.__table__.insert(), [{'summary_id': 10, 'original_text': text}])
+        db.session.commit()
+
+        near_duplicates._catch_up()
+        match, score = near_duplicates.find(user.id, minhash_signature(text))
+        assert match.id == 10 and score == 1.0
+
+
+def test_backfilled_signatures_reach_a_running_index(app):
+    with app.app_context():
+        user = make_user()
+        near_duplicates.enabled = False
+        try:
+            db.session.add(make_summary(user, TEXT))
+            db.session.commit()
+        finally:
+            near_duplicates.enabled = True
+        assert db.session.query(Summary.signature).scalar() is None
+        near_duplicates.load()
+
+        # Backfill as another process would, without reloading this index
+        keys, near_duplicates._keys = near_duplicates._keys, None
+        assert near_duplicates.backfill() == 1
+        near_duplicates._keys = keys
+        near_duplicates._catch_up()
+        match, _ = near_duplicates.find(user.id, minhash_signature(TEXT))
+        assert match is not None
+
+
+def test_inserts_take_increasing_commit_seq(app):
+    with app.app_context():
+        user = make_user()
+        db.session.add_all([make_summary(user, f'{TEXT} Row {index}.', id=100 - index) for index in range(3)])
+        db.session.commit()
+        db.session.add(make_summary(user, TEXT, id=1))
+        db.session.commit()
+        rows = db.session.query(Summary.id, Summary.commit_seq).order_by(Summary.commit_seq).all()
+        assert [row.id for row in rows][-1] == 1
+        assert len({row.commit_seq for row in rows}) == 4
@@ -0,0 +1,86 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from numpy.linalg import svd
+from sumy.summarizers.lex_rank import LexRankSummarizer
+from sumy.summarizers.lsa import LsaSummarizer
+from sumy.summarizers.luhn import LuhnSummarizer
+from sumy.summarizers.text_rank import TextRankSummarizer
+
+from benchmark import generate_corpus
+from utils import Document, get_language_resources
+
+SAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sample_texts.json')
+
+
+class Terms:
+    """Hands sumy the words Document found, so only the algorithms are compared"""
+
+    def __init__(self, document):
+        term_ids, sentence_ids, vocabulary = document.terms()
+        self.words = {}
+        for number, sentence in enumerate(document.sentences):
+            self.words[sentence] = tuple(vocabulary[term] for term in term_ids[sentence_ids == number])
+
+    def to_words(self, sentence):
+        return self.words[sentence]
+
+
+def texts():
+    with open(SAMPLES) as f:
+        samples = json.load(f)['sample_texts']
+    return samples + [' '.join(samples)] + [generate_corpus(words, seed) for words, seed
+                                            in ((300, 1), (800, 2), (2000, 3))]
+
+
+def legacy(summarizer):
+    resources = get_language_resources('english')
+    summarizer = summarizer(resources._stem)
+    summarizer.stop_words = resources.stop_words
+    return summarizer
+
+
+def legacy_ratings(method, document):
+    """What sumy rates each sentence of document, in order"""
+    model = document.to_sumy(Terms(document))
+    if method == 'lsa':
+        summarizer = legacy(LsaSummarizer)
+        matrix = summarizer._create_matrix(model, summarizer._create_dictionary(model))
+        _, sigma, v = svd(summarizer._compute_term_frequency(matrix), full_matrices=False)
+        return np.array(summarizer._compute_ranks(sigma, v))
+    if method == 'text_rank':
+        return np.array(list(legacy(TextRankSummarizer).rate_sentences(model).values()))
+    summarizer = legacy(LexRankSummarizer)
+    words = [summarizer._to_words_set(sentence) for sentence in model.sentences]
+    matrix = summarizer._create_matrix(words, summarizer.threshold, summarizer._compute_tf(words),
+                                       summarizer._compute_idf(words))
+    return summarizer.power_method(matrix, summarizer.epsilon)
+
+
+def test_lsa_rates_sentences_as_sumy_does():
+    engine = get_language_resources('english').engines['lsa']
+    for text in texts():
+        document = Document(text)
+        assert np.allclose(engine.rate_sentences(document, 5), legacy_ratings('lsa', document))
+
+
+@pytest.mark.parametrize('method, bound', [('lsa', 0.99), ('text_rank', 0.97), ('lex_rank', 0.9)])
+def test_picks_score_close_to_legacy_picks(method, bound):
+    # Ties and tokenization may swap equally good sentences, so compare what
+    # the picks are worth to sumy rather than which sentences they are
+    engine = get_language_resources('english').engines[method]
+    for text in texts():
+        document = Document(text)
+        ratings = legacy_ratings(method, document)
+        picked = np.argsort(-engine.rate_sentences(document, 5), kind='stable')[:5]
+        assert ratings[picked].sum() >= bound * np.sort(ratings)[-5:].sum()
+
+
+def test_luhn_picks_the_legacy_sentences():
+    engine = get_language_resources('english').engines['luhn']
+    for text in texts():
+        document = Document(text)
+        expected = [str(sentence) for sentence in legacy(LuhnSummarizer)(document.to_sumy(Terms(document)), 5)]
+        assert engine(document, 5) == expected
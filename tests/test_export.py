@@ -0,0 +1,50 @@
+import csv
+import io
+import json
+import zipfile
+
+import pytest
+
+TEXTS = ['The library will stay open late during the exam weeks this spring term.',
+         'Volunteers cleaned the beach on Saturday and collected forty bags of plastic.']
+
+
+@pytest.fixture
+def saved(client):
+    return [client.post('/summarize', json={'text': text}).get_json()['summary_id'] for text in TEXTS]
+
+
+def export(client, **args):
+    response = client.get('/api/export', query_string=args)
+    assert response.status_code == 200
+    return response
+
+
+def test_export_formats_carry_the_same_rows_newest_first(client, saved, monkeypatch):
+    monkeypatch.setattr('export.EXPORT_BATCH', 1)
+    newest_first = saved[::-1]
+
+    rows = list(csv.DictReader(io.StringIO(export(client, format='csv').data.decode())))
+    assert [int(row['id']) for row in rows] == newest_first
+    assert [row['original_text'] for row in rows] == TEXTS[::-1]
+
+    lines = export(client, format='jsonl').data.decode().splitlines()
+    assert [json.loads(line)['id'] for line in lines] == newest_first
+
+    response = export(client, format='json', include_original='false')
+    assert response.mimetype == 'application/json'
+    items = json.loads(response.data)
+    assert [item['id'] for item in items] == newest_first
+    assert all('original_text' not in item for item in items)
+
+    with zipfile.ZipFile(io.BytesIO(export(client, format='zip').data)) as archive:
+        names = archive.namelist()
+        assert names[0] == f'{saved[1]}-volunteers-cleaned-the-beach-on-saturday.txt'
+        assert names[1].startswith(f'{saved[0]}-the-library')
+        assert TEXTS[0] in archive.read(names[-1]).decode()
+
+
+def test_export_rejects_unknown_formats_and_bad_dates(client):
+    assert client.get('/api/export?format=xml').status_code == 400
+    assert client.get('/api/export?date_from=yesterday').status_code == 400
+    assert export(client, format='json').get_json() == []
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+from models import db, Summary, User
+
+
+def add_history(app, count=25):
+    # Pairs of summaries share a timestamp, so paging must break ties on id
+    base = datetime(2026, 3, 1, 12, 0, 0)
+    with app.app_context():
+        user = User.query.filter_by(username='tester').one()
+        for index in range(count):
+            db.session.add(Summary(summary_text='Summary.', original_text=f'Text {index}.', summary_length=1,
+                                   original_length=10 * (index + 1), compression_ratio=1.0, user_id=user.id,
+                                   created_at=base + timedelta(minutes=index // 2)))
+        db.session.commit()
+        return [summary.id for summary in
+                Summary.query.order_by(Summary.created_at.desc(), Summary.id.desc())]
+
+
+def walk(client, query):
+    ids, cursor = [], None
+    while True:
+        url = f'/api/history?per_page=7{query}' + (f'&cursor={cursor}' if cursor else '')
+        body = client.get(url).get_json()
+        ids.extend(item['id'] for item in body['items'])
+        cursor = body['next_cursor']
+        if cursor is None:
+            return ids, body['total']
+
+
+def test_cursor_pages_cover_every_summary_once_in_order(app, client):
+    expected = add_history(app)
+    ids, total = walk(client, '&count=exact')
+    assert ids == expected and total == 25
+
+
+def test_cursor_pages_keep_filters_and_approximate_totals(app, client):
+    add_history(app)
+    ids, total = walk(client, '&min_length=100&count=exact')
+    assert len(ids) == 16 and total == 16
+    assert walk(client, '&count=approx')[1] == 25
+    assert walk(client, '')[1] is None
+
+
+def test_bad_cursor_is_rejected(client):
+    assert client.get('/api/history?cursor=bm9wZQ').status_code == 400
+    assert client.get('/history?cursor=bm9wZQ').status_code == 302
+
+
+def test_history_indexes_exist(app):
+    with app.app_context():
+        indexes = {index['name']: index['column_names'] for index in db.inspect(db.engine).get_indexes('summary')}
+    assert indexes['ix_summary_user_created'] == ['user_id', 'created_at', 'id']
@@ -0,0 +1,54 @@
+import time
+
+import pytest
+
+REPORT = ('The harbour authority published its annual report on shipping traffic. Container volumes rose '
+          'for the third year in a row. Ferry services carried fewer passengers after the bridge opened. '
+          'Dredging of the outer channel will finish before the spring tides. The authority expects '
+          'cruise visits to double once the new terminal is complete.')
+
+
+def test_job_status_is_served_from_the_database_by_any_process(client):
+    from jobs import job_queue
+
+    submitted = client.post('/summarize', json={'text': REPORT, 'async': True}).get_json()
+    for _ in range(300):
+        # Another worker process has none of this one's jobs in memory
+        job_queue._jobs.clear()
+        status = client.get(submitted['status_url']).get_json()
+        if status['status'] == 'done':
+            break
+        assert status['status'] in ('queued', 'running')
+        time.sleep(0.1)
+    assert status['status'] == 'done'
+    assert status['summary'] and status['stats']['original_length'] == len(REPORT.split())
+    assert status['summary_id'] is not None
+
+
+def test_job_status_from_the_database_is_private(app, client):
+    from jobs import Job, job_queue
+    from models import db, User
+
+    with app.app_context():
+        owner = User(username='owner', email='owner@example.com')
+        owner.set_password('password')
+        db.session.add(owner)
+        db.session.commit()
+        job = Job(REPORT, 'lsa', None, 'english', owner.id)
+    job_queue._record(job, insert=True)
+    assert client.get(f'/api/jobs/{job.id}').status_code == 404
+    assert client.get('/api/jobs/unknown').status_code == 404
+
+
+def test_refused_job_leaves_no_record(app, client):
+    from jobs import JobQueue, QueueFull
+    from models import SummaryJob
+
+    # No workers, so nothing drains the queue
+    jobs = JobQueue(maxsize=1, workers=0)
+    jobs.app = app
+    queued = jobs.submit(REPORT, 'lsa', None, 'english', 1)
+    with pytest.raises(QueueFull):
+        jobs.submit(REPORT, 'lsa', None, 'english', 1)
+    with app.app_context():
+        assert [job.id for job in SummaryJob.query.all()] == [queued.id]
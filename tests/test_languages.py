@@ -0,0 +1,36 @@
+import threading
+
+from utils import Document, get_language_resources, summarizer
+
+TEXT = 'The runners were running. A runner runs daily.'
+
+
+def test_resources_are_built_once_per_language():
+    found = []
+    threads = [threading.Thread(target=lambda: found.append(get_language_resources('italian')))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(resources is found[0] for resources in found)
+    assert summarizer.engine('luhn', 'italian') is found[0].engines['luhn']
+    # Unknown methods fall back to LSA
+    assert summarizer.engine('unknown', 'italian') is found[0].engines['lsa']
+
+
+def test_engines_drop_stop_words_and_merge_terms_by_stem():
+    engine = get_language_resources('english').engines['lsa']
+    matrix = engine.term_matrix(Document.from_text(TEXT, 'english'))
+    # "the", "were" and "a" are stop words; runners/runner and running/runs share stems
+    assert len(set(matrix.cols.tolist())) == 3
+    assert matrix.rows.tolist() == [0, 0, 1, 1, 1]
+
+
+def test_languages_without_resources_use_plain_terms():
+    resources = get_language_resources('esperanto')
+    assert resources.stop_words == frozenset() and resources._stem is None
+    text = 'La hundo kuras. La kato dormas.'
+    matrix = resources.engines['lsa'].term_matrix(Document.from_text(text, 'esperanto'))
+    assert len(set(matrix.cols.tolist())) == 5 and len(matrix.data) == 6
+
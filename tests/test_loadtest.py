@@ -0,0 +1,33 @@
+import subprocess
+import sys
+
+import pytest
+
+import loadtest
+from models import db
+
+
+def test_mix_is_parsed_and_checked():
+    assert loadtest.parse_mix('summarize=4, history') == {'summarize': 4.0, 'history': 1.0}
+    with pytest.raises(ValueError, match='search'):
+        loadtest.parse_mix('summarize=1,search=2')
+
+
+def test_in_process_run_reports_every_request(app, client, monkeypatch):
+    monkeypatch.setattr(loadtest, 'SEED_PASSWORD', 'password')
+    with app.app_context():
+        counter = loadtest.QueryCounter(db.engine)
+    context = {'texts': [], 'methods': ['lsa'], 'cache_bust': False}
+    samples, elapsed = loadtest.run(lambda: loadtest.InProcessClient(app, counter), ['tester'], context,
+                                    {'history_api': 1, 'analytics': 1}, 2, total_requests=12)
+    result = loadtest.report(samples, elapsed, 2)
+    assert result['requests'] == 12
+    assert all(endpoint['errors'] == 0 and endpoint['queries_per_request'] >= 1
+               for endpoint in result['endpoints'].values())
+
+
+def test_local_only_options_are_refused_with_a_server_url():
+    process = subprocess.run([sys.executable, loadtest.__file__, '--url', 'http://localhost:1', '--no-seed'],
+                             capture_output=True, text=True)
+    assert process.returncode == 2
+    assert 'for in-process runs' in process.stderr
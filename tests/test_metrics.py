@@ -0,0 +1,35 @@
+import ipaddress
+
+from benchmark import generate_corpus
+from metrics import metrics
+
+
+def test_metrics_hidden_without_token_or_allowed_address(client):
+    assert client.get('/metrics').status_code == 404
+
+
+def test_metrics_with_token(client, monkeypatch):
+    monkeypatch.setattr(metrics, 'token', 'secret')
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 404
+    response = client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+    assert response.status_code == 200
+    assert b'http_requests_total' in response.data
+
+
+def test_metrics_from_allowed_network(client, monkeypatch):
+    monkeypatch.setattr(metrics, 'allowed_ips', (ipaddress.ip_network('127.0.0.0/8'),))
+    assert client.get('/metrics').status_code == 200
+
+
+def test_request_stages_are_timed_and_exported(client, monkeypatch):
+    monkeypatch.setattr(metrics, 'timing_headers', True)
+    monkeypatch.setattr(metrics, 'token', 'secret')
+    response = client.post('/summarize', json={'text': generate_corpus(120, seed=51)})
+    stages = dict(part.split(';dur=') for part in response.headers['Server-Timing'].split(', '))
+    assert {'cache', 'summarize', 'db', 'total'} <= set(stages)
+    assert float(stages['summarize']) <= float(stages['total'])
+
+    exported = client.get('/metrics', headers={'Authorization': 'Bearer secret'}).data.decode()
+    assert 'stage_duration_seconds_count{stage="summarize"}' in exported
+    assert 'http_requests_total{endpoint="summarize_text",method="POST",status="200"}' in exported
+    assert '# TYPE job_queue_depth gauge' in exported
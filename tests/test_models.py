@@ -0,0 +1,14 @@
+from models import configure_sqlite, db
+
+
+def test_sqlite_pragmas_are_registered_once_per_engine(app):
+    with app.app_context():
+        listeners = len(db.engine.pool.dispatch.connect)
+        configure_sqlite(app)
+        configure_sqlite(app)
+        assert len(db.engine.pool.dispatch.connect) == listeners
+
+        db.engine.dispose()
+        with db.engine.connect() as connection:
+            assert connection.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+            assert connection.exec_driver_sql('PRAGMA busy_timeout').scalar() == app.config['SQLITE_BUSY_TIMEOUT']
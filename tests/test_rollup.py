@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+from models import db, Summary, SummaryRollup, User
+
+
+def rollup_rows():
+    # Deletes may leave emptied rows behind; backfill writes none
+    return sorted((row.user_id, row.day, row.method, row.count, row.length_under_100, row.length_100_500,
+                   row.original_words, row.summary_words, round(row.compression_sum, 6))
+                  for row in SummaryRollup.query.filter(SummaryRollup.count > 0))
+
+
+def add_summary(user_id, length, method='lsa', days_ago=0):
+    summary = Summary(summary_text='Summary text.', original_text='Original text.', summary_length=5,
+                      original_length=length, compression_ratio=length / 5, user_id=user_id,
+                      method=method, created_at=datetime.utcnow() - timedelta(days=days_ago))
+    db.session.add(summary)
+    return summary
+
+
+def test_rollup_follows_inserts_and_deletes_and_matches_backfill(app):
+    with app.app_context():
+        user = User(username='owner', email='owner@example.com')
+        db.session.add(user)
+        db.session.commit()
+        add_summary(user.id, 40)
+        add_summary(user.id, 200, 'luhn')
+        doomed = add_summary(user.id, 300, 'luhn', days_ago=2)
+        add_summary(user.id, 60, days_ago=2)
+        db.session.commit()
+        db.session.delete(doomed)
+        db.session.commit()
+
+        incremental = rollup_rows()
+        assert sum(row[3] for row in incremental) == 3
+        assert SummaryRollup.backfill() == 3
+        assert rollup_rows() == incremental
+
+
+def test_analytics_reads_totals_from_the_rollup(client):
+    for index in range(3):
+        client.post('/summarize', json={'text': f'Report {index}. The ferry timetable changes in May. '
+                                                'Evening sailings will run every hour until ten.'})
+    body = client.get('/api/analytics?range=month').get_json()
+    assert body['totals']['summaries'] == 3
+    assert body['method_usage'] == {'labels': ['lsa'], 'data': [3]}
+    assert body['length_ranges'] == {'labels': ['<100'], 'data': [3]}
+    assert sum(body['daily_counts']['data']) == 3
@@ -0,0 +1,69 @@
+TEXT = ('The committee met on Monday to review the budget. Several members raised concerns about '
+        'the cost of the new building. The chair promised a revised estimate next week. '
+        'Meanwhile the library will stay open late on Thursdays.')
+
+
+def test_summarize_rejects_unsupported_language(client):
+    response = client.post('/summarize', json={'text': TEXT, 'language': '../../etc/passwd'})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Unsupported language'
+
+
+def test_batch_rejects_unsupported_language_per_document(client):
+    response = client.post('/api/summarize/batch', json={'documents': [
+        {'text': TEXT},
+        {'text': TEXT, 'language': 'klingon'}
+    ]})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert 'error' not in results[0]
+    assert results[1]['error'] == 'Unsupported language'
+
+
+def test_history_numbered_pages_keep_filters(client):
+    for index in range(25):
+        client.post('/summarize', json={'text': f'{TEXT} Item number {index} closes the notes.'})
+    response = client.get('/history?page=2&min_length=10')
+    assert response.status_code == 200
+    assert b'page=3&amp;min_length=10' in response.data or b'min_length=10&amp;page=3' in response.data
+
+
+def test_async_submission_refused_by_full_queue_is_refunded(client, monkeypatch):
+    from admission import admission
+    from jobs import job_queue, QueueFull
+
+    def full(*args, **kwargs):
+        raise QueueFull()
+
+    monkeypatch.setattr(job_queue, 'submit', full)
+    monkeypatch.setattr(admission, '_buckets', {})
+    for index in range(3):
+        response = client.post('/summarize', json={'text': f'{TEXT} Queued item {index}.', 'async': True})
+        assert response.status_code == 503
+    assert all(tokens == admission.burst for tokens, _ in admission._buckets.values())
+
+
+NOTES = ('The library board reviewed the opening hours for the winter season. Members agreed that the '
+         'reading room should stay open until nine on weekdays. The junior section will host '
+         'story time every Saturday morning. Volunteers are needed to help shelve returned books. '
+         'The board will meet again in March to review visitor numbers.')
+
+
+def test_near_duplicate_reuse_needs_similar_length(client):
+    first = client.post('/summarize', json={'text': NOTES}).get_json()
+    edited = client.post('/summarize', json={'text': NOTES + ' Thanks', 'reuse_duplicates': True}).get_json()
+    assert edited['duplicate_of']['summary_id'] == first['summary_id']
+
+    repeated = client.post('/summarize', json={'text': ' '.join([NOTES] * 30), 'reuse_duplicates': True})
+    assert 'duplicate_of' not in repeated.get_json()
+
+
+def test_async_submission_is_queued_even_with_a_duplicate(client, monkeypatch):
+    from jobs import Job, job_queue
+
+    client.post('/summarize', json={'text': NOTES})
+    monkeypatch.setattr(job_queue, 'submit', lambda *args: Job(*args))
+    response = client.post('/summarize', json={'text': NOTES + ' Thanks', 'reuse_duplicates': True,
+                                               'async': True})
+    assert response.status_code == 202
+    assert response.get_json()['job_id']
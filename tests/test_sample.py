@@ -0,0 +1,20 @@
+from duplicates import near_duplicates
+from models import db, Summary, SummaryRollup, User
+from sample import BulkDataGenerator
+
+
+def test_bulk_load_writes_complete_rows(app):
+    with app.app_context():
+        near_duplicates.load()
+        users, summaries = BulkDataGenerator(batch_size=7, seed=1).run(3, 5)
+        assert (users, summaries) == (3, 15)
+        assert User.query.count() == 3
+
+        rows = Summary.query.order_by(Summary.id).all()
+        assert [row.commit_seq for row in rows] == list(range(rows[0].commit_seq, rows[0].commit_seq + 15))
+        assert all(row.original_text and row.signature for row in rows)
+        assert db.session.query(db.func.sum(SummaryRollup.count)).scalar() == 15
+
+        # A running index picks the bulk rows up by their commit_seq
+        near_duplicates._catch_up()
+        assert near_duplicates.size == 15
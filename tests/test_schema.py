@@ -0,0 +1,50 @@
+from models import db, Summary, SummaryContent, SummaryRollup, User, upgrade_schema
+
+LONG = 'The river authority will dredge the harbour mouth this summer. ' * 3
+
+
+def test_upgrade_moves_original_text_out_of_an_old_summary_table(app):
+    with app.app_context():
+        db.drop_all()
+        User.__table__.create(db.engine)
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql(
+                'CREATE TABLE summary (id INTEGER PRIMARY KEY, original_text TEXT NOT NULL, '
+                'summary_text TEXT NOT NULL, summary_length INTEGER NOT NULL, '
+                'original_length INTEGER NOT NULL, compression_ratio FLOAT NOT NULL, created_at DATETIME, '
+                'user_id INTEGER NOT NULL REFERENCES user (id), title VARCHAR(200), '
+                'language VARCHAR(10), method VARCHAR(20))'
+            )
+            connection.exec_driver_sql("INSERT INTO user (id, username, email) VALUES (1, 'old', 'old@x.org')")
+            connection.exec_driver_sql(
+                "INSERT INTO summary VALUES (7, ?, 'Dredging this summer.', 3, 30, 10.0, "
+                "'2024-05-01 10:00:00', 1, 'Harbour', 'english', 'lsa')", (LONG,)
+            )
+
+        created = upgrade_schema()
+        assert {'summary_content', 'summary_rollup'} <= created
+        assert 'original_text' not in {column['name'] for column in db.inspect(db.engine).get_columns('summary')}
+
+        summary = db.session.get(Summary, 7)
+        assert db.session.get(SummaryContent, 7).original_text == LONG
+        assert summary.original_preview == LONG[:100] + '...'
+        assert summary.summary_preview == 'Dredging this summer.'
+        assert summary.commit_seq == 7
+        assert SummaryRollup.query.one().count == 1
+        assert upgrade_schema() == set()
+
+
+def test_list_queries_leave_large_columns_unloaded(app):
+    with app.app_context():
+        user = User(username='owner', email='owner@example.com')
+        db.session.add(user)
+        db.session.commit()
+        db.session.add(Summary(summary_text='Short.', original_text=LONG, summary_length=1,
+                               original_length=30, compression_ratio=30.0, user_id=user.id))
+        db.session.commit()
+        db.session.expunge_all()
+
+        summary = Summary.query.one()
+        assert 'summary_text' not in summary.__dict__ and 'content' not in summary.__dict__
+        assert summary.to_dict(include_summary=False)['original_text'] == LONG[:100] + '...'
+        assert summary.original_text == LONG
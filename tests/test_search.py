@@ -0,0 +1,57 @@
+import pytest
+
+from models import db, SearchPosting, Summary, User
+from search import summary_search
+
+TEXTS = ['The orchard harvest was early this year because of the warm spring.',
+         'Rain delayed the harvest in the northern valleys by two weeks.',
+         'The council approved a new cycle lane along the river.']
+
+
+def add_summaries():
+    user = User(username='owner', email='owner@example.com')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    for text in TEXTS:
+        db.session.add(Summary(summary_text=text, original_text=text, title=text[:20], summary_length=1,
+                               original_length=len(text.split()), compression_ratio=1.0, user_id=user.id))
+    db.session.commit()
+    return user
+
+
+@pytest.fixture(params=['fts5', 'inverted'])
+def backend(request, monkeypatch):
+    monkeypatch.setattr(summary_search, 'preferred', request.param)
+    monkeypatch.setattr(summary_search, 'backend', None)
+    return request.param
+
+
+def test_search_ranks_matches_and_pages_by_cursor(app, backend):
+    with app.app_context():
+        user = add_summaries()
+        assert summary_search.setup() == backend
+
+        base = Summary.query.filter_by(user_id=user.id)
+        rows, cursor = summary_search.search('harvest', user.id, base, per_page=1)
+        assert len(rows) == 1 and cursor is not None
+        more, cursor = summary_search.search('harvest', user.id, base, cursor=cursor, per_page=1)
+        assert cursor is None
+        assert {summary.summary_text for summary, _ in rows + more} == set(TEXTS[:2])
+
+        rows, _ = summary_search.search('harv* rain', user.id, base)
+        assert [summary.summary_text for summary, _ in rows] == [TEXTS[1]]
+        other = Summary.query.filter_by(user_id=user.id + 1)
+        assert summary_search.search('harvest', user.id + 1, other) == ([], None)
+
+
+def test_setup_indexes_summaries_written_before_the_index(app, backend, monkeypatch):
+    with app.app_context():
+        monkeypatch.setattr(summary_search, 'enabled', False)
+        user = add_summaries()
+        monkeypatch.setattr(summary_search, 'enabled', True)
+        assert SearchPosting.query.count() == 0
+
+        summary_search.setup()
+        rows, _ = summary_search.search('cycle', user.id, Summary.query)
+        assert [summary.summary_text for summary, _ in rows] == [TEXTS[2]]
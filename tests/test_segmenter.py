@@ -0,0 +1,43 @@
+import re
+
+from segmenter import clean, get_segmenter
+
+
+def test_clean_matches_the_regex_passes():
+    text = 'Prices: €20 (approx.) — “quoted” text,\tnew\nlines & naïve café_au_lait! Done?'
+    assert clean(text) == ' '.join(re.sub(r'[^\w\s.,!?;:]', '', text).split())
+
+
+def test_sentences_end_only_at_real_boundaries():
+    text = ('Dr. Smith met Mr. J. R. Jones at 9 a.m. on Jan. 5. They talked for an hour! '
+            'Was it useful? The notes say e.g. budgets and so on. the end follows here. Last one')
+    assert get_segmenter().sentences(text) == [
+        'Dr. Smith met Mr. J. R. Jones at 9 a.m. on Jan. 5.',
+        'They talked for an hour!',
+        'Was it useful?',
+        'The notes say e.g. budgets and so on. the end follows here.',
+        'Last one'
+    ]
+
+
+def test_offsets_address_the_cleaned_text():
+    segmentation = get_segmenter().segment('  Größe  zählt.   Ça va?  Oui ')
+    text = segmentation.text
+    assert text == 'Größe zählt. Ça va? Oui'
+    assert [text[start:end] for start, end in zip(segmentation.word_starts, segmentation.word_ends)] \
+        == text.split()
+    assert [text[start:end] for start, end in zip(segmentation.sentence_starts, segmentation.sentence_ends)] \
+        == ['Größe zählt.', 'Ça va?', 'Oui']
+
+
+def test_presplit_sentences_keep_their_boundaries():
+    sentences = ['First one here.', 'Second, with a comma.', 'Third']
+    segmentation = get_segmenter().from_sentences(sentences)
+    assert [segmentation.text[start:end] for start, end
+            in zip(segmentation.sentence_starts, segmentation.sentence_ends)] == sentences
+    assert len(segmentation.word_starts) == 8
+
+
+def test_empty_text_has_no_sentences():
+    assert get_segmenter().sentences('  @@ ') == []
+    assert get_segmenter('german') is get_segmenter('german')
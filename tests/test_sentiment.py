@@ -0,0 +1,43 @@
+import json
+import os
+
+import numpy as np
+
+from benchmark import generate_corpus
+from sentiment import compare, lexicon_sentiment
+from utils import summarizer
+
+SAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sample_texts.json')
+
+
+def test_polarity_agrees_with_textblob():
+    with open(SAMPLES) as f:
+        texts = json.load(f)['sample_texts']
+    texts += ['This is not a good idea at all!', 'What a very very bad, awful day.',
+              'The results were extremely good and the team was happy!!']
+    worst, within = compare(texts + [generate_corpus(2000, seed) for seed in range(3)])
+    assert within, worst
+
+
+def test_rules_follow_the_pattern_analyzer():
+    good, not_good, very_good = lexicon_sentiment.sentence_polarity(
+        ['The food was good.', 'The food was not good.', 'The food was very good.'])
+    assert good > 0 > not_good
+    assert very_good > good
+    assert lexicon_sentiment.sentence_polarity(['The wall is made of brick.'])[0] == 0.0
+
+
+def test_document_polarity_combines_sentence_scores():
+    sentences = ['A wonderful concert.', 'The hall was cold and uncomfortable.', 'Nothing else happened.']
+    sums, counts = lexicon_sentiment.score_sentences(sentences)
+    assert lexicon_sentiment.polarity(sentences) == sums.sum() / counts.sum()
+    sums_each = [lexicon_sentiment.score_sentences([sentence])[0][0] for sentence in sentences]
+    assert np.allclose(sums, sums_each)
+
+
+def test_long_documents_are_sampled(monkeypatch):
+    text = generate_corpus(20000, seed=71)
+    exact = summarizer.analyze(text)['sentiment']
+    monkeypatch.setattr(summarizer, 'sentiment_max_sentences', 200)
+    sampled = summarizer.analyze(text)['sentiment']
+    assert sampled != exact and abs(sampled - exact) < 0.05
@@ -0,0 +1,27 @@
+import subprocess
+import sys
+
+import app as application
+from models import db
+from utils import summarizer
+
+
+def test_importing_the_app_loads_no_nlp_backend():
+    # A fresh interpreter, since this one has imported them for other tests
+    code = 'import sys, app; print(sorted(m for m in ("nltk", "sumy", "textblob") if m in sys.modules))'
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=application.app.root_path).stdout
+    assert output.strip() == '[]'
+
+
+def test_warm_up_creates_tables_and_loads_engines(app, monkeypatch):
+    with app.app_context():
+        db.drop_all()
+    monkeypatch.setattr(application, '_tables_ready', False)
+    compiled = []
+    monkeypatch.setattr(summarizer.sentiment, 'compile', lambda: compiled.append(True))
+
+    application.warm_up()
+    assert application._tables_ready and compiled
+    with app.app_context():
+        assert {'user', 'summary', 'summary_job'} <= set(db.inspect(db.engine).get_table_names())
@@ -0,0 +1,46 @@
+import io
+
+from benchmark import generate_corpus
+from models import db, Summary
+from utils import iter_sentence_chunks, summarizer
+
+
+def test_unpunctuated_input_is_chunked():
+    # No sentence ends: the trailing sentence must not grow to the whole input
+    words = [f'word{index}' for index in range(50000)]
+    chunks = list(iter_sentence_chunks(io.BytesIO(' '.join(words).encode()), chunk_words=1000,
+                                       read_size=4096))
+    assert len(chunks) > 10
+    assert max(len(sentence.split()) for chunk in chunks for sentence in chunk) <= 1000
+    assert ' '.join(sentence for chunk in chunks for sentence in chunk).split() == words
+
+
+def test_punctuated_input_keeps_sentences():
+    text = ' '.join(f'Sentence number {index} ends here.' for index in range(2000))
+    chunks = list(iter_sentence_chunks(io.BytesIO(text.encode()), chunk_words=500, read_size=1024))
+    sentences = [sentence for chunk in chunks for sentence in chunk]
+    assert len(sentences) == 2000
+    assert sentences[1234] == 'Sentence number 1234 ends here.'
+
+
+def test_stream_stats_match_whole_text_analysis():
+    text = generate_corpus(3000, seed=41)
+    streamed = summarizer.analyze_stream(io.BytesIO(text.encode()), 'lsa', chunk_words=400,
+                                         reduce_limit=20, preview_chars=100)
+    whole = summarizer.analyze(text, 'lsa')
+    assert streamed['text_stats']['word_count'] == whole['text_stats']['word_count']
+    assert streamed['text_stats']['sentence_count'] == whole['text_stats']['sentence_count']
+    assert abs(streamed['sentiment'] - whole['sentiment']) < 1e-9
+    assert len(streamed['preview']) <= 100 and text.startswith(streamed['preview'][:50])
+    assert 3 <= streamed['summary'].count('.') <= 10
+
+
+def test_stream_upload_is_saved_with_its_filename(app, client):
+    text = generate_corpus(1500, seed=42)
+    response = client.post('/api/summarize/stream?method=luhn', content_type='multipart/form-data',
+                           data={'file': (io.BytesIO(text.encode()), 'minutes.txt')})
+    body = response.get_json()
+    assert response.status_code == 200 and body['stats']['original_length'] == 1500
+    with app.app_context():
+        saved = db.session.get(Summary, body['summary_id'])
+        assert (saved.title, saved.method) == ('minutes.txt', 'luhn')
@@ -0,0 +1,45 @@
+from models import db, User
+from users import SESSION_KEY, user_cache
+
+
+def update_tester(app, **values):
+    with app.app_context():
+        user = User.query.filter_by(username='tester').one()
+        for name, value in values.items():
+            setattr(user, name, value)
+        db.session.commit()
+        return user.id
+
+
+def test_loaded_user_is_cached_until_it_changes(app, client):
+    user_id = update_tester(app)
+    with app.test_request_context():
+        user_cache.clear()
+        first = user_cache.load(user_id)
+        assert user_cache.load(str(user_id)) is first
+
+        update_tester(app, email='renamed@example.com')
+        reloaded = user_cache.load(user_id)
+        assert reloaded is not first and reloaded.email == 'renamed@example.com'
+
+
+def test_disabled_user_is_logged_out(app, client):
+    assert client.get('/history').status_code == 200
+    update_tester(app, is_active=False)
+    assert client.get('/history').status_code == 302
+
+
+def test_password_change_ends_sessions_on_the_fast_path(app, client, monkeypatch):
+    monkeypatch.setattr(user_cache, 'session_fast_path', True)
+    client.post('/auth/login', data={'username': 'tester', 'password': 'password'})
+    with client.session_transaction() as session:
+        assert session[SESSION_KEY][1] == 'tester'
+    user_cache.clear()
+    assert client.get('/history').status_code == 200
+
+    with app.app_context():
+        user = User.query.filter_by(username='tester').one()
+        user.set_password('changed')
+        db.session.commit()
+    user_cache.clear()
+    assert client.get('/history').status_code == 302
@@ -0,0 +1,72 @@
+import pytest
+
+from models import db, IdBlock, Summary, User
+from writer import summary_writer, SummaryWriter, WriteFailed
+
+
+def owner():
+    user = User(username='owner', email='owner@example.com')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def new_summary(user, text='The ferry timetable changes on the first of May.'):
+    return Summary(summary_text=text, original_text=text, title=text[:20], summary_length=1,
+                   original_length=len(text.split()), compression_ratio=1.0, user_id=user.id)
+
+
+def test_reservations_are_consecutive_and_start_above_existing_rows(app):
+    with app.app_context():
+        user = owner()
+        db.session.add(new_summary(user))
+        db.session.commit()
+        first = IdBlock.reserve(Summary, 10)
+        assert first == 2
+        assert IdBlock.reserve(Summary, 5) == 12
+
+        # A reservation on the caller's connection rolls back with it
+        connection = db.engine.connect()
+        transaction = connection.begin()
+        assert IdBlock.reserve(Summary, 5, connection) == 17
+        transaction.rollback()
+        connection.close()
+        assert IdBlock.reserve(Summary, 1) == 17
+
+
+@pytest.mark.filterwarnings('ignore::sqlalchemy.exc.SAWarning')
+def test_buffered_summaries_are_group_committed_and_a_bad_row_fails_alone(app):
+    writer = SummaryWriter(interval=0.2, durability='buffer', id_block=3)
+    writer.app = app
+    try:
+        with app.app_context():
+            user = owner()
+            ids = [writer.save(new_summary(user)) for _ in range(2)]
+            # Reusing an id fails on the primary key, in the same group as the rows before it
+            bad = new_summary(user)
+            bad.id = ids[0]
+            ids += [writer.save(bad), writer.save(new_summary(user))]
+            assert ids == [1, 2, 1, 3]
+            assert writer.flush()
+            assert [summary.id for summary in Summary.query.order_by(Summary.id)] == [1, 2, 3]
+
+            writer.durability = 'commit'
+            assert db.session.get(Summary, writer.save(new_summary(user))) is not None
+            bad = new_summary(user)
+            bad.id = ids[0]
+            with pytest.raises(WriteFailed):
+                writer.save(bad)
+    finally:
+        writer.close()
+
+
+def test_other_inserts_draw_ids_from_the_same_blocks(app, monkeypatch):
+    monkeypatch.setattr(summary_writer, 'enabled', True)
+    with app.app_context():
+        user = owner()
+        reserved = IdBlock.reserve(Summary, 3)
+        summary = new_summary(user)
+        db.session.add(summary)
+        db.session.commit()
+        assert summary.id == reserved + 3
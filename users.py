@@ -0,0 +1,171 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from flask import session
+from flask_login import UserMixin
+from sqlalchemy import event
+
+from metrics import metrics
+from models import db, User
+
+# Session key of the signed user snapshot used by the fast path
+SESSION_KEY = '_user'
+
+
+def fingerprint(user):
+    """Short digest of the password hash; it changes when the password does"""
+    return hashlib.sha256((user.password_hash or '').encode()).hexdigest()[:16]
+
+
+class SessionUser(UserMixin):
+    """Read-only copy of the User fields requests need, safe to share between threads.
+
+    It is not bound to a database session, so relationships such as
+    ``summaries`` are not available; query by ``id`` instead.
+    """
+
+    # Shadows UserMixin's property so the stored value is used
+    is_active = True
+
+    def __init__(self, id, username, email=None, is_active=True, fingerprint=''):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.is_active = is_active
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.email, user.is_active, fingerprint(user))
+
+
+class UserCache:
+    """Loads the logged-in user for Flask-Login without a query on every request.
+
+    Users are kept in a bounded per-process LRU for ``ttl`` seconds and
+    dropped as soon as this process updates or deletes them; other processes
+    see the change within ``ttl``. Disabled users are not loaded, which logs
+    them out.
+
+    With ``session_fast_path`` login also stores a snapshot of the user in
+    the signed session cookie, and requests trust it for ``max_age`` seconds
+    without touching the database, then check it again against the user
+    row. A snapshot whose password fingerprint no longer matches ends the
+    session, so a password change logs out other sessions.
+    """
+
+    def __init__(self, max_size=10000, ttl=60, session_fast_path=False, max_age=300):
+        self.enabled = True
+        self.max_size = max_size
+        self.ttl = ttl
+        self.session_fast_path = session_fast_path
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._invalidated = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configure the cache from the Flask app config"""
+        self.enabled = app.config.get('USER_CACHE_ENABLED', self.enabled)
+        self.max_size = app.config.get('USER_CACHE_SIZE', self.max_size)
+        self.ttl = app.config.get('USER_CACHE_TTL', self.ttl)
+        self.session_fast_path = app.config.get('USER_SESSION_FAST_PATH', self.session_fast_path)
+        self.max_age = app.config.get('USER_SESSION_MAX_AGE', self.max_age)
+
+    def load(self, user_id):
+        """The user for a Flask-Login user id, or None to treat the request as anonymous"""
+        user_id = int(user_id)
+        user = self._get(user_id)
+        if user is not None:
+            metrics.inc('user_loads_total', source='cache')
+            return user
+
+        snapshot = session.get(SESSION_KEY) if self.session_fast_path else None
+        if snapshot is not None and snapshot[0] != user_id:
+            snapshot = None
+        if snapshot is not None and self._fresh(snapshot):
+            metrics.inc('user_loads_total', source='session')
+            return SessionUser(snapshot[0], snapshot[1], fingerprint=snapshot[2])
+
+        metrics.inc('user_loads_total', source='database')
+        row = db.session.get(User, user_id)
+        if row is None or not row.is_active:
+            self.invalidate(user_id)
+            return None
+        user = SessionUser.from_user(row)
+        if snapshot is not None and snapshot[2] != user.fingerprint:
+            return None
+        if self.session_fast_path:
+            self.remember(user)
+        self._put(user)
+        return user
+
+    def remember(self, user):
+        """Store a snapshot of user in the session; call after login_user"""
+        if self.session_fast_path:
+            if isinstance(user, User):
+                user = SessionUser.from_user(user)
+            session[SESSION_KEY] = [user.id, user.username, user.fingerprint, time.time()]
+
+    def forget(self):
+        """Drop the session snapshot; call on logout"""
+        session.pop(SESSION_KEY, None)
+
+    def invalidate(self, user_id):
+        """Drop a changed user from this process's cache and distrust older snapshots of it"""
+        now = time.time()
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._invalidated[user_id] = now
+            # Older marks can go: snapshots that old are checked against the database anyway
+            if len(self._invalidated) > self.max_size:
+                self._invalidated = {key: stamp for key, stamp in self._invalidated.items()
+                                     if now - stamp <= self.max_age}
+
+    def clear(self):
+        """Drop every cached user"""
+        with self._lock:
+            self._entries.clear()
+
+    def _fresh(self, snapshot):
+        issued = snapshot[3]
+        if time.time() - issued > self.max_age:
+            return False
+        with self._lock:
+            return issued > self._invalidated.get(snapshot[0], 0)
+
+    def _get(self, user_id):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            user, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return user
+
+    def _put(self, user):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[user.id] = (user, time.monotonic())
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+user_cache = UserCache()
+metrics.describe('user_loads_total', 'Logged-in user lookups by where the user came from')
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_user(mapper, connection, target):
+    # Bulk query.update() skips mapper events; such changes show up within the TTL
+    user_cache.invalidate(target.id)
@@ -1,103 +1,1014 @@
-import nltk
-from sumy.parsers.plaintext import PlaintextParser
-from sumy.nlp.tokenizers import Tokenizer
-from sumy.summarizers.lsa import LsaSummarizer
-from sumy.summarizers.text_rank import TextRankSummarizer
-from sumy.summarizers.luhn import LuhnSummarizer
-from sumy.summarizers.lex_rank import LexRankSummarizer
-from textblob import TextBlob
-import re
-
-# Download required NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
+from concurrent.futures import ProcessPoolExecutor, wait
+from collections import OrderedDict, namedtuple
+import codecs
+import hashlib
+import multiprocessing
+import numpy as np
+import os
+import threading
+from itertools import compress
+
+from metrics import SIZE_BUCKETS, metrics
+from segmenter import KEPT_PUNCTUATION, clean, get_segmenter
+from sentiment import lexicon_sentiment
+
+# NLTK, sumy and TextBlob are imported on first use so that importing this
+# module (and every worker that imports the app) stays cheap.
+
+def download_nltk_data():
+    """Download the NLTK data used by the legacy sumy path and punkt abbreviations"""
+    import nltk
     nltk.download('punkt')
 
+def clean_text(text):
+    """Clean and preprocess text"""
+    # Drop special characters but keep basic punctuation, then collapse whitespace
+    return clean(text)
+
+# Version of what analyze() returns; bump it when summaries, sentiment or
+# statistics change so results cached by older code are not served
+ANALYSIS_VERSION = 2
+
+# Punctuation stripped from words before they become terms
+_TERM_STRIP = str.maketrans('', '', KEPT_PUNCTUATION)
+
+TermIndex = namedtuple('TermIndex', ['term_ids', 'sentence_ids', 'vocabulary'])
+
+# Streaming input is read in pieces of this many characters or bytes
+STREAM_READ_SIZE = 64 * 1024
+
+def iter_text(stream, read_size=STREAM_READ_SIZE):
+    """Yield decoded text pieces from a file-like object or an iterable of chunks"""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    if hasattr(stream, 'read'):
+        pieces = iter(lambda: stream.read(read_size), None)
+    else:
+        pieces = stream
+    for piece in pieces:
+        if not piece:
+            if hasattr(stream, 'read'):
+                break
+            continue
+        yield decoder.decode(piece) if isinstance(piece, bytes) else piece
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+def iter_sentence_chunks(stream, chunk_words=2000, language='english', read_size=STREAM_READ_SIZE):
+    """Yield lists of cleaned sentences holding roughly chunk_words words each.
+
+    Only the current read and the unfinished trailing sentence are buffered,
+    so memory is bounded by read_size and chunk_words, not by the input size.
+    """
+    carry = ''
+    pending = ''
+    chunk = []
+    chunk_length = 0
+    pieces = iter_text(stream, read_size)
+    exhausted = False
+    while not exhausted:
+        piece = next(pieces, None)
+        exhausted = piece is None
+        raw = pending + (piece or '')
+        # Hold back a word that may continue in the next piece
+        cut = len(raw) if exhausted else max(raw.rfind(' '), raw.rfind('\n'))
+        if cut <= 0 and len(raw) < 4 * read_size:
+            pending = raw
+            continue
+        if cut <= 0:
+            cut = len(raw)
+        pending = raw[cut:]
+        sentences = get_segmenter(language).sentences(carry + ' ' + raw[:cut])
+        if not sentences:
+            continue
+        # The last sentence may continue in the next piece
+        carry = '' if exhausted else sentences.pop()
+        # Text without sentence ends would otherwise pile up in carry and be
+        # re-segmented on every read; cut it into chunk_words-word pieces
+        words = carry.split(' ')
+        if len(words) > chunk_words:
+            keep = len(words) % chunk_words or chunk_words
+            sentences.extend(' '.join(words[start:start + chunk_words])
+                             for start in range(0, len(words) - keep, chunk_words))
+            carry = ' '.join(words[len(words) - keep:])
+        for sentence in sentences:
+            chunk.append(sentence)
+            chunk_length += len(sentence.split())
+            if chunk_length >= chunk_words:
+                yield chunk
+                chunk = []
+                chunk_length = 0
+    if chunk:
+        yield chunk
+
+class Document:
+    """Text segmented once and shared by the summarizer, sentiment and statistics.
+
+    Sentences and words are kept as offset arrays from the Segmenter, so
+    downstream consumers never re-split the text; strings are only built
+    when asked for.
+    """
+
+    def __init__(self, text, language='english', segmentation=None):
+        if segmentation is None:
+            segmentation = get_segmenter(language).segment(text, clean_text=False)
+        self.segmentation = segmentation
+        self.text = segmentation.text
+        self.language = language
+        self._sentences = None
+        self._terms = None
+        self._hashes = None
+
+    @classmethod
+    def from_text(cls, text, language='english'):
+        """Clean and segment raw text in one pass"""
+        return cls(None, language, get_segmenter(language).segment(text))
+
+    @classmethod
+    def from_sentences(cls, sentences, language='english'):
+        """Build a Document from already cleaned sentences without re-segmenting"""
+        return cls(None, language, get_segmenter(language).from_sentences(sentences))
+
+    @property
+    def word_count(self):
+        return len(self.segmentation.word_starts)
+
+    @property
+    def sentence_count(self):
+        return len(self.segmentation.sentence_starts)
+
+    @property
+    def letter_count(self):
+        """Total length of all words"""
+        return int((self.segmentation.word_ends - self.segmentation.word_starts).sum())
+
+    @property
+    def sentences(self):
+        if self._sentences is None:
+            self._sentences = [self.text[start:end] for start, end in zip(
+                self.segmentation.sentence_starts.tolist(), self.segmentation.sentence_ends.tolist()
+            )]
+        return self._sentences
+
+    def word_sentence_ids(self):
+        """Index of the sentence each word belongs to"""
+        return np.searchsorted(self.segmentation.sentence_starts,
+                               self.segmentation.word_starts, side='right') - 1
+
+    def sentence_word_counts(self):
+        return np.bincount(self.word_sentence_ids(), minlength=self.sentence_count)
+
+    def words(self):
+        """Return the words of the document as strings"""
+        return self.text.split(' ') if self.text else []
+
+    def terms(self):
+        """Return lower-cased term ids for every alphabetic word and the sentence it belongs to"""
+        if self._terms is None:
+            words = self.text.lower().translate(_TERM_STRIP).split(' ') if self.text else []
+            alphabetic = np.fromiter(map(str.isalpha, words), dtype=bool, count=len(words))
+            vocabulary = {term: index for index, term
+                          in enumerate(dict.fromkeys(compress(words, alphabetic)))}
+            term_ids = np.fromiter(map(vocabulary.__getitem__, compress(words, alphabetic)),
+                                   dtype=np.int64)
+            sentence_ids = self.word_sentence_ids()[alphabetic] if words else term_ids
+            self._terms = TermIndex(term_ids, sentence_ids.astype(np.int64), list(vocabulary))
+        return self._terms
+
+    def sentence_hashes(self):
+        """Content hash of every sentence, the key for cached sentence artifacts"""
+        if self._hashes is None:
+            self._hashes = [SentenceArtifacts.sentence_hash(sentence) for sentence in self.sentences]
+        return self._hashes
+
+    def attach_terms(self, term_index):
+        """Use a TermIndex built elsewhere, e.g. from cached sentence artifacts"""
+        self._terms = term_index
+
+    def to_sumy(self, tokenizer):
+        """Build a sumy document model from the already split sentences"""
+        from sumy.models.dom import ObjectDocumentModel, Paragraph, Sentence
+        sentences = [Sentence(sentence, tokenizer) for sentence in self.sentences]
+        return ObjectDocumentModel([Paragraph(sentences)])
+
+class SparseMatrix:
+    """Minimal coordinate-format sparse matrix built on NumPy arrays"""
+
+    def __init__(self, rows, cols, data, shape):
+        self.rows = rows
+        self.cols = cols
+        self.data = data
+        self.shape = shape
+
+    @classmethod
+    def from_pairs(cls, rows, cols, shape):
+        """Count duplicate (row, col) pairs into a sparse frequency matrix"""
+        keys, counts = np.unique(rows * shape[1] + cols, return_counts=True)
+        return cls(keys // shape[1], keys % shape[1], counts.astype(np.float64), shape)
+
+    def with_data(self, data):
+        return SparseMatrix(self.rows, self.cols, data, self.shape)
+
+    def row_max(self):
+        result = np.zeros(self.shape[0])
+        np.maximum.at(result, self.rows, self.data)
+        return result
+
+    def row_norms(self):
+        return np.sqrt(np.bincount(self.rows, weights=self.data ** 2, minlength=self.shape[0]))
+
+    def dot(self, other):
+        """Multiply by a dense vector or matrix with shape[1] rows"""
+        if other.ndim == 1:
+            return np.bincount(self.rows, weights=self.data * other[self.cols],
+                               minlength=self.shape[0])
+        return np.column_stack([self.dot(column) for column in other.T])
+
+    def tdot(self, other):
+        """Multiply the transpose by a dense vector or matrix with shape[0] rows"""
+        if other.ndim == 1:
+            return np.bincount(self.cols, weights=self.data * other[self.rows],
+                               minlength=self.shape[1])
+        return np.column_stack([self.tdot(column) for column in other.T])
+
+class ExtractiveEngine:
+    """Base class for the vectorized extractive summarizers.
+
+    Engines rate the sentences of a Document from its term ids and return the
+    best ``sentences_count`` of them in document order, like sumy summarizers.
+    ``initial`` optionally carries scores from an earlier run per sentence
+    (NaN where unknown); iterative engines use it as a warm start.
+    """
+
+    WARM_START = False
+
+    def __init__(self, stop_words=(), stemmer=None):
+        self.stop_words = frozenset(stop_words)
+        self.stemmer = stemmer
+
+    def __call__(self, document, sentences_count, initial=None):
+        return self.select(document, self.rate_sentences(document, sentences_count, initial),
+                           sentences_count)
+
+    def select(self, document, scores, sentences_count):
+        """The sentences_count best-scored sentences in document order"""
+        best = np.argsort(-scores, kind='stable')[:sentences_count]
+        return [document.sentences[index] for index in sorted(best)]
+
+    def rate_sentences(self, document, sentences_count, initial=None):
+        raise NotImplementedError
+
+    def _stop_mask(self, vocabulary):
+        return np.array([term in self.stop_words for term in vocabulary], dtype=bool)
+
+    def word_terms(self, document):
+        """Per word: its stemmed term id, sentence and whether it is a stop word; plus the term count"""
+        term_ids, sentence_ids, vocabulary = document.terms()
+        stop = self._stop_mask(vocabulary)[term_ids] if len(term_ids) else term_ids.astype(bool)
+        if self.stemmer is None or not vocabulary:
+            return term_ids, sentence_ids, stop, len(vocabulary)
+        # Stop words are matched before stemming, as sumy does
+        stems = {}
+        stem_ids = np.fromiter((stems.setdefault(self.stemmer(term), len(stems)) for term in vocabulary),
+                               dtype=np.int64, count=len(vocabulary))
+        return stem_ids[term_ids], sentence_ids, stop, len(stems)
+
+    def term_matrix(self, document):
+        """Sentence x term frequency matrix with stop words removed"""
+        term_ids, sentence_ids, stop, n_terms = self.word_terms(document)
+        keep = ~stop
+        return SparseMatrix.from_pairs(sentence_ids[keep], term_ids[keep],
+                                       (document.sentence_count, n_terms))
+
+class LsaEngine(ExtractiveEngine):
+    """Latent semantic analysis ranking, exactly as sumy rates sentences.
+
+    sumy keeps every singular dimension, and with all of them the rank
+    sqrt(sum_k sigma_k^2 v_jk^2) is simply the norm of sentence j's column of
+    the smoothed term-sentence matrix. That norm is computed here in closed
+    form from the sparse counts, so no SVD and no dense matrix are needed.
+    """
+
+    SMOOTH = 0.4
+
+    def rate_sentences(self, document, sentences_count, initial=None):
+        # sumy leaves stop words out of its dictionary, but still counts
+        # those whose stem is in it, e.g. "changes" once "change" is there
+        term_ids, sentence_ids, stop, n_terms = self.word_terms(document)
+        keep = np.isin(term_ids, term_ids[~stop])
+        counts = SparseMatrix.from_pairs(sentence_ids[keep], term_ids[keep],
+                                         (document.sentence_count, n_terms))
+        n_sentences = counts.shape[0]
+        if not counts.data.size:
+            return np.zeros(n_sentences)
+
+        # Column j is smooth + (1 - smooth) * tf / max tf for each of the
+        # document's terms, so its squared norm expands into three sums
+        row_max = counts.row_max()
+        normalized = counts.data / row_max[counts.rows]
+        linear = np.bincount(counts.rows, weights=normalized, minlength=n_sentences)
+        square = np.bincount(counts.rows, weights=normalized ** 2, minlength=n_sentences)
+        n_terms = np.count_nonzero(np.bincount(counts.cols, minlength=counts.shape[1]))
+        smooth = self.SMOOTH
+        total = n_terms * smooth ** 2 + 2 * smooth * (1 - smooth) * linear \
+            + (1 - smooth) ** 2 * square
+        return np.sqrt(np.where(row_max > 0, total, 0.0))
+
+class GraphRankEngine(ExtractiveEngine):
+    """Sentence centrality by power iteration over a similarity graph.
+
+    The similarity of two sentences is the dot product of their rows from
+    ``vectors``, and the matrix X X^T is applied as two sparse products per
+    iteration, so memory stays proportional to the number of tokens.
+    """
+
+    DAMPING = 0.85
+    SELF_LOOPS = False
+    WARM_START = True
+    TOLERANCE = 1e-6
+    MAX_ITERATIONS = 100
+
+    def vectors(self, counts):
+        """Sentence vectors whose dot products are the edge weights"""
+        norms = counts.row_norms()
+        return counts.with_data(counts.data / np.where(norms > 0, norms, 1.0)[counts.rows])
+
+    def rate_sentences(self, document, sentences_count, initial=None):
+        counts = self.term_matrix(document)
+        n_sentences = counts.shape[0]
+        if not counts.data.size:
+            return np.zeros(n_sentences)
+
+        vectors = self.vectors(counts)
+        self_similarity = np.zeros(n_sentences) if self.SELF_LOOPS else vectors.row_norms() ** 2
+
+        def similarity_dot(vector):
+            return vectors.dot(vectors.tdot(vector)) - self_similarity * vector
+
+        degrees = similarity_dot(np.ones(n_sentences))
+        dangling = degrees <= 1e-12
+        degrees[dangling] = 1.0
+
+        ranks = self.initial_ranks(initial, n_sentences)
+        for _ in range(self.MAX_ITERATIONS):
+            spread = similarity_dot(np.where(dangling, 0.0, ranks / degrees))
+            updated = (1.0 - self.DAMPING) / n_sentences \
+                + self.DAMPING * (spread + ranks[dangling].sum() / n_sentences)
+            converged = np.abs(updated - ranks).sum() < self.TOLERANCE
+            ranks = updated
+            if converged:
+                break
+        return ranks
+
+    @staticmethod
+    def initial_ranks(initial, n_sentences):
+        # Known sentences start from their previous rank, new ones from uniform
+        if initial is None or len(initial) != n_sentences:
+            return np.full(n_sentences, 1.0 / n_sentences)
+        ranks = np.where(np.isnan(initial), 1.0 / n_sentences, initial)
+        total = ranks.sum()
+        return ranks / total if total > 0 else np.full(n_sentences, 1.0 / n_sentences)
+
+class TextRankEngine(GraphRankEngine):
+    """TextRank over shared term counts, with self-loops, as sumy weighs edges.
+
+    sumy divides the shared counts of two sentences by the sum of their log
+    lengths. Here each sentence is scaled by the square root of twice its own
+    log length instead, which divides by the geometric rather than the
+    arithmetic mean and keeps the graph a product of sparse factors.
+    """
+
+    SELF_LOOPS = True
+
+    def vectors(self, counts):
+        lengths = np.bincount(counts.rows, weights=counts.data, minlength=counts.shape[0])
+        # sumy adds 1e-7 to avoid dividing by zero; one-word sentences get log 0.5 instead
+        scale = np.sqrt(2.0 * np.maximum(np.log(np.maximum(lengths, 1.0)), 0.5))
+        return counts.with_data(counts.data / scale[counts.rows])
+
+class LexRankEngine(GraphRankEngine):
+    """Continuous LexRank over tf-idf cosine similarity.
+
+    sumy thresholds the cosine similarities into a 0/1 graph, which needs every
+    sentence pair and so grows quadratically. The continuous variant from the
+    same paper is used instead; its picks score within a few percent of sumy's
+    own under sumy's ratings (see tests/test_engines.py).
+    """
+
+    def vectors(self, counts):
+        document_frequency = np.bincount(counts.cols, minlength=counts.shape[1])
+        idf = np.log(counts.shape[0] / np.maximum(document_frequency, 1))
+        return super().vectors(counts.with_data(counts.data * idf[counts.cols]))
+
+class LuhnEngine(ExtractiveEngine):
+    """Luhn scoring of clusters of significant words, as sumy computes it"""
+
+    MAX_GAP_SIZE = 4
+
+    def rate_sentences(self, document, sentences_count, initial=None):
+        term_ids, sentence_ids, stop, n_terms = self.word_terms(document)
+        scores = np.zeros(document.sentence_count)
+        if not len(term_ids):
+            return scores
+
+        # Significant words are non stop words occurring more than once
+        frequency = np.bincount(term_ids, minlength=n_terms)
+        positions = np.flatnonzero((frequency[term_ids] > 1) & ~stop)
+        if not positions.size:
+            return scores
+
+        # A chunk ends once MAX_GAP_SIZE insignificant words follow a significant one
+        chunk_sentences = sentence_ids[positions]
+        starts = np.ones(positions.size, dtype=bool)
+        starts[1:] = (chunk_sentences[1:] != chunk_sentences[:-1]) \
+            | (np.diff(positions) - 1 >= self.MAX_GAP_SIZE)
+        chunk_ids = np.cumsum(starts) - 1
+        significant_counts = np.bincount(chunk_ids)
+        first = positions[starts]
+        last = np.zeros(significant_counts.size, dtype=np.int64)
+        np.maximum.at(last, chunk_ids, positions)
+        ratings = np.where(significant_counts > 1,
+                           significant_counts ** 2 / (last - first + 1), 0.0)
+        np.maximum.at(scores, chunk_sentences[starts], ratings)
+        return scores
+
+ENGINES = {
+    'lsa': LsaEngine,
+    'text_rank': TextRankEngine,
+    'luhn': LuhnEngine,
+    'lex_rank': LexRankEngine
+}
+
+class LanguageResources:
+    """The tokenizers, stop words, stemmer and engines of one language.
+
+    Built once per language by ``get_language_resources`` and shared by
+    every thread: nothing here changes after construction except the stem
+    memo, whose single-key reads and writes are atomic. Languages sumy has no
+    stop words or stemmer for get none, and are summarized on plain terms.
+    """
+
+    # Memoized stems before the memo is cleared
+    MAX_STEMS = 200000
+
+    def __init__(self, language):
+        from sumy.nlp.stemmers import Stemmer
+        from sumy.utils import get_stop_words
+        self.language = language
+        self.segmenter = get_segmenter(language)
+        try:
+            self.stop_words = get_stop_words(language)
+        except LookupError:
+            self.stop_words = frozenset()
+        try:
+            self._stem = Stemmer(language)
+        except LookupError:
+            self._stem = None
+        self._stems = {}
+        self._tokenizer = None
+        stemmer = self.stem if self._stem is not None else None
+        self.engines = {method: engine(self.stop_words, stemmer) for method, engine in ENGINES.items()}
+
+    def stem(self, term):
+        stem = self._stems.get(term)
+        if stem is None:
+            if len(self._stems) > self.MAX_STEMS:
+                self._stems = {}
+            stem = self._stems[term] = self._stem(term)
+        return stem
+
+    @property
+    def tokenizer(self):
+        """sumy Tokenizer for the legacy path, created on first use"""
+        if self._tokenizer is None:
+            from sumy.nlp.tokenizers import Tokenizer
+            self._tokenizer = Tokenizer(self.language)
+        return self._tokenizer
+
+_language_resources = {}
+_language_resources_lock = threading.Lock()
+
+def get_language_resources(language='english'):
+    """Return the shared LanguageResources for language"""
+    resources = _language_resources.get(language)
+    if resources is None:
+        with _language_resources_lock:
+            resources = _language_resources.get(language)
+            if resources is None:
+                resources = _language_resources[language] = LanguageResources(language)
+    return resources
+
+class SentenceArtifacts:
+    """Per-sentence term ids and scores keyed by sentence hash.
+
+    Term ids index a vocabulary shared by every document, so a sentence seen
+    before contributes its cached row to the term matrix (and through it to
+    the similarity graph) without being tokenized again. Named per-sentence
+    values are kept too: the score each iterative method gave a sentence,
+    which seeds the next ranking of a document containing it, and its
+    sentiment. When the vocabulary outgrows its bound everything is reset.
+    """
+
+    def __init__(self, max_sentences=200000, max_terms=500000):
+        self.max_sentences = max_sentences
+        self.max_terms = max_terms
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._reset()
+
+    def _reset(self):
+        # Entries read before a reset are recognized by the generation and looked up again
+        self._generation += 1
+        self._vocabulary = {}
+        self._terms = []
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def sentence_hash(sentence):
+        return hashlib.blake2b(sentence.encode('utf-8'), digest_size=16).digest()
+
+    @staticmethod
+    def _tokenize(sentence):
+        words = sentence.lower().translate(_TERM_STRIP).split(' ')
+        return [word for word in words if word.isalpha()]
+
+    def term_index(self, document):
+        """TermIndex for document plus its sentence hashes, tokenizing only unseen sentences"""
+        sentences = document.sentences
+        hashes = document.sentence_hashes()
+        with self._lock:
+            generation = self._generation
+            entries = [self._entries.get(key) for key in hashes]
+        tokens = {index: self._tokenize(sentences[index])
+                  for index, entry in enumerate(entries) if entry is None}
+
+        with self._lock:
+            if len(self._terms) > self.max_terms:
+                self._reset()
+            if self._generation != generation:
+                # Ids read before a reset index the old vocabulary
+                entries = [None] * len(hashes)
+            created = 0
+            for index, key in enumerate(hashes):
+                if entries[index] is not None:
+                    continue
+                # Another thread may have stored the sentence, or a reset dropped it
+                entry = self._entries.get(key)
+                if entry is None:
+                    words = tokens.get(index)
+                    if words is None:
+                        words = self._tokenize(sentences[index])
+                    ids = np.fromiter((self._term_id(word) for word in words),
+                                      dtype=np.int64, count=len(words))
+                    entry = self._entries[key] = (ids, {})
+                    created += 1
+                entries[index] = entry
+            for key in hashes:
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_sentences:
+                self._entries.popitem(last=False)
+            self.hits += len(hashes) - created
+            self.misses += created
+            terms = self._terms
+
+        metrics.inc('sentence_artifacts_total', len(hashes) - created, outcome='hit')
+        metrics.inc('sentence_artifacts_total', created, outcome='miss')
+        rows = [entry[0] for entry in entries]
+        lengths = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows))
+        global_ids = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        # Renumber the shared ids densely so matrices stay document-sized
+        present = np.zeros(len(terms), dtype=bool)
+        present[global_ids] = True
+        used = np.flatnonzero(present)
+        dense = np.cumsum(present) - 1
+        sentence_ids = np.repeat(np.arange(len(rows), dtype=np.int64), lengths)
+        vocabulary = [terms[index] for index in used.tolist()]
+        return TermIndex(dense[global_ids], sentence_ids, vocabulary), hashes
+
+    def _term_id(self, word):
+        term_id = self._vocabulary.get(word)
+        if term_id is None:
+            term_id = self._vocabulary[word] = len(self._terms)
+            self._terms.append(word)
+        return term_id
+
+    def clear(self):
+        """Drop every stored sentence and the shared vocabulary"""
+        with self._lock:
+            self._reset()
+
+    def values(self, hashes, name):
+        """Stored value called name for each sentence, NaN where unknown"""
+        with self._lock:
+            values = [self._entries[key][1].get(name, np.nan) if key in self._entries else np.nan
+                      for key in hashes]
+        return np.array(values, dtype=np.float64)
+
+    def store_values(self, hashes, name, values):
+        """Store a value per sentence for sentences the store already holds"""
+        with self._lock:
+            for key, value in zip(hashes, values.tolist()):
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry[1][name] = value
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sentences': len(self._entries),
+                'terms': len(self._terms),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
 class TextSummarizer:
     def __init__(self):
-        self.available_methods = {
-            'lsa': LsaSummarizer(),
-            'text_rank': TextRankSummarizer(),
-            'luhn': LuhnSummarizer(),
-            'lex_rank': LexRankSummarizer()
-        }
+        # Engine classes by method; the configured instances are per language
+        self.available_methods = ENGINES
+        self.artifacts = SentenceArtifacts()
+        self.sentiment = lexicon_sentiment
+        # Documents with more sentences only score a sample of them, or the
+        # summary with sentiment_scope='summary'; None scores everything
+        self.sentiment_max_sentences = None
+        self.sentiment_scope = 'sample'
+        self._legacy_methods = None
+    
+    @property
+    def legacy_methods(self):
+        """The original sumy implementations, kept for comparison"""
+        if self._legacy_methods is None:
+            from sumy.summarizers.lsa import LsaSummarizer
+            from sumy.summarizers.text_rank import TextRankSummarizer
+            from sumy.summarizers.luhn import LuhnSummarizer
+            from sumy.summarizers.lex_rank import LexRankSummarizer
+            self._legacy_methods = {
+                'lsa': LsaSummarizer(),
+                'text_rank': TextRankSummarizer(),
+                'luhn': LuhnSummarizer(),
+                'lex_rank': LexRankSummarizer()
+            }
+        return self._legacy_methods
+    
+    def warm_up(self, languages=('english',)):
+        """Load tokenizers, the sentiment lexicon and every engine before serving traffic"""
+        sample = ('The summarizer is warming up before it takes traffic. '
+                  'Every engine runs once on this short sample text. '
+                  'The sentiment lexicon is loaded as well.')
+        document = Document.from_text(sample)
+        for language in languages:
+            for engine in get_language_resources(language).engines.values():
+                engine(document, 1)
+        self.sentiment.compile()
+    
+    def resolve_method(self, method):
+        """Return method if it is available, otherwise the default 'lsa'"""
+        return method if method in self.available_methods else 'lsa'
+    
+    def engine(self, method, language='english'):
+        """The shared engine for method configured with language's stop words and stemmer"""
+        return get_language_resources(language).engines[self.resolve_method(method)]
     
     def clean_text(self, text):
         """Clean and preprocess text"""
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
-        # Remove special characters but keep basic punctuation
-        text = re.sub(r'[^\w\s.,!?;:]', '', text)
-        return text.strip()
+        return clean_text(text)
     
     def get_sentences_count(self, text, sentences_count=None):
         """Calculate appropriate number of sentences for summary"""
         if sentences_count:
             return min(sentences_count, 20)  # Limit to 20 sentences max
         
+        return self._default_sentences_count(len(get_segmenter().segment(text).sentence_starts))
+    
+    def _default_sentences_count(self, original_sentences):
         # Default: 30% of original sentences, min 3, max 10
-        original_sentences = len(nltk.sent_tokenize(text))
-        calculated = max(3, min(10, int(original_sentences * 0.3)))
-        return calculated
+        return max(3, min(10, int(original_sentences * 0.3)))
     
     def summarize(self, text, method='lsa', sentences_count=None, language='english'):
         """Summarize text using specified method"""
+        with metrics.span('segment'):
+            document = Document.from_text(text, language)
+        return self.summarize_document(document, method, sentences_count)
+    
+    def summarize_document(self, document, method='lsa', sentences_count=None, legacy=False):
+        """Summarize an already tokenized Document"""
+        original_length = document.word_count
         try:
-            # Clean the text
-            text = self.clean_text(text)
-            
-            if len(text.split()) < 50:
-                return text, len(text.split()), len(text.split()), 1.0
+            if original_length < 50:
+                return document.text, original_length, original_length, 1.0
             
             # Calculate sentences count
-            sentences_count = self.get_sentences_count(text, sentences_count)
-            
-            # Parse text
-            parser = PlaintextParser.from_string(text, Tokenizer(language))
-            
-            # Get summarizer
-            summarizer = self.available_methods.get(method, self.available_methods['lsa'])
+            if sentences_count:
+                sentences_count = min(sentences_count, 20)
+            else:
+                sentences_count = self._default_sentences_count(document.sentence_count)
             
             # Generate summary
-            summary_sentences = summarizer(parser.document, sentences_count)
+            metrics.observe('summarizer_input_words', original_length, SIZE_BUCKETS, method=method)
+            with metrics.span('summarize'):
+                summary_sentences = self._run_method(document, method, sentences_count, legacy)
             summary = ' '.join(str(sentence) for sentence in summary_sentences)
             
-            # Calculate metrics
-            original_length = len(text.split())
-            summary_length = len(summary.split())
-            compression_ratio = original_length / summary_length if summary_length > 0 else 1.0
-            
-            return summary, summary_length, original_length, compression_ratio
-            
         except Exception as e:
             # Fallback to simple summary
-            sentences = nltk.sent_tokenize(text)
-            summary_sentences = sentences[:min(5, len(sentences))]
-            summary = ' '.join(summary_sentences)
-            
-            original_length = len(text.split())
-            summary_length = len(summary.split())
-            compression_ratio = original_length / summary_length if summary_length > 0 else 1.0
+            metrics.inc('summarizer_fallbacks_total', method=method, reason=type(e).__name__)
+            summary = ' '.join(document.sentences[:5])
+        
+        # Calculate metrics
+        summary_length = len(summary.split())
+        compression_ratio = original_length / summary_length if summary_length > 0 else 1.0
+        
+        return summary, summary_length, original_length, compression_ratio
+    
+    def _run_method(self, document, method, sentences_count, legacy):
+        if legacy:
+            summarizer = self.legacy_methods.get(method, self.legacy_methods['lsa'])
+            tokenizer = get_language_resources(document.language).tokenizer
+            return summarizer(document.to_sumy(tokenizer), sentences_count)
+        method = self.resolve_method(method)
+        engine = self.engine(method, document.language)
+        
+        # Unchanged sentences reuse their cached term rows and previous scores
+        term_index, hashes = self.artifacts.term_index(document)
+        document.attach_terms(term_index)
+        # Ranks are stored scaled by the sentence count so they carry over between
+        # lengths, and per language since stop words and stems change them
+        key = f'{method}:{document.language}'
+        initial = self.artifacts.values(hashes, key) / len(hashes) if engine.WARM_START else None
+        scores = engine.rate_sentences(document, sentences_count, initial)
+        if engine.WARM_START:
+            self.artifacts.store_values(hashes, key, scores * len(hashes))
+        return engine.select(document, scores, sentences_count)
+    
+    def analyze(self, text, method='lsa', sentences_count=None, language='english'):
+        """Summarize, score sentiment and collect statistics from a single tokenization pass"""
+        with metrics.span('segment'):
+            document = Document.from_text(text, language)
+        summary, summary_length, original_length, compression_ratio = self.summarize_document(
+            document, method, sentences_count
+        )
+        with metrics.span('sentiment'):
+            sentiment = self.document_sentiment(document, summary)
+        with metrics.span('stats'):
+            text_stats = self.get_document_stats(document)
+        
+        return {
+            'summary': summary,
+            'summary_length': summary_length,
+            'original_length': original_length,
+            'compression_ratio': compression_ratio,
+            'sentiment': sentiment,
+            'text_stats': text_stats
+        }
+    
+    def analyze_with_summary(self, text, summary, language='english'):
+        """Analyze text but take its summary as given, e.g. from a near-duplicate"""
+        with metrics.span('segment'):
+            document = Document.from_text(text, language)
+        summary_length = len(summary.split())
+        original_length = document.word_count
+        with metrics.span('sentiment'):
+            sentiment = self.document_sentiment(document, summary)
+        with metrics.span('stats'):
+            text_stats = self.get_document_stats(document)
+        
+        return {
+            'summary': summary,
+            'summary_length': summary_length,
+            'original_length': original_length,
+            'compression_ratio': original_length / summary_length if summary_length > 0 else 1.0,
+            'sentiment': sentiment,
+            'text_stats': text_stats
+        }
+    
+    def summarize_many(self, documents, method='lsa', sentences_count=None, language='english',
+                       max_workers=None, timeout=None):
+        """Analyze many documents across a process pool.
+
+        ``documents`` is a list of strings or dicts with a ``text`` key and
+        optional ``method``, ``sentences_count`` and ``language`` overrides.
+        Results come back in input order; a failed item is ``{'error': ...}``,
+        as is every item not analyzed within ``timeout`` seconds. Chunks still
+        running at the deadline cannot be stopped and keep their worker, so
+        PoolBusy is raised while such chunks occupy every batch worker.
+        """
+        jobs = []
+        for document in documents:
+            if isinstance(document, dict):
+                jobs.append((document.get('text', ''),
+                             document.get('method', method),
+                             document.get('sentences_count', sentences_count),
+                             document.get('language', language)))
+            else:
+                jobs.append((document, method, sentences_count, language))
+        
+        max_workers = max_workers or os.cpu_count() or 1
+        if max_workers == 1 or len(jobs) < 2:
+            return [analyze_job(job) for job in jobs]
+        
+        chunksize = max(1, len(jobs) // (max_workers * 4))
+        pool = get_process_pool('batch', max_workers)
+        if overrunning_tasks('batch') >= max_workers:
+            raise PoolBusy('Every batch worker is still busy with timed-out work')
+        futures = [pool.submit(analyze_jobs, jobs[start:start + chunksize])
+                   for start in range(0, len(jobs), chunksize)]
+        wait(futures, timeout)
+        results = []
+        for start, future in zip(range(0, len(jobs), chunksize), futures):
+            if not future.done():
+                # Chunks that have not started yet are dropped; running ones finish unheard
+                if not future.cancel():
+                    track_overrun('batch', future)
+                error = f'Not analyzed within the {timeout}s time limit'
+            elif future.exception() is not None:
+                error = str(future.exception())
+            else:
+                results.extend(future.result())
+                continue
+            results.extend({'error': error} for _ in jobs[start:start + chunksize])
+        return results
+    
+    def summarize_corpus(self, texts, sentences_count=None, language='english'):
+        """One summary across many related documents, see corpus.CorpusSummarizer"""
+        from corpus import CorpusSummarizer
+        sentences_count = min(sentences_count, 50) if sentences_count else 10
+        with metrics.span('summarize_corpus'):
+            return CorpusSummarizer(self.artifacts).summarize(texts, sentences_count, language)
+    
+    def analyze_stream(self, stream, method='lsa', sentences_count=None, language='english',
+                       chunk_words=2000, reduce_limit=500, preview_chars=10000):
+        """Summarize input read incrementally from a file, request stream or iterable.
+
+        Each chunk of sentences is summarized on its own and the chunk summaries
+        are reduced into the final summary; candidates are reduced early whenever
+        they exceed ``reduce_limit`` sentences, so peak memory stays bounded.
+        Returns the same keys as ``analyze`` plus a ``preview`` of the input.
+        """
+        # Chunks keep at most the largest summary the final pass can ask for
+        chunk_count = min(sentences_count, 20) if sentences_count else 10
+        engine = self.engine(method, language)
+        
+        candidates = []
+        preview = []
+        preview_length = 0
+        word_count = 0
+        sentence_count = 0
+        letters = 0
+        sentiment_sum = 0.0
+        sentiment_count = 0.0
+        
+        for sentences in iter_sentence_chunks(stream, chunk_words, language):
+            document = Document.from_sentences(sentences, language)
+            word_count += document.word_count
+            sentence_count += document.sentence_count
+            letters += document.letter_count
+            with metrics.span('sentiment'):
+                sums, counts = self.sentiment.score_sentences(document.sentences)
+                sentiment_sum += sums.sum()
+                sentiment_count += counts.sum()
+            if preview_length < preview_chars:
+                preview.append(document.text[:preview_chars - preview_length])
+                preview_length += len(preview[-1])
             
-            return summary, summary_length, original_length, compression_ratio
+            # Repeated boilerplate sentences only need to compete once
+            with metrics.span('summarize'):
+                candidates = list(dict.fromkeys(candidates + engine(document, chunk_count)))
+                if len(candidates) > reduce_limit:
+                    candidates = engine(Document.from_sentences(candidates, language),
+                                        reduce_limit // 2)
+        
+        if word_count < 50:
+            summary = ' '.join(candidates)
+        else:
+            final_count = chunk_count if sentences_count else self._default_sentences_count(sentence_count)
+            summary = ' '.join(engine(Document.from_sentences(candidates, language), final_count))
+        
+        summary_length = len(summary.split())
+        return {
+            'summary': summary,
+            'summary_length': summary_length,
+            'original_length': word_count,
+            'compression_ratio': word_count / summary_length if summary_length > 0 else 1.0,
+            'sentiment': float(sentiment_sum / sentiment_count) if sentiment_count else 0.0,
+            'text_stats': {
+                'word_count': word_count,
+                'sentence_count': sentence_count,
+                'avg_word_length': letters / word_count if word_count else 0,
+                'avg_sentence_length': word_count / sentence_count if sentence_count else 0
+            },
+            'preview': ' '.join(preview)
+        }
     
-    def analyze_sentiment(self, text):
+    def analyze_sentiment(self, text, legacy=False):
         """Analyze sentiment of text"""
-        blob = TextBlob(text)
-        return blob.sentiment.polarity
+        if legacy:
+            from textblob import TextBlob
+            return TextBlob(text).sentiment.polarity
+        return self.sentiment.polarity(get_segmenter().sentences(text))
+    
+    def sentence_sentiment(self, document, indices=None):
+        """Polarity sums and assessment counts per sentence, reusing cached sentence scores"""
+        hashes = document.sentence_hashes()
+        sentences = document.sentences
+        if indices is not None:
+            hashes = [hashes[index] for index in indices]
+            sentences = [sentences[index] for index in indices]
+        sums = self.artifacts.values(hashes, 'sentiment_sum')
+        counts = self.artifacts.values(hashes, 'sentiment_count')
+        missing = np.flatnonzero(np.isnan(sums) | np.isnan(counts))
+        if missing.size:
+            missing_hashes = [hashes[index] for index in missing.tolist()]
+            sums[missing], counts[missing] = self.sentiment.score_sentences(
+                [sentences[index] for index in missing.tolist()]
+            )
+            self.artifacts.store_values(missing_hashes, 'sentiment_sum', sums[missing])
+            self.artifacts.store_values(missing_hashes, 'sentiment_count', counts[missing])
+        return sums, counts
+    
+    def sentence_polarity(self, document):
+        """Polarity of every sentence of document, e.g. for sentiment-aware ranking"""
+        sums, counts = self.sentence_sentiment(document)
+        return np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+    
+    def document_sentiment(self, document, summary=None):
+        """Mean polarity of document, sampled or taken from summary when it is very long"""
+        limit = self.sentiment_max_sentences
+        if not limit or document.sentence_count <= limit:
+            sums, counts = self.sentence_sentiment(document)
+        elif self.sentiment_scope == 'summary' and summary:
+            sums, counts = self.sentiment.score_sentences(
+                get_segmenter(document.language).sentences(summary, clean_text=False)
+            )
+        else:
+            # Evenly spaced sentences stand in for the whole document
+            indices = np.unique(np.linspace(0, document.sentence_count - 1, limit).astype(np.int64))
+            sums, counts = self.sentence_sentiment(document, indices.tolist())
+        total = counts.sum()
+        return float(sums.sum() / total) if total else 0.0
     
     def get_text_stats(self, text):
         """Get basic text statistics"""
-        words = text.split()
-        sentences = nltk.sent_tokenize(text)
+        return self.get_document_stats(Document(text))
+    
+    def get_document_stats(self, document):
+        """Get basic statistics for an already tokenized Document"""
+        word_count = document.word_count
+        sentence_count = document.sentence_count
+        letters = document.letter_count
         
         return {
-            'word_count': len(words),
-            'sentence_count': len(sentences),
-            'avg_word_length': sum(len(word) for word in words) / len(words) if words else 0,
-            'avg_sentence_length': len(words) / len(sentences) if sentences else 0
+            'word_count': word_count,
+            'sentence_count': sentence_count,
+            'avg_word_length': letters / word_count if word_count else 0,
+            'avg_sentence_length': word_count / sentence_count if sentence_count else 0
         }
 
 summarizer = TextSummarizer()
 
+class PoolBusy(Exception):
+    """Raised when timed-out work still holds every worker of a process pool"""
+
+_process_pools = {}
+_overrunning = {}
+_process_pools_lock = threading.Lock()
+
+def get_process_pool(purpose, max_workers):
+    """Return the process pool for purpose, e.g. 'batch' or 'jobs', created with max_workers on first use"""
+    with _process_pools_lock:
+        pool = _process_pools.get(purpose)
+        if pool is None:
+            # Forking a threaded server can copy a lock some other thread holds into
+            # the child, which then deadlocks; start workers from a clean process
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            pool = _process_pools[purpose] = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=multiprocessing.get_context(method))
+        return pool
+
+def track_overrun(purpose, future):
+    """Count future, abandoned by a caller that timed out, as overrunning until it ends"""
+    def finished(future):
+        with _process_pools_lock:
+            _overrunning[purpose] -= 1
+
+    with _process_pools_lock:
+        _overrunning[purpose] = _overrunning.get(purpose, 0) + 1
+    future.add_done_callback(finished)
+
+def overrunning_tasks(purpose):
+    """Tasks of purpose's pool still running after their caller gave up on them"""
+    with _process_pools_lock:
+        return _overrunning.get(purpose, 0)
+
+def analyze_job(job):
+    """Process pool entry point: analyze one document, reporting errors per item"""
+    text, method, sentences_count, language = job
+    try:
+        return summarizer.analyze(text, method, sentences_count, language)
+    except Exception as e:
+        return {'error': str(e)}
+
+def analyze_jobs(jobs):
+    """Process pool entry point: analyze a chunk of documents"""
+    return [analyze_job(job) for job in jobs]
+
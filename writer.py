@@ -0,0 +1,223 @@
+import atexit
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from duplicates import sign_summaries
+from metrics import SIZE_BUCKETS, metrics
+from models import db, IdBlock, Summary
+
+
+class WriteFailed(Exception):
+    """Raised when a buffered summary could not be committed"""
+
+
+class PendingWrite:
+    """A summary waiting in the write-behind buffer"""
+
+    def __init__(self, summary):
+        self.summary = summary
+        self.queued_at = time.monotonic()
+        self.done = threading.Event()
+        self.error = None
+
+
+class SummaryWriter:
+    """Write-behind buffer that group-commits new Summary rows.
+
+    Requests hand their rows to ``save`` and a writer thread inserts
+    everything that arrived within ``interval`` seconds, or ``batch_size``
+    rows, in a single transaction: one lock acquisition and one fsync for
+    the whole group. Ids come from blocks reserved in ``IdBlock``, so
+    ``save`` returns the final summary id before the row exists. While the
+    writer is enabled every other Summary insert draws its id from the same
+    blocks, so the two paths never collide.
+
+    ``durability`` decides when ``save`` returns: ``commit`` waits until the
+    group holding the row is committed, ``buffer`` returns as soon as the
+    row is queued and can lose the last ``interval`` of rows on a crash.
+    """
+
+    def __init__(self, batch_size=200, interval=0.05, durability='commit', id_block=100,
+                 max_pending=10000, timeout=30):
+        self.enabled = False
+        self.app = None
+        self.batch_size = batch_size
+        self.interval = interval
+        self.durability = durability
+        self.id_block = id_block
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pending = deque()
+        self._writing = 0
+        self._condition = threading.Condition()
+        self._id_lock = threading.Lock()
+        self._next_id = 0
+        self._end_id = 0
+        self._thread = None
+        self._closing = False
+
+    def init_app(self, app):
+        """Configure the writer from the Flask app config"""
+        self.app = app
+        self.enabled = app.config.get('SUMMARY_WRITE_BEHIND', self.enabled)
+        self.batch_size = app.config.get('SUMMARY_WRITE_BATCH', self.batch_size)
+        self.interval = app.config.get('SUMMARY_WRITE_INTERVAL', self.interval)
+        self.durability = app.config.get('SUMMARY_WRITE_DURABILITY', self.durability)
+        self.id_block = app.config.get('SUMMARY_ID_BLOCK', self.id_block)
+        self.max_pending = app.config.get('SUMMARY_WRITE_MAX_PENDING', self.max_pending)
+        if self.enabled:
+            atexit.register(self.close)
+
+    def start(self):
+        """Start the writer thread if it is not running yet"""
+        with self._condition:
+            if self._thread is None:
+                self._closing = False
+                self._thread = threading.Thread(target=self._run, name='summary-writer', daemon=True)
+                self._thread.start()
+
+    def depth(self):
+        """Rows queued or being written"""
+        return len(self._pending) + self._writing
+
+    def allocate_ids(self, count):
+        """count summary ids from the reserved block, reserving a new block when it runs out"""
+        with self._id_lock:
+            ids = []
+            while len(ids) < count:
+                if self._next_id >= self._end_id:
+                    size = max(self.id_block, count - len(ids))
+                    self._next_id = IdBlock.reserve(Summary, size)
+                    self._end_id = self._next_id + size
+                take = min(count - len(ids), self._end_id - self._next_id)
+                ids.extend(range(self._next_id, self._next_id + take))
+                self._next_id += take
+            return ids
+
+    def save(self, summary):
+        """Queue a new Summary and return its id; with commit durability, once it is committed"""
+        self.start()
+        # End the caller's transaction, as the commit this replaces would; a request
+        # holding its pooled connection while it waits could starve the writer
+        db.session.commit()
+        if summary.id is None:
+            summary.id = self.allocate_ids(1)[0]
+        if summary.created_at is None:
+            summary.created_at = datetime.utcnow()
+        # Hash here rather than on the writer thread, which every request waits on
+        sign_summaries([summary])
+        pending = PendingWrite(summary)
+        with self._condition:
+            # Back-pressure: wait for room rather than buffering without bound
+            if not self._condition.wait_for(lambda: len(self._pending) < self.max_pending, self.timeout):
+                raise WriteFailed('Write buffer is full')
+            self._pending.append(pending)
+            # Wake the writer to open a new group, or to close a full one early
+            if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+                self._condition.notify_all()
+        if self.durability == 'commit':
+            if not pending.done.wait(self.timeout):
+                raise WriteFailed('Timed out waiting for the summary to be committed')
+            if pending.error is not None:
+                raise WriteFailed(pending.error)
+        return summary.id
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far has been written"""
+        deadline = time.monotonic() + (timeout if timeout is not None else self.timeout)
+        with self._condition:
+            self._condition.notify_all()
+            while self._pending or self._writing:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(min(remaining, self.interval))
+        return True
+
+    def close(self):
+        """Write out the buffer and stop the writer thread"""
+        if self._thread is None:
+            return
+        self.flush()
+        with self._condition:
+            self._closing = True
+            self._condition.notify_all()
+        self._thread.join(self.timeout)
+        self._thread = None
+
+    def _take_batch(self):
+        with self._condition:
+            while not self._pending and not self._closing:
+                self._condition.wait()
+            if not self._pending:
+                return None
+            # Hold the group open until it is full or its oldest row is interval old
+            deadline = self._pending[0].queued_at + self.interval
+            while len(self._pending) < self.batch_size and not self._closing:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            self._writing = len(batch)
+            self._condition.notify_all()
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            started = time.perf_counter()
+            try:
+                self._write(batch)
+            finally:
+                with self._condition:
+                    self._writing = 0
+                    self._condition.notify_all()
+            metrics.observe('summary_write_batch_seconds', time.perf_counter() - started)
+            metrics.observe('summary_write_batch_rows', len(batch), SIZE_BUCKETS)
+
+    def _write(self, batch):
+        with self.app.app_context():
+            # Rows stay loaded after commit; the requests that queued them still read them
+            with Session(db.engine, expire_on_commit=False) as session:
+                try:
+                    session.add_all([pending.summary for pending in batch])
+                    session.commit()
+                except Exception:
+                    session.rollback()
+                    # One bad row must not take the rest of its group down with it
+                    for pending in batch:
+                        try:
+                            session.add(pending.summary)
+                            session.commit()
+                        except Exception as e:
+                            session.rollback()
+                            pending.error = str(e)
+                            metrics.inc('summary_write_failures_total')
+            for pending in batch:
+                pending.done.set()
+
+summary_writer = SummaryWriter()
+metrics.describe('summary_write_batch_rows', 'Summaries inserted per write-behind group commit')
+metrics.describe('summary_write_batch_seconds', 'Time to insert and commit one write-behind group')
+metrics.describe('summary_write_failures_total', 'Buffered summaries that could not be committed')
+
+
+@event.listens_for(Session, 'before_flush')
+def _assign_summary_ids(session, flush_context, instances):
+    # Rows inserted outside the buffer take their ids from the same reservations.
+    # The reservation joins the flush's transaction and rolls back with it.
+    if not summary_writer.enabled:
+        return
+    new = [target for target in session.new if isinstance(target, Summary) and target.id is None]
+    if new:
+        first = IdBlock.reserve(Summary, len(new), session.connection())
+        for offset, target in enumerate(new):
+            target.id = first + offset